@@ -0,0 +1,66 @@
+"""
+Activity heatmap data
+
+Sessions hold one row per user and day. The heatmap is served either as
+the original {iso_date: count} map or packed: the range's start and end
+dates plus one unsigned LEB128 varint per day, base64 encoded. An idle
+day costs one byte, so a year packs into about 490 characters however
+active the user was, and multi-year ranges stay cheap.
+"""
+
+import base64
+import os
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+# Range served when the client does not ask for one, as before: today and
+# the 365 days before it
+DEFAULT_DAYS = 365
+MAX_ACTIVITY_DAYS = int(os.getenv("MAX_ACTIVITY_DAYS", str(5 * 366)))
+
+def resolve_range(start: Optional[date], end: Optional[date], today: date) -> Tuple[date, date]:
+    """Clamp a requested range to end no later than today and span at most
+    MAX_ACTIVITY_DAYS; ValueError if it starts after it ends"""
+    end = min(end or today, today)
+    start = start or end - timedelta(days=DEFAULT_DAYS)
+    if start > end:
+        raise ValueError("from must not be after to")
+    return max(start, end - timedelta(days=MAX_ACTIVITY_DAYS - 1)), end
+
+async def daily_counts(db: AsyncSession, user_id: int, start: date, end: date) -> List[Tuple[date, int]]:
+    return (await db.execute(
+        select(models.Session.date, models.Session.task_count).where(
+            models.Session.user_id == user_id,
+            models.Session.date >= start,
+            models.Session.date <= end,
+        )
+    )).all()
+
+def as_map(rows: List[Tuple[date, int]]) -> dict:
+    return {day.isoformat(): task_count for day, task_count in rows}
+
+def encode_varints(values) -> bytes:
+    out = bytearray()
+    for value in values:
+        value = max(value, 0)
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+def pack(start: date, end: date, rows: List[Tuple[date, int]]) -> dict:
+    """Dense per-day counts from start to end inclusive"""
+    counts = [0] * ((end - start).days + 1)
+    for day, task_count in rows:
+        counts[(day - start).days] = task_count or 0
+    return {
+        "start": start,
+        "end": end,
+        "counts": base64.b64encode(encode_varints(counts)).decode("ascii"),
+    }
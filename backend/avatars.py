@@ -0,0 +1,348 @@
+"""
+Profile photo pipeline
+
+POST /api/user/profile/photo used to hand the upload to Cloudinary
+synchronously inside the handler, holding the event loop for the whole
+transfer with no limit on size. Now:
+
+1. UploadLimitMiddleware rejects a request body over AVATAR_MAX_BYTES
+   with a 413 as it streams in, before it is spooled in full;
+2. the photo is read in chunks and hashed as it is read;
+3. the SHA-256 of the original names its stored objects, so a photo
+   that was stored before (by anyone) is found with one lookup and not
+   resized or written again;
+4. otherwise it is decoded, cropped square and resized into each of
+   AVATAR_SIZES as WebP in a bounded process pool;
+5. the renditions are written to the storage backend from a thread.
+
+Cloudinary works differently, because looking a photo up there takes
+the Admin API, which is rate limited per hour. Only the image header is
+checked here; the original is uploaded as is, under its digest with
+overwrite=False, and every size is a transformation Cloudinary applies
+on delivery. Nothing is decoded or resized in this process. A photo
+that is already there is left as it was (the response says "existing"),
+so a repeat costs one upload request, or none while this worker still
+remembers the digest.
+
+The backend is picked with AVATAR_STORAGE: "cloudinary" (default), "s3"
+(AVATAR_S3_BUCKET, credentials from the usual AWS settings) or "local"
+(files under AVATAR_LOCAL_DIR, served by the API under /media; meant for
+development and tests). Stored objects are immutable, so their URLs can
+be cached forever.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+from typing import Dict, Optional, Sequence
+
+import cloudinary
+import cloudinary.exceptions
+import cloudinary.uploader
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile, status
+from starlette.responses import JSONResponse
+
+from cache import TTLCache
+from passwords import HashPool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+AVATAR_STORAGE = os.getenv("AVATAR_STORAGE", "cloudinary")
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(5 * 1024 * 1024)))
+# Square renditions in pixels; the first one becomes users.avatar_url
+AVATAR_SIZES = tuple(int(size) for size in os.getenv("AVATAR_SIZES", "512,256,64").split(","))
+# Larger images are refused before they are decoded
+AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", str(40_000_000)))
+AVATAR_POOL_SIZE = int(os.getenv("AVATAR_POOL_SIZE", "2"))
+AVATAR_QUEUE_LIMIT = int(os.getenv("AVATAR_QUEUE_LIMIT", str(AVATAR_POOL_SIZE * 4)))
+AVATAR_S3_BUCKET = os.getenv("AVATAR_S3_BUCKET", "")
+AVATAR_LOCAL_DIR = os.getenv("AVATAR_LOCAL_DIR", "media")
+# Base URL the stored objects are served from (s3 and local)
+AVATAR_PUBLIC_URL = os.getenv("AVATAR_PUBLIC_URL", "")
+
+UPLOAD_PATH = "/api/user/profile/photo"
+CHUNK_SIZE = 64 * 1024
+# Room for the multipart boundary and part headers around the file
+MULTIPART_OVERHEAD = 16 * 1024
+CONTENT_TYPE = "image/webp"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# ===========================
+# STORAGE BACKENDS
+# ===========================
+# Blocking calls; the pipeline runs them in a thread
+
+class Storage:
+    # put() is given the original upload, and url() derives every size from it
+    stores_original = False
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes) -> bool:
+        """Store an object; False if it turned out to be there already"""
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+class CloudinaryStorage(Storage):
+    """The original of each photo, resized by Cloudinary on delivery
+
+    There is no exists(): the only lookup is the rate-limited Admin API.
+    """
+
+    stores_original = True
+
+    def __init__(self, folder: str = "trackitnow"):
+        self.folder = folder
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET")
+        )
+
+    def _public_id(self, key: str) -> str:
+        # Every size of a photo maps to the same image: avatars/<digest>
+        return f"{self.folder}/{os.path.dirname(key)}"
+
+    def put(self, key: str, data: bytes) -> bool:
+        # A photo that is already there is left alone and reported as existing
+        try:
+            response = cloudinary.uploader.upload(
+                data,
+                public_id=self._public_id(key),
+                overwrite=False,
+                resource_type="image"
+            )
+        except cloudinary.exceptions.BadRequest as e:
+            raise ValueError("Not a supported image") from e
+        return not response.get("existing", False)
+
+    def url(self, key: str) -> str:
+        size = int(os.path.splitext(os.path.basename(key))[0])
+        return cloudinary.CloudinaryImage(self._public_id(key)).build_url(
+            secure=True, format="webp", width=size, height=size, crop="fill"
+        )
+
+class S3Storage(Storage):
+    def __init__(self, bucket: str, public_url: str = ""):
+        import boto3
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        self.public_url = (public_url or f"https://{bucket}.s3.amazonaws.com").rstrip("/")
+        self.client = boto3.client("s3")
+        self._client_error = ClientError
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put(self, key: str, data: bytes) -> bool:
+        self.client.put_object(
+            Bucket=self.bucket, Key=key, Body=data, ContentType=CONTENT_TYPE, CacheControl=CACHE_CONTROL,
+        )
+        return True
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+class LocalStorage(Storage):
+    """Files on disk, served by the API itself (see main.py)"""
+
+    def __init__(self, root: str, public_url: str = ""):
+        self.root = os.path.abspath(root)
+        self.public_url = (public_url or "http://localhost:8000/media").rstrip("/")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes) -> bool:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write aside and rename so a reader never sees half a file
+        partial = f"{path}.{os.getpid()}.partial"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+        return True
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+def create_storage(kind: str = AVATAR_STORAGE) -> Storage:
+    if kind == "cloudinary":
+        return CloudinaryStorage()
+    if kind == "s3":
+        if not AVATAR_S3_BUCKET:
+            raise RuntimeError("AVATAR_STORAGE=s3 needs AVATAR_S3_BUCKET")
+        return S3Storage(AVATAR_S3_BUCKET, AVATAR_PUBLIC_URL)
+    if kind == "local":
+        return LocalStorage(AVATAR_LOCAL_DIR, AVATAR_PUBLIC_URL)
+    raise RuntimeError(f"Unknown AVATAR_STORAGE {kind!r}")
+
+storage = create_storage()
+
+# ===========================
+# RESIZING
+# ===========================
+# Runs inside the pool processes, so it must stay module-level
+
+def _probe(data: bytes, max_pixels: int):
+    """The image with only its header read; ValueError if it isn't one or is too large"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError("Not a supported image") from e
+    if image.width * image.height > max_pixels:
+        raise ValueError("Image dimensions are too large")
+    return image
+
+def _render(data: bytes, sizes: Sequence[int], max_pixels: int) -> Dict[int, bytes]:
+    """Square WebP renditions of an image; ValueError if it isn't one"""
+    from PIL import Image, ImageOps
+
+    image = _probe(data, max_pixels)
+    try:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    except (Image.DecompressionBombError, OSError) as e:
+        raise ValueError("Not a supported image") from e
+
+    renditions = {}
+    for size in sizes:
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        out = io.BytesIO()
+        thumbnail.save(out, "WEBP", quality=85, method=4)
+        renditions[size] = out.getvalue()
+    return renditions
+
+# Same bounded pool the password hashing uses: a 503 once it is backed up
+image_pool = HashPool(AVATAR_POOL_SIZE, AVATAR_QUEUE_LIMIT)
+
+# ===========================
+# PIPELINE
+# ===========================
+
+# content digest -> {size: url} for photos known to be stored
+_stored = TTLCache(maxsize=10000, ttl=3600)
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Photo must be at most {AVATAR_MAX_BYTES // (1024 * 1024)} MB",
+    )
+
+def key_for(digest: str, size: int) -> str:
+    return f"avatars/{digest}/{size}.webp"
+
+async def _renditions(data: bytes, sizes: Sequence[int]) -> Dict[int, bytes]:
+    """_render in the pool, 400 if the upload isn't a usable image"""
+    try:
+        return await image_pool.run(_render, data, sizes, AVATAR_MAX_PIXELS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+async def read_upload(file: UploadFile, limit: int = AVATAR_MAX_BYTES):
+    """(contents, sha256 hex digest) of an upload, 413 past the limit"""
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > limit:
+            raise _too_large()
+        digest.update(chunk)
+        chunks.append(chunk)
+    if not size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty upload")
+    return b"".join(chunks), digest.hexdigest()
+
+async def _store_original(key: str, data: bytes, digest: str):
+    """Check the header and hand the upload itself to the backend, 400 if it isn't usable"""
+    try:
+        await asyncio.to_thread(_probe, data, AVATAR_MAX_PIXELS)
+        # No lookup first: the backend itself refuses to store a photo twice
+        if not await asyncio.to_thread(storage.put, key, data):
+            logger.debug("Photo %s was already stored", digest)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+async def store(data: bytes, digest: str) -> Dict[int, str]:
+    """Store a photo unless it already is; {size: url}"""
+    urls = _stored.get(digest)
+    if urls is not None:
+        return urls
+
+    keys = {size: key_for(digest, size) for size in AVATAR_SIZES}
+    urls = {size: storage.url(key) for size, key in keys.items()}
+    primary = keys[AVATAR_SIZES[0]]
+    if storage.stores_original:
+        await _store_original(primary, data, digest)
+    # The first size is written last, so its presence means the set is complete
+    elif not await asyncio.to_thread(storage.exists, primary):
+        renditions = await _renditions(data, AVATAR_SIZES)
+        for size in reversed(AVATAR_SIZES):
+            await asyncio.to_thread(storage.put, keys[size], renditions[size])
+    _stored.set(digest, urls)
+    return urls
+
+def local_root() -> Optional[str]:
+    """Directory to serve under /media when photos are stored locally"""
+    return storage.root if isinstance(storage, LocalStorage) else None
+
+# ===========================
+# MIDDLEWARE
+# ===========================
+
+class UploadLimitMiddleware:
+    """ASGI middleware capping the request body of the photo upload"""
+
+    def __init__(self, app, path: str = UPLOAD_PATH, limit: int = AVATAR_MAX_BYTES + MULTIPART_OVERHEAD):
+        self.app = app
+        self.path = path
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.limit:
+            response = JSONResponse({"detail": _too_large().detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    # Raised while the form is parsed, so the app answers 413
+                    raise _too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,140 @@
+"""
+Badge catalogue and awarding rules
+
+Handlers report what happened (a task was completed, a streak was
+extended, points went up) and only the rules listening for those events
+are checked. A rule awards its badge when the change moved its user_stats
+column across the threshold, so a badge is inserted once, on the update
+that earned it. The insert still uses ON CONFLICT DO NOTHING in case the
+backfill got there first.
+
+Historical badges for existing users are awarded in bulk (run after
+`python user_stats.py rebuild`):
+    python badges.py backfill [--chunk-size 1000]
+"""
+
+import argparse
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Tuple
+
+from sqlalchemy import and_, exists, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+import models
+
+# Events reported by the handlers
+TASK_COMPLETED = "task_completed"
+STREAK_EXTENDED = "streak_extended"
+POINTS_INCREASED = "points_increased"
+
+BADGE_CATALOGUE = (
+    {"type": "bronze", "name": "First Steps", "description": "Complete your first task"},
+    {"type": "silver", "name": "Week Warrior", "description": "7-day streak"},
+    {"type": "gold", "name": "Gold Standard", "description": "Earn 1000 points"},
+    {"type": "platinum", "name": "Platinum Pro", "description": "30-day streak"},
+    {"type": "diamond", "name": "Diamond Elite", "description": "100-day streak"},
+)
+
+class BadgeRule(NamedTuple):
+    badge_type: str
+    metric: str  # user_stats column compared against the threshold
+    threshold: int
+    events: Tuple[str, ...]
+
+RULES = (
+    BadgeRule("bronze", "completed_tasks", 1, (TASK_COMPLETED,)),
+    BadgeRule("silver", "longest_streak", 7, (STREAK_EXTENDED,)),
+    BadgeRule("gold", "points", 1000, (POINTS_INCREASED,)),
+    BadgeRule("platinum", "longest_streak", 30, (STREAK_EXTENDED,)),
+    BadgeRule("diamond", "longest_streak", 100, (STREAK_EXTENDED,)),
+)
+
+RULES_BY_EVENT: Dict[str, List[BadgeRule]] = {}
+for _rule in RULES:
+    for _event in _rule.events:
+        RULES_BY_EVENT.setdefault(_event, []).append(_rule)
+
+# The user_stats column whose increase means the event happened
+EVENT_METRICS = {
+    TASK_COMPLETED: "completed_tasks",
+    STREAK_EXTENDED: "current_streak",
+    POINTS_INCREASED: "points",
+}
+
+def events_for(changes: Mapping[str, Tuple]) -> List[str]:
+    """Events implied by {column: (before, after)} from user_stats.record_task_change"""
+    return [
+        event for event, metric in EVENT_METRICS.items()
+        if metric in changes and changes[metric][1] > changes[metric][0]
+    ]
+
+async def award_for_events(
+    db: AsyncSession, user_id: int, events: Iterable[str], changes: Mapping[str, Tuple]
+) -> List[str]:
+    """Award the badges whose threshold the changes crossed; the new ones (no commit)"""
+    rules = {rule for event in events for rule in RULES_BY_EVENT.get(event, ())}
+    earned = [
+        rule.badge_type for rule in rules
+        if rule.metric in changes and changes[rule.metric][0] < rule.threshold <= changes[rule.metric][1]
+    ]
+    if not earned:
+        return []
+    now = datetime.utcnow()
+    return list((await db.scalars(
+        dialect_insert(db)(models.UserBadge)
+        .values([{"user_id": user_id, "badge_type": badge, "earned_at": now} for badge in earned])
+        .on_conflict_do_nothing()
+        .returning(models.UserBadge.badge_type)
+    )).all())
+
+def backfill(db: Session, chunk_size: int = 1000) -> int:
+    """Award every rule that holds for existing users, one chunk of user ids at a time"""
+    awarded = 0
+    last_id = 0
+    while True:
+        user_ids = db.scalars(
+            select(models.UserStats.user_id)
+            .where(models.UserStats.user_id > last_id)
+            .order_by(models.UserStats.user_id)
+            .limit(chunk_size)
+        ).all()
+        if not user_ids:
+            return awarded
+        low, high = user_ids[0], user_ids[-1]
+        now = datetime.utcnow()
+        for rule in RULES:
+            already_earned = exists().where(
+                models.UserBadge.user_id == models.UserStats.user_id,
+                models.UserBadge.badge_type == rule.badge_type,
+            )
+            result = db.execute(insert(models.UserBadge).from_select(
+                ["user_id", "badge_type", "earned_at"],
+                select(models.UserStats.user_id, literal(rule.badge_type), literal(now)).where(
+                    and_(
+                        models.UserStats.user_id.between(low, high),
+                        getattr(models.UserStats, rule.metric) >= rule.threshold,
+                        ~already_earned,
+                    )
+                ),
+            ))
+            awarded += result.rowcount
+        db.commit()
+        last_id = high
+
+if __name__ == "__main__":
+    from database import SessionLocal, run_migrations
+
+    parser = argparse.ArgumentParser(description="Award badges")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    run_migrations()
+    db = SessionLocal()
+    try:
+        count = backfill(db, args.chunk_size)
+        print(f"✅ Awarded {count} badges")
+    finally:
+        db.close()
@@ -0,0 +1,234 @@
+"""
+Check background account deletion on a heavy user
+
+Seeds one user with many friends, messages, task statuses, custom tasks
+(some tracked by other users), sessions and badges, then:
+
+1. DELETE /api/user/account returns quickly and disables the account:
+   the token, sign-in and search stop working at once, and nobody can
+   send the user a friend request or track their custom tasks;
+2. a purge interrupted after a few batches leaves its progress behind,
+   and another worker cannot take it over while the lease is live;
+3. once the lease lapses the purge resumes and removes every row, with
+   deleted_rows matching what was seeded;
+4. the friends' counts and the stats of users who tracked the deleted
+   user's custom tasks are correct afterwards.
+
+Usage (from backend/):
+    python benchmarks/account_deletion.py --friends 2000 --messages 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description="Check chunked, resumable account deletion")
+parser.add_argument("--database-url", help="existing empty database to use instead of a temp SQLite file")
+parser.add_argument("--friends", type=int, default=500)
+parser.add_argument("--messages", type=int, default=20, help="messages in each of the user's chats")
+parser.add_argument("--custom-tasks", type=int, default=200)
+parser.add_argument("--session-days", type=int, default=365)
+parser.add_argument("--batch-size", type=int, default=500)
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'deletion.db')}"
+os.environ["DELETION_GRACE_SECONDS"] = "3600"  # keep the in-app worker out of the way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date, datetime, timedelta
+
+import httpx
+from sqlalchemy import func, insert, select, update
+
+import conversations
+import deletion
+import main
+import models
+import passwords
+import user_stats
+from database import AsyncSessionLocal, SessionLocal
+
+PASSWORD = "deletion-check"
+OWNED = [  # (model, column) pairs that must be empty for the deleted user
+    (models.Friendship, models.Friendship.user_id), (models.Friendship, models.Friendship.friend_id),
+    (models.Message, models.Message.sender_id), (models.Message, models.Message.receiver_id),
+    (models.UserTask, models.UserTask.user_id), (models.Task, models.Task.user_id),
+    (models.Session, models.Session.user_id), (models.UserBadge, models.UserBadge.user_id),
+    (models.UserStats, models.UserStats.user_id), (models.User, models.User.id),
+    (models.Conversation, models.Conversation.user_id), (models.Conversation, models.Conversation.friend_id),
+]
+
+failures = 0
+
+def check(label, ok, detail=""):
+    global failures
+    print(f"{'✅' if ok else '❌'} {label}{': ' + detail if detail else ''}")
+    failures += not ok
+
+def seed() -> tuple:
+    """The heavy user's id, their friends' ids, how many rows they own and one of their custom tasks"""
+    db = SessionLocal()
+    hashed = passwords.pwd_context.hash(PASSWORD)
+    users = [{"email": f"user{i}@example.com", "username": f"user{i}", "display_name": f"User {i}",
+              "hashed_password": hashed} for i in range(args.friends + 1)]
+    db.execute(insert(models.User), users)
+    ids = db.scalars(select(models.User.id).order_by(models.User.id)).all()
+    heavy, friends = ids[0], ids[1:]
+    now = datetime.utcnow()
+
+    # Every other friendship was sent by the heavy user; a few stay pending
+    db.execute(insert(models.Friendship), [
+        {"user_id": heavy, "friend_id": friend, "status": "pending" if i % 10 == 9 else "accepted"}
+        if i % 2 else
+        {"user_id": friend, "friend_id": heavy, "status": "pending" if i % 10 == 8 else "accepted"}
+        for i, friend in enumerate(friends)
+    ])
+    db.execute(insert(models.Message), [
+        {"sender_id": heavy if j % 2 else friend, "receiver_id": friend if j % 2 else heavy,
+         "content": f"message {j}", "created_at": now - timedelta(minutes=j)}
+        for friend in friends[:len(friends) // 2] for j in range(args.messages)
+    ])
+    db.execute(insert(models.Task), [
+        {"title": f"Custom {i}", "description": "heavy", "level": "beginner", "type": "Coding", "user_id": heavy}
+        for i in range(args.custom_tasks)
+    ])
+    custom = db.scalars(select(models.Task.id).where(models.Task.user_id == heavy)).all()
+    db.execute(insert(models.UserTask), [{"user_id": heavy, "task_id": task_id, "status": "done"} for task_id in custom])
+    # Statuses other users hold on the heavy user's tasks
+    db.execute(insert(models.UserTask), [
+        {"user_id": friend, "task_id": task_id, "status": "done"}
+        for friend in friends[:20] for task_id in custom[:5]
+    ])
+    db.execute(insert(models.Session), [
+        {"user_id": heavy, "date": date.today() - timedelta(days=d), "task_count": 1} for d in range(args.session_days)
+    ])
+    db.execute(insert(models.UserBadge), [{"user_id": heavy, "badge_type": badge} for badge in ("bronze", "silver")])
+    db.commit()
+    user_stats.rebuild_all(db)
+    conversations.backfill(db)
+    db.commit()
+
+    # Conversations go with their friendship and aren't counted separately
+    owned = sum(
+        db.scalar(select(func.count()).select_from(model).where(column == heavy))
+        for model, column in OWNED if model is not models.Conversation
+    ) + db.scalar(select(func.count()).select_from(models.UserTask).where(
+        models.UserTask.task_id.in_(custom), models.UserTask.user_id != heavy))
+    db.close()
+    return heavy, friends, owned, custom[0]
+
+async def count_owned(db, user_id):
+    return {
+        f"{model.__tablename__}.{column.key}": await db.scalar(
+            select(func.count()).select_from(model).where(column == user_id))
+        for model, column in OWNED
+    }
+
+class Interrupted(Exception):
+    pass
+
+def interrupting_factory(sessions: int):
+    """Session maker that fails once it has handed out `sessions` sessions"""
+    handed_out = 0
+
+    def factory():
+        nonlocal handed_out
+        handed_out += 1
+        if handed_out > sessions:
+            raise Interrupted()
+        return AsyncSessionLocal()
+    return factory
+
+async def run():
+    heavy, friends, owned, custom_task = seed()
+    print(f"Seeded user {heavy} owning {owned:,} rows")
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://deletion-check") as client:
+            token = await client.post("/api/auth/signin", data={"username": "user0@example.com", "password": PASSWORD})
+            headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+            friend_headers = {"Authorization": f"Bearer {main.create_access_token({'sub': str(friends[0])})}"}
+
+            # 1. The request only disables the account
+            await client.get("/api/user/profile", headers=headers)
+            cached = main.user_cache.get(heavy)
+            started = time.perf_counter()
+            r = await client.delete("/api/user/account", headers=headers)
+            elapsed = (time.perf_counter() - started) * 1000
+            check("DELETE returns 202", r.status_code == 202, f"{r.status_code} in {elapsed:.1f} ms")
+            # Another worker that still has the user cached accepts a repeat
+            main.user_cache.set(heavy, cached)
+            r = await client.delete("/api/user/account", headers=headers)
+            check("a repeated DELETE is accepted", r.status_code == 202, str(r.status_code))
+            r = await client.get("/api/user/profile", headers=headers)
+            check("the token stops working", r.status_code == 401, str(r.status_code))
+            r = await client.post("/api/auth/signin", data={"username": "user0@example.com", "password": PASSWORD})
+            check("sign-in is refused", r.status_code == 401, str(r.status_code))
+            r = await client.get("/api/friends/search?q=user0", headers=friend_headers)
+            check("search no longer finds the user", all(u["id"] != heavy for u in r.json()["users"]))
+            r = await client.get("/api/leaderboard/friends", headers=friend_headers)
+            check("leaderboard drops the user", r.status_code == 200)
+            # Nothing new may point at the user once the purge is under way
+            r = await client.post("/api/friends/request", headers=friend_headers, json={"user_id": heavy})
+            check("friend requests to the user are refused", r.status_code == 404, str(r.status_code))
+            r = await client.put(f"/api/tasks/{custom_task}/status", headers=friend_headers, json={"status": "done"})
+            check("statuses on the user's custom tasks are refused", r.status_code == 404, str(r.status_code))
+            r = await client.put("/api/tasks/status:batch", headers=friend_headers,
+                                 json=[{"task_id": custom_task, "status": "done"}])
+            check("batch statuses on them are skipped", r.status_code == 200 and not r.json()[0]["updated"])
+
+        async with AsyncSessionLocal() as db:
+            check("the deletion is queued but not yet due", await deletion.due(db) == [])
+            await db.execute(update(models.AccountDeletion).values(requested_at=datetime.utcnow() - timedelta(hours=2)))
+            await db.commit()
+            check("it is due after the grace period", await deletion.due(db) == [heavy])
+
+        # 2. Interrupt after a few batches
+        try:
+            await deletion.purge(interrupting_factory(4), heavy, args.batch_size)
+            check("purge was interrupted", False)
+        except Interrupted:
+            pass
+        async with AsyncSessionLocal() as db:
+            job = await db.get(models.AccountDeletion, heavy)
+            check("progress survives the interruption", job.deleted_rows > 0 and job.completed_at is None,
+                  f"stage {job.stage}, {job.deleted_rows} rows")
+        check("the lease keeps other workers out", not await deletion.purge(AsyncSessionLocal, heavy))
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(models.AccountDeletion).values(claimed_until=datetime.utcnow() - timedelta(seconds=1)))
+            await db.commit()
+
+        # 3. Resume
+        started = time.perf_counter()
+        finished = await deletion.run_due(AsyncSessionLocal, args.batch_size)
+        elapsed = time.perf_counter() - started
+        async with AsyncSessionLocal() as db:
+            job = await db.get(models.AccountDeletion, heavy)
+            left = {name: count for name, count in (await count_owned(db, heavy)).items() if count}
+            check("the purge resumes and completes", finished == 1 and job.completed_at is not None and job.stage == "done",
+                  f"{elapsed:.2f}s")
+            check("no rows are left", not left, str(left))
+            check("deleted_rows matches what was seeded", job.deleted_rows == owned, f"{job.deleted_rows} vs {owned}")
+            check("a completed purge is not picked up again", await deletion.due(db) == [])
+
+            # 4. Other users' derived rows
+            counts = dict((await db.execute(
+                select(models.UserStats.user_id, models.UserStats.friends_count)
+                .where(models.UserStats.user_id.in_(friends))
+            )).all())
+            check("friends' counts dropped the user", all(count == 0 for count in counts.values()),
+                  f"{sum(counts.values())} left")
+            totals = dict((await db.execute(
+                select(models.UserStats.user_id, models.UserStats.total_tasks)
+                .where(models.UserStats.user_id.in_(friends[:20]))
+            )).all())
+            check("stats of users tracking the custom tasks were rebuilt", all(t == 0 for t in totals.values()))
+    finally:
+        await main.app.router.shutdown()
+
+asyncio.run(run())
+sys.exit(1 if failures else 0)
@@ -0,0 +1,165 @@
+"""
+Check the profile photo pipeline with the local storage backend
+
+1. an upload is stored as square WebP renditions of every AVATAR_SIZES
+   size, and avatar_url is served back by the API;
+2. uploading the same photo again (as the same or another user) writes
+   nothing and reuses the stored objects;
+3. bodies over AVATAR_MAX_BYTES are refused with a 413, whether their
+   Content-Length says so up front or they stream in without one;
+4. files that aren't images, or whose dimensions are too large, get a 400;
+5. the event loop keeps running while several large photos are resized:
+   a ticker measures how late it gets scheduled.
+
+Usage (from backend/):
+    python benchmarks/avatar_upload.py --uploads 8 --width 4000 --height 3000
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description="Check avatar upload limits, renditions and deduplication")
+parser.add_argument("--uploads", type=int, default=8, help="concurrent distinct uploads for the loop check")
+parser.add_argument("--width", type=int, default=4000)
+parser.add_argument("--height", type=int, default=3000)
+parser.add_argument("--max-lag-ms", type=float, default=100.0, help="fail when the loop is held up longer")
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'avatars.db')}"
+os.environ["AVATAR_STORAGE"] = "local"
+os.environ["AVATAR_LOCAL_DIR"] = os.path.join(workdir, "media")
+os.environ["AVATAR_MAX_BYTES"] = str(8 * 1024 * 1024)
+os.environ["AVATAR_MAX_PIXELS"] = str(args.width * args.height)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from PIL import Image
+
+import avatars
+import main
+
+failures = 0
+
+def check(label, ok, detail=""):
+    global failures
+    print(f"{'✅' if ok else '❌'} {label}{': ' + detail if detail else ''}")
+    failures += not ok
+
+def photo(seed: int, size=(args.width, args.height), fmt="JPEG") -> bytes:
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    image.paste((seed * 37 % 256, seed * 91 % 256, seed * 53 % 256), (0, 0, size[0] // 3, size[1] // 3))
+    out = io.BytesIO()
+    image.save(out, fmt, quality=90) if fmt == "JPEG" else image.save(out, fmt)
+    return out.getvalue()
+
+def stored_files():
+    found = {}
+    for root, _, files in os.walk(avatars.AVATAR_LOCAL_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            found[path] = os.stat(path).st_mtime_ns
+    return found
+
+async def signup(client, name):
+    r = await client.post("/api/auth/signup", json={
+        "email": f"{name}@example.com", "username": name, "password": "avatar-check",
+    })
+    token = main.create_access_token({"sub": str(r.json()["id"])})
+    return {"Authorization": f"Bearer {token}"}
+
+async def upload(client, headers, data, name="me.jpg", content_type="image/jpeg"):
+    return await client.post("/api/user/profile/photo", headers=headers,
+                              files={"file": (name, data, content_type)})
+
+async def run():
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost:8000") as client:
+            alice = await signup(client, "alice")
+            bob = await signup(client, "bob")
+            original = photo(1)
+
+            # 1. Renditions
+            r = await upload(client, alice, original)
+            body = r.json()
+            check("upload succeeds", r.status_code == 200, str(r.status_code))
+            sizes = sorted(int(size) for size in body["sizes"])
+            check("one rendition per size", sizes == sorted(avatars.AVATAR_SIZES), str(sizes))
+            for path in stored_files():
+                with Image.open(path) as image:
+                    expected = int(os.path.splitext(os.path.basename(path))[0])
+                    if image.format != "WEBP" or image.size != (expected, expected):
+                        check("renditions are square WebP", False, f"{path}: {image.format} {image.size}")
+                        break
+            else:
+                check("renditions are square WebP", True)
+            r = await client.get(body["avatar_url"].replace("http://localhost:8000", ""))
+            check("avatar_url is served", r.status_code == 200 and r.headers["content-type"] == "image/webp",
+                  f"{r.status_code} {r.headers.get('content-type')}")
+            r = await client.get("/api/user/profile", headers=alice)
+            check("profile points at the largest rendition", r.json()["avatar_url"] == body["avatar_url"])
+
+            # 2. Deduplication
+            before = stored_files()
+            r = await upload(client, alice, original)
+            check("re-upload returns the same URLs", r.json() == body)
+            avatars._stored.clear()  # as on a freshly started worker
+            r = await upload(client, bob, original, name="copy.jpg")
+            check("another user's identical photo reuses the objects", r.json()["sizes"] == body["sizes"])
+            check("nothing was written again", stored_files() == before)
+
+            # 3. Size limit
+            too_big = os.urandom(avatars.AVATAR_MAX_BYTES + 1024)
+            r = await upload(client, alice, too_big)
+            check("declared oversize body is refused", r.status_code == 413, str(r.status_code))
+
+            async def stream():
+                yield b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.jpg\"\r\n\r\n"
+                for _ in range(avatars.AVATAR_MAX_BYTES // (1024 * 1024) + 2):
+                    yield b"\0" * (1024 * 1024)
+                yield b"\r\n--x--\r\n"
+            r = await client.post("/api/user/profile/photo", content=stream(),
+                                  headers={**alice, "Content-Type": "multipart/form-data; boundary=x"})
+            check("streamed oversize body is refused", r.status_code == 413, str(r.status_code))
+
+            # 4. Not images
+            r = await upload(client, alice, b"not an image at all", name="a.txt", content_type="text/plain")
+            check("non-image is refused", r.status_code == 400, r.text)
+            r = await upload(client, alice, photo(2, size=(args.width + 1, args.height), fmt="PNG"), name="a.png")
+            check("oversized dimensions are refused", r.status_code == 400, r.text)
+
+            # 5. Event loop stays responsive
+            photos = [photo(10 + i) for i in range(args.uploads)]
+            users = [await signup(client, f"user{i}") for i in range(args.uploads)]
+            lag = 0.0
+            done = asyncio.Event()
+
+            async def ticker():
+                nonlocal lag
+                while not done.is_set():
+                    started = time.perf_counter()
+                    await asyncio.sleep(0.005)
+                    lag = max(lag, time.perf_counter() - started - 0.005)
+
+            ticking = asyncio.create_task(ticker())
+            started = time.perf_counter()
+            results = await asyncio.gather(*(upload(client, user, data) for user, data in zip(users, photos)))
+            elapsed = time.perf_counter() - started
+            done.set()
+            await ticking
+            codes = sorted({r.status_code for r in results})
+            check(f"{args.uploads} concurrent {args.width}x{args.height} uploads", codes in ([200], [200, 503]),
+                  f"{codes} in {elapsed:.2f}s")
+            check("event loop stays responsive", lag * 1000 <= args.max_lag_ms, f"max lag {lag * 1000:.1f} ms")
+    finally:
+        await main.app.router.shutdown()
+
+asyncio.run(run())
+sys.exit(1 if failures else 0)
@@ -0,0 +1,436 @@
+"""
+Per-endpoint latency and query counts against a seeded synthetic dataset
+
+Seeds a throwaway database (SQLite file, or an empty PostgreSQL database
+via --database-url) with configurable volumes of users, tasks, sessions,
+friendships and messages, then drives every API route through the real
+app in-process. For each route it records latency percentiles and the
+number of SQL statements each request ran, and writes a JSON report with
+stable keys so two runs can be diffed:
+
+    python benchmarks/endpoints.py --output before.json
+    git checkout my-branch
+    python benchmarks/endpoints.py --output after.json --compare before.json
+
+--compare exits non-zero when any route runs more queries per request
+than in the baseline, which is how an N+1 shows up, or, with
+--latency-tolerance, when its p50 grew by more than that fraction.
+
+Usage (from backend/):
+    python benchmarks/endpoints.py --users 2000 --friends 50 --messages 100 --requests 30
+    python benchmarks/endpoints.py --database-url postgresql://.../empty_db
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description="Benchmark every API route on a seeded dataset")
+parser.add_argument("--database-url", help="existing empty database to use instead of a temp SQLite file")
+parser.add_argument("--users", type=int, default=2000)
+parser.add_argument("--friends", type=int, default=50, help="accepted friends of the benchmark user")
+parser.add_argument("--messages", type=int, default=100, help="messages in each of the benchmark user's chats")
+parser.add_argument("--custom-tasks", type=int, default=50, help="custom tasks of the benchmark user")
+parser.add_argument("--statuses", type=int, default=10, help="task statuses per user")
+parser.add_argument("--session-days", type=int, default=365, help="history length for sessions")
+parser.add_argument("--requests", type=int, default=30, help="requests per route")
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--output", help="write the JSON report here")
+parser.add_argument("--compare", help="baseline report to compare against")
+parser.add_argument("--latency-tolerance", type=float, help="fail when a p50 grows by more than this fraction")
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'endpoints.db')}"
+os.environ["AVATAR_STORAGE"] = "local"
+os.environ["AVATAR_LOCAL_DIR"] = os.path.join(workdir, "media")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+
+import httpx
+from fastapi.routing import APIRoute
+from PIL import Image
+from sqlalchemy import event, insert
+
+import badges
+import catalog
+import conversations
+import main
+import models
+import passwords
+import user_stats
+from database import SessionLocal, async_engine
+
+PASSWORD = "bench-password"
+LEVELS = ("beginner", "intermediate", "expert")
+STATUSES = ("pending", "progress", "done")
+
+# Routes that cannot be driven over plain HTTP in-process, with the reason
+SKIPPED = {
+    "WS /ws": "WebSocket; see benchmarks/ws_fanout.py",
+}
+
+# ===========================
+# DATASET
+# ===========================
+
+class Dataset:
+    """Ids the scenarios need, in the ranges seed() reserved for them"""
+
+    def __init__(self, n_users, n_friends, n_requests):
+        self.bench_id = 1
+        self.friend_ids = list(range(2, 2 + n_friends))
+        # Users with a pending request to the bench user, one per accept/decline
+        self.requester_ids = list(range(2 + n_friends, 2 + n_friends + 2 * n_requests))
+        # Users the bench user sends requests to
+        self.target_ids = list(range(2 + n_friends + 2 * n_requests, 2 + n_friends + 3 * n_requests))
+        # Accounts for DELETE /api/user/account
+        self.doomed_ids = list(range(2 + n_friends + 3 * n_requests, 2 + n_friends + 4 * n_requests))
+        self.n_users = max(n_users, self.doomed_ids[-1] if self.doomed_ids else 1)
+        self.default_task_ids = []
+        self.custom_task_ids = []
+        self.chat_ids = []
+        self.pending_ids = []
+
+def batched_insert(db, table, rows, size=5000):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            db.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.execute(insert(table), batch)
+
+def seed(data: Dataset):
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    today = now.date()
+    hashed = passwords._hash(PASSWORD)
+    db = SessionLocal()
+
+    batched_insert(db, models.User, (
+        {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "display_name": f"User {i}",
+         "hashed_password": hashed, "bio": "Benchmark user", "created_at": now, "updated_at": now}
+        for i in range(1, data.n_users + 1)
+    ))
+
+    # Default catalogue, then the bench user's custom tasks
+    n_default = 15
+    batched_insert(db, models.Task, (
+        {"id": i, "title": f"Default task {i}", "description": "A default task", "level": LEVELS[i % 3],
+         "type": "Fitness", "icon": "🏃", "user_id": None, "created_at": now}
+        for i in range(1, n_default + 1)
+    ))
+    data.default_task_ids = list(range(1, n_default + 1))
+    data.custom_task_ids = list(range(n_default + 1, n_default + 1 + args.custom_tasks))
+    batched_insert(db, models.Task, (
+        {"id": i, "title": f"Custom task {i}", "description": "A custom task", "level": LEVELS[i % 3],
+         "type": "Coding", "icon": "📝", "user_id": data.bench_id, "created_at": now}
+        for i in data.custom_task_ids
+    ))
+    catalog.bump_version(db)
+
+    def statuses():
+        for user_id in range(1, data.n_users + 1):
+            pool = data.default_task_ids + (data.custom_task_ids if user_id == data.bench_id else [])
+            for task_id in rng.sample(pool, min(len(pool), args.statuses)):
+                yield {"user_id": user_id, "task_id": task_id, "status": rng.choice(STATUSES),
+                       "created_at": now, "updated_at": now}
+    batched_insert(db, models.UserTask, statuses())
+
+    def sessions():
+        for user_id in range(1, data.n_users + 1):
+            # The bench user is active most days, everyone else now and then
+            rate = 0.7 if user_id == data.bench_id else 0.1
+            for offset in range(args.session_days):
+                if rng.random() < rate:
+                    yield {"user_id": user_id, "date": today - timedelta(days=offset),
+                           "task_count": rng.randint(1, 6), "created_at": now}
+    batched_insert(db, models.Session, sessions())
+
+    friendship_id = 0
+    def friendships():
+        nonlocal friendship_id
+        for friend_id in data.friend_ids:
+            friendship_id += 1
+            data.chat_ids.append(friendship_id)
+            yield {"id": friendship_id, "user_id": data.bench_id, "friend_id": friend_id,
+                   "status": "accepted", "created_at": now}
+        for requester_id in data.requester_ids:
+            friendship_id += 1
+            data.pending_ids.append(friendship_id)
+            yield {"id": friendship_id, "user_id": requester_id, "friend_id": data.bench_id,
+                   "status": "pending", "created_at": now}
+        # Some friendships among everyone else for the leaderboard and search
+        others = list(range(data.doomed_ids[-1] + 1 if data.doomed_ids else 2, data.n_users + 1))
+        for user_id in others:
+            for friend_id in rng.sample(others, min(2, len(others))):
+                if friend_id > user_id:
+                    friendship_id += 1
+                    yield {"id": friendship_id, "user_id": user_id, "friend_id": friend_id,
+                           "status": "accepted", "created_at": now}
+    batched_insert(db, models.Friendship, friendships())
+
+    def messages():
+        for friend_id in data.friend_ids:
+            start = now - timedelta(days=30)
+            for i in range(args.messages):
+                sender, receiver = (data.bench_id, friend_id) if rng.random() < 0.5 else (friend_id, data.bench_id)
+                yield {"sender_id": sender, "receiver_id": receiver, "content": f"Message {i} about the plan",
+                       "is_read": i < args.messages - 5, "created_at": start + timedelta(minutes=i)}
+    batched_insert(db, models.Message, messages())
+    db.commit()
+
+    conversations.backfill(db)
+    user_stats.rebuild_all(db)
+    badges.backfill(db)
+    db.commit()
+    db.close()
+
+# ===========================
+# SCENARIOS
+# ===========================
+
+def token_for(user_id: int) -> dict:
+    token = main.create_access_token({"sub": str(user_id)}, timedelta(hours=2))
+    return {"Authorization": f"Bearer {token}"}
+
+def photo(n: int) -> bytes:
+    """A distinct 1024x1024 JPEG per n"""
+    rng = random.Random(n)
+    image = Image.radial_gradient("L").resize((1024, 1024)).convert("RGB")
+    image.paste((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (0, 0, 512, 512))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+def scenarios(data: Dataset):
+    """(label, request factory) pairs; factory(i) -> (method, url, headers, kwargs)"""
+    bench = token_for(data.bench_id)
+    chat = data.chat_ids[0]
+
+    def get(url, headers=bench):
+        return lambda i: ("GET", url, headers, {})
+
+    reads = [
+        ("GET /", get("/", None)),
+        ("GET /health", get("/health", None)),
+        ("GET /api/user/profile", get("/api/user/profile")),
+        ("GET /api/tasks", get("/api/tasks")),
+        ("GET /api/tasks?level=", get("/api/tasks?level=beginner")),
+        ("GET /api/friends", get("/api/friends")),
+        ("GET /api/friends/search?q=", get("/api/friends/search?q=")),
+        ("GET /api/friends/search?q=user1", get("/api/friends/search?q=user1")),
+        ("GET /api/friends/search?q=ser", get("/api/friends/search?q=ser")),
+        ("GET /api/friends/requests", get("/api/friends/requests")),
+        ("GET /api/chats", get("/api/chats")),
+        ("GET /api/chats/:id/messages", get(f"/api/chats/{chat}/messages")),
+        ("GET /api/progress/activity", get("/api/progress/activity")),
+        ("GET /api/progress/activity?format=packed", get("/api/progress/activity?format=packed")),
+        ("GET /api/progress/badges", get("/api/progress/badges")),
+        ("GET /api/progress/goals", get("/api/progress/goals")),
+        ("GET /api/dashboard", get("/api/dashboard")),
+        ("GET /api/leaderboard", get("/api/leaderboard")),
+        ("GET /api/leaderboard/me", get("/api/leaderboard/me")),
+        ("GET /api/leaderboard/around", get("/api/leaderboard/around")),
+        ("GET /api/leaderboard/friends", get("/api/leaderboard/friends")),
+    ]
+
+    task_ids = data.default_task_ids + data.custom_task_ids
+    writes = [
+        ("PUT /api/tasks/:id/status", lambda i: (
+            "PUT", f"/api/tasks/{task_ids[i % len(task_ids)]}/status", bench,
+            {"json": {"status": STATUSES[i % 3]}})),
+        ("PUT /api/tasks/status:batch", lambda i: (
+            "PUT", "/api/tasks/status:batch", bench,
+            {"json": [{"task_id": task_id, "status": STATUSES[i % 3]} for task_id in task_ids[:20]]})),
+        ("POST /api/tasks", lambda i: (
+            "POST", "/api/tasks", bench,
+            {"json": {"title": f"Bench {i}", "description": "bench", "level": "beginner", "type": "Coding"}})),
+        ("PUT /api/user/profile", lambda i: ("PUT", "/api/user/profile", bench, {"json": {"bio": f"Bio {i}"}})),
+        ("POST /api/chats/:id/messages", lambda i: (
+            "POST", f"/api/chats/{chat}/messages", bench, {"json": {"content": f"Benchmark message {i}"}})),
+        ("PUT /api/chats/:id/read", lambda i: ("PUT", f"/api/chats/{chat}/read", bench, {})),
+        ("POST /api/friends/request", lambda i: (
+            "POST", "/api/friends/request", bench, {"json": {"user_id": data.target_ids[i]}})),
+        ("PUT /api/friends/requests/:id/accept", lambda i: (
+            "PUT", f"/api/friends/requests/{data.pending_ids[2 * i]}/accept", bench, {})),
+        ("PUT /api/friends/requests/:id/decline", lambda i: (
+            "PUT", f"/api/friends/requests/{data.pending_ids[2 * i + 1]}/decline", bench, {})),
+        ("POST /api/auth/signup", lambda i: (
+            "POST", "/api/auth/signup", None,
+            {"json": {"email": f"new{i}@example.com", "username": f"new{i}", "password": PASSWORD}})),
+        ("POST /api/auth/signin", lambda i: (
+            "POST", "/api/auth/signin", None, {"data": {"username": "user1@example.com", "password": PASSWORD}})),
+        ("POST /api/auth/signout", lambda i: ("POST", "/api/auth/signout", bench, {})),
+        # Every other upload repeats the previous photo and is deduplicated
+        ("POST /api/user/profile/photo", lambda i: (
+            "POST", "/api/user/profile/photo", bench, {"files": {"file": ("me.jpg", photo(i // 2), "image/jpeg")}})),
+        ("DELETE /api/user/account", lambda i: (
+            "DELETE", "/api/user/account", token_for(data.doomed_ids[i]), {})),
+    ]
+    return reads + writes
+
+# ===========================
+# MEASUREMENT
+# ===========================
+
+query_count = 0
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    global query_count
+    if not statement.lstrip().upper().startswith(("BEGIN", "COMMIT", "ROLLBACK")):
+        query_count += 1
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+async def measure(client, factory, n):
+    global query_count
+    latencies, queries, statuses = [], [], {}
+    for i in range(n):
+        method, url, headers, kwargs = factory(i)
+        query_count = 0
+        start = time.perf_counter()
+        response = await client.request(method, url, headers=headers, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(query_count)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    return {
+        "requests": n,
+        "status": dict(sorted(statuses.items())),
+        "p50_ms": round(percentile(latencies, 0.5), 3),
+        "p90_ms": round(percentile(latencies, 0.9), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "queries": {"min": min(queries), "max": max(queries), "mean": round(statistics.fmean(queries), 2)},
+    }
+
+def app_routes():
+    labels = set()
+    for route in main.app.routes:
+        if isinstance(route, APIRoute):
+            labels |= {f"{method} {route.path}" for method in route.methods}
+        elif route.path == "/ws":
+            labels.add("WS /ws")
+    return labels
+
+def covered_path(label):
+    """Route template a scenario label exercises"""
+    method, path = label.split(" ", 1)
+    path = path.split("?")[0].replace(":id", "{id}")
+    return method, path
+
+def uncovered(results):
+    exercised = {covered_path(label) for label in results}
+    missing = []
+    for label in sorted(app_routes()):
+        method, path = label.split(" ", 1)
+        generic = path
+        for name in ("{task_id}", "{chat_id}", "{request_id}"):
+            generic = generic.replace(name, "{id}")
+        if (method, generic) not in exercised:
+            missing.append({"route": label, "reason": SKIPPED.get(label, "no scenario")})
+    return missing
+
+async def run(data: Dataset):
+    await main.app.router.startup()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for label, factory in scenarios(data):
+                # One untimed request warms caches the way steady traffic would
+                method, url, headers, kwargs = factory(0)
+                if method == "GET":
+                    await client.request(method, url, headers=headers, **kwargs)
+                results[label] = await measure(client, factory, args.requests)
+                print(f"{label:<46} p50 {results[label]['p50_ms']:>8.2f} ms  "
+                      f"p99 {results[label]['p99_ms']:>8.2f} ms  "
+                      f"queries {results[label]['queries']['mean']:>6.2f}  {results[label]['status']}")
+    finally:
+        await main.app.router.shutdown()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(report, baseline):
+    """Print per-route deltas; return the routes that regressed"""
+    regressions = []
+    print(f"\n{'route':<46} {'p50 ms':>18} {'queries/request':>18}")
+    for label, now in report["routes"].items():
+        before = baseline["routes"].get(label)
+        if before is None:
+            print(f"{label:<46} {'new':>18}")
+            continue
+        p50 = f"{before['p50_ms']:.2f} -> {now['p50_ms']:.2f}"
+        queries = f"{before['queries']['max']} -> {now['queries']['max']}"
+        flags = []
+        if now["queries"]["max"] > before["queries"]["max"]:
+            flags.append("more queries")
+        if args.latency_tolerance is not None and now["p50_ms"] > before["p50_ms"] * (1 + args.latency_tolerance):
+            flags.append("slower")
+        if flags:
+            regressions.append(label)
+        print(f"{label:<46} {p50:>18} {queries:>18}  {', '.join(flags)}")
+    return regressions
+
+def main_cli():
+    data = Dataset(args.users, args.friends, args.requests)
+    start = time.perf_counter()
+    seed(data)
+    print(f"seeded {data.n_users} users in {time.perf_counter() - start:.1f}s\n")
+
+    results = asyncio.run(run(data))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "dialect": async_engine.dialect.name,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "volumes": {
+                "users": data.n_users, "friends": args.friends, "messages_per_chat": args.messages,
+                "custom_tasks": args.custom_tasks, "statuses_per_user": args.statuses,
+                "session_days": args.session_days, "seed": args.seed,
+            },
+            "requests_per_route": args.requests,
+        },
+        "routes": results,
+        "uncovered": uncovered(results),
+    }
+    for route in report["uncovered"]:
+        print(f"not benchmarked: {route['route']} ({route['reason']})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nreport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f))
+        if regressions:
+            print(f"\n❌ {len(regressions)} routes regressed: {regressions}")
+            return 1
+        print("\n✅ no regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
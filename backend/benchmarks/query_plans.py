@@ -0,0 +1,193 @@
+"""
+Check that every query the API routes issue is answered from an index
+
+Migrates a throwaway database, drives each route through the real app,
+captures the SQL it runs and EXPLAINs every statement. Any full scan of a
+table that isn't listed in ALLOWED_SCANS fails the check, so a missing
+index shows up here before it shows up as a slow endpoint.
+
+On PostgreSQL sequential scans are disabled while explaining, so a seq scan
+in the plan means no index could serve the query at all.
+
+Usage (from backend/):
+    python benchmarks/query_plans.py                       # temp SQLite file
+    python benchmarks/query_plans.py --database-url postgresql://.../empty_db
+    python benchmarks/query_plans.py --verbose             # print every plan
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+
+parser = argparse.ArgumentParser(description="EXPLAIN every query the API routes run")
+parser.add_argument("--database-url", help="existing empty database to use instead of a temp SQLite file")
+parser.add_argument("--verbose", action="store_true")
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plans.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import event
+
+import deletion
+import main
+import models
+from database import AsyncSessionLocal, async_engine
+
+# (route, table) pairs where a full scan is expected, with the reason
+ALLOWED_SCANS = {
+    # Suggestions with an empty query walk users in primary-key order and stop at the page size
+    ("GET /api/friends/search?q=", "users"),
+}
+
+TABLES = set(models.Base.metadata.tables)
+
+captured = []  # (route, statement, parameters)
+current_route = None
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def capture(conn, cursor, statement, parameters, context, executemany):
+    if current_route and not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+        captured.append((current_route, statement, parameters))
+
+async def drive_routes():
+    """Call every route at least once, as three users with some history"""
+    global current_route
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://plans") as client:
+
+        async def call(method, path, headers=None, label=None, **kwargs):
+            global current_route
+            current_route = label or f"{method} {path}"
+            response = await client.request(method, path, headers=headers, **kwargs)
+            current_route = None
+            assert response.status_code < 400, f"{method} {path}: {response.status_code} {response.text}"
+            return response.json()
+
+        headers = {}
+        for name in ("alice", "bob", "carol"):
+            await call("POST", "/api/auth/signup", json={
+                "email": f"{name}@example.com", "username": name, "password": "plans-password"
+            })
+            token = await call("POST", "/api/auth/signin", data={
+                "username": f"{name}@example.com", "password": "plans-password"
+            })
+            headers[name] = {"Authorization": f"Bearer {token['access_token']}"}
+        alice, bob, carol = headers["alice"], headers["bob"], headers["carol"]
+
+        task = await call("POST", "/api/tasks", alice, json={
+            "title": "Plan", "description": "Check plans", "level": "beginner", "type": "Coding"
+        })
+        await call("PUT", f"/api/tasks/{task['id']}/status", alice, json={"status": "progress"})
+        await call("PUT", f"/api/tasks/{task['id']}/status", alice, json={"status": "done"})
+        await call("GET", "/api/tasks", alice)
+        await call("GET", "/api/tasks?level=beginner", alice, label="GET /api/tasks?level=")
+
+        await call("GET", "/api/user/profile", alice)
+        await call("PUT", "/api/user/profile", alice, json={"bio": "hello", "username": "alice"})
+
+        bob_id = (await call("GET", "/api/user/profile", bob))["id"]
+        carol_id = (await call("GET", "/api/user/profile", carol))["id"]
+        await call("POST", "/api/friends/request", alice, json={"user_id": bob_id})
+        await call("POST", "/api/friends/request", alice, json={"user_id": carol_id})
+        pending = await call("GET", "/api/friends/requests", bob)
+        await call("PUT", f"/api/friends/requests/{pending[0]['id']}/accept", bob, label="PUT /api/friends/requests/:id/accept")
+        pending = await call("GET", "/api/friends/requests", carol)
+        await call("PUT", f"/api/friends/requests/{pending[0]['id']}/decline", carol, label="PUT /api/friends/requests/:id/decline")
+        await call("GET", "/api/friends", alice)
+        for q in ("", "b", "bo", "bob", "arol"):
+            page = await call("GET", f"/api/friends/search?q={q}", alice)
+        await call("GET", "/api/friends/search?q=&limit=1", alice, label="GET /api/friends/search?q=")
+
+        chat_id = (await call("GET", "/api/chats", alice))[0]["id"]
+        for i in range(3):
+            await call("POST", f"/api/chats/{chat_id}/messages", alice, json={"content": f"hi {i}"},
+                       label="POST /api/chats/:id/messages")
+        messages = await call("GET", f"/api/chats/{chat_id}/messages?limit=2", bob, label="GET /api/chats/:id/messages")
+        await call("GET", f"/api/chats/{chat_id}/messages?before={messages['next_cursor']}", bob,
+                   label="GET /api/chats/:id/messages?before=")
+        await call("PUT", f"/api/chats/{chat_id}/read", bob, label="PUT /api/chats/:id/read")
+        await call("GET", "/api/chats", bob)
+
+        for path in ("/api/progress/activity", "/api/progress/badges", "/api/progress/goals",
+                     "/api/leaderboard", "/api/leaderboard/me", "/api/leaderboard/around",
+                     "/api/leaderboard/friends"):
+            await call("GET", path, alice)
+
+        await call("DELETE", "/api/user/account", carol)
+
+    # The rows themselves are purged by the background worker
+    current_route = "deletion.purge"
+    await deletion.purge(AsyncSessionLocal, carol_id)
+    current_route = None
+
+def sqlite_scans(rows):
+    """Tables read by a full scan in an EXPLAIN QUERY PLAN result"""
+    scans = []
+    for row in rows:
+        detail = row[-1]
+        match = re.match(r"SCAN (\w+)", detail)
+        if match and "INDEX" not in detail and match.group(1) in TABLES:
+            scans.append(match.group(1))
+    return scans, "\n".join(f"  {row[-1]}" for row in rows)
+
+def postgresql_scans(rows):
+    plan = rows[0][0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    scans = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan":
+            scans.append(node["Relation Name"])
+        for child in node.get("Plans", ()):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return scans, json.dumps(plan[0]["Plan"], indent=2)
+
+async def explain_all():
+    seen = set()
+    failures = []
+    async with async_engine.connect() as conn:
+        dialect = conn.dialect.name
+        if dialect == "postgresql":
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+        for route, statement, parameters in captured:
+            if (route, statement) in seen:
+                continue
+            seen.add((route, statement))
+            if dialect == "postgresql":
+                result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                scans, plan = postgresql_scans(result.all())
+            else:
+                result = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+                scans, plan = sqlite_scans(result.all())
+            bad = [table for table in scans if (route, table) not in ALLOWED_SCANS]
+            if args.verbose or bad:
+                print(f"{'FULL SCAN of ' + ', '.join(bad) if bad else 'ok'}  [{route}]")
+                print("  " + " ".join(statement.split())[:300])
+                print(plan + "\n")
+            if bad:
+                failures.append(route)
+        await conn.rollback()
+    return len(seen), failures
+
+async def run():
+    await main.app.router.startup()
+    try:
+        await drive_routes()
+    finally:
+        await main.app.router.shutdown()
+    return await explain_all()
+
+if __name__ == "__main__":
+    checked, failures = asyncio.run(run())
+    if failures:
+        print(f"❌ {len(failures)} of {checked} statements scan a table: {sorted(set(failures))}")
+        sys.exit(1)
+    print(f"✅ {checked} statements across the API routes all use an index")
@@ -0,0 +1,187 @@
+"""
+Serialization cost of the list endpoints: FastAPI's default path versus
+the fastjson path
+
+For each response shape the same 10k-element data set is fetched once in
+both forms (ORM objects for the old handlers, column rows for the new
+ones), then only the per-request work is timed:
+
+- default: the dicts the old handlers built (**obj.__dict__ or ORM
+  objects), validated against the response_model by FastAPI's
+  serialize_response and encoded by JSONResponse (stdlib json)
+- fastjson: rows picked into dicts / TaskRow dataclasses and encoded by
+  orjson
+
+Usage (from backend/):
+    python benchmarks/serialization.py --size 10000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description="Time list response serialization")
+parser.add_argument("--size", type=int, default=10000, help="elements per response")
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'serialization.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataclasses import replace
+from typing import List
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import insert, select
+
+import catalog
+import fastjson
+import models
+import schemas
+from database import SessionLocal, run_migrations
+
+def populate(db, n):
+    now = datetime.utcnow()
+    db.execute(insert(models.User), [
+        {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "display_name": f"User {i}",
+         "hashed_password": "x", "avatar_url": f"https://cdn.example.com/{i}.png", "created_at": now, "updated_at": now}
+        for i in range(1, n + 2)
+    ])
+    db.execute(insert(models.Task), [
+        {"id": i, "title": f"Task {i}", "description": "Do the thing " * 4, "level": "beginner",
+         "type": "Coding", "icon": "📝", "user_id": 1, "created_at": now}
+        for i in range(1, n + 1)
+    ])
+    db.execute(insert(models.UserTask), [
+        {"user_id": 1, "task_id": i, "status": "done", "created_at": now, "updated_at": now}
+        for i in range(1, n + 1, 3)
+    ])
+    db.execute(insert(models.Friendship), [
+        {"id": i, "user_id": 1, "friend_id": i + 1, "status": "accepted", "created_at": now} for i in range(1, n + 1)
+    ])
+    db.execute(insert(models.Message), [
+        {"id": i, "sender_id": 1 + i % 2, "receiver_id": 2 - i % 2, "content": f"message number {i}",
+         "is_read": bool(i % 3), "created_at": now + timedelta(seconds=i)}
+        for i in range(1, n + 1)
+    ])
+    db.commit()
+
+def default_path(content, response_model):
+    field = create_response_field(name="response", type_=response_model)
+    serialized = asyncio.run(serialize_response(field=field, response_content=content))
+    return JSONResponse(serialized).body
+
+def tasks_case(db):
+    orm_tasks = db.scalars(select(models.Task)).all()
+    rows = db.execute(select(*catalog.TASK_COLUMNS)).all()
+    statuses = dict(db.execute(select(models.UserTask.task_id, models.UserTask.status)).all())
+
+    def default():
+        content = [{**task.__dict__, "status": statuses.get(task.id, "pending")} for task in orm_tasks]
+        return default_path(content, List[schemas.TaskResponse])
+
+    def fast():
+        result = []
+        for task in (catalog.TaskRow(*row) for row in rows):
+            status = statuses.get(task.id, "pending")
+            result.append(task if status == task.status else replace(task, status=status))
+        return orjson.dumps(result)
+
+    return default, fast
+
+def messages_case(db):
+    orm_messages = db.scalars(select(models.Message)).all()
+    rows = db.execute(select(*fastjson.columns(models.Message, schemas.MessageResponse))).all()
+
+    def default():
+        return default_path({"messages": orm_messages, "has_more": False, "next_cursor": None}, schemas.MessagePage)
+
+    def fast():
+        return orjson.dumps({
+            "messages": [fastjson.pick(row, schemas.MessageResponse) for row in rows],
+            "has_more": False,
+            "next_cursor": None,
+        })
+
+    return default, fast
+
+def friends_case(db):
+    orm_users = db.scalars(select(models.User).where(models.User.id > 1)).all()
+    rows = db.execute(select(*fastjson.columns(models.User, schemas.FriendResponse)).where(models.User.id > 1)).all()
+
+    def default():
+        return default_path(list(orm_users), List[schemas.FriendResponse])
+
+    def fast():
+        return orjson.dumps([fastjson.pick(row, schemas.FriendResponse) for row in rows])
+
+    return default, fast
+
+def chats_case(db):
+    # One chat per friend, each with a last message
+    friends = db.scalars(select(models.User).where(models.User.id > 1)).all()
+    messages = db.scalars(select(models.Message)).all()
+    rows = db.execute(
+        select(
+            models.Friendship.id.label("friendship_id"),
+            *fastjson.columns(models.User, schemas.FriendResponse, "friend_"),
+            *fastjson.columns(models.Message, schemas.MessageResponse, "message_"),
+            models.Friendship.id.label("unread_count"),
+        )
+        .join(models.User, models.User.id == models.Friendship.friend_id)
+        .join(models.Message, models.Message.id == models.Friendship.id)
+    ).all()
+
+    def default():
+        content = [
+            {"id": i, "friend": friend, "last_message": message, "unread_count": i}
+            for i, (friend, message) in enumerate(zip(friends, messages))
+        ]
+        return default_path(content, List[schemas.ChatResponse])
+
+    def fast():
+        return orjson.dumps([
+            {
+                "id": row.friendship_id,
+                "friend": fastjson.pick(row, schemas.FriendResponse, "friend_"),
+                "last_message": fastjson.pick(row, schemas.MessageResponse, "message_") if row.message_id else None,
+                "unread_count": row.unread_count,
+            }
+            for row in rows
+        ])
+
+    return default, fast
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+def main():
+    run_migrations()
+    db = SessionLocal()
+    populate(db, args.size)
+
+    print(f"{args.size} elements per response, best of {args.repeat}")
+    print(f"{'endpoint':<10} {'default ms':>11} {'fastjson ms':>12} {'speedup':>8} {'bytes':>10}")
+    for name, case in (("tasks", tasks_case), ("messages", messages_case),
+                       ("friends", friends_case), ("chats", chats_case)):
+        default, fast = case(db)
+        slow_time, slow_bytes = best_of(default, args.repeat)
+        fast_time, fast_bytes = best_of(fast, args.repeat)
+        print(f"{name:<10} {slow_time * 1000:>11.1f} {fast_time * 1000:>12.1f} "
+              f"{slow_time / fast_time:>7.1f}x {fast_bytes:>10}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
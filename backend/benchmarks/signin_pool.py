@@ -0,0 +1,70 @@
+"""
+Signin throughput versus password hashing pool size
+
+Runs the real /api/auth/signin handler in-process against a throwaway SQLite
+database and fires concurrent logins for each pool size.
+
+Usage (from backend/):
+    python benchmarks/signin_pool.py --sizes 1 2 4 8 --requests 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+import passwords
+
+async def bench(sizes, requests, concurrency):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/api/auth/signup", json={
+            "email": "bench@example.com", "username": "bench", "password": "benchmark-pw"
+        })
+        form = {"username": "bench@example.com", "password": "benchmark-pw"}
+
+        print(f"{'pool':>5} {'ok':>5} {'503':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for size in sizes:
+            passwords.hash_pool.shutdown()
+            passwords.hash_pool = passwords.HashPool(size, max(concurrency, size))
+            main.hash_pool = passwords.hash_pool
+            # Warm up the worker processes so spawn cost isn't measured
+            await asyncio.gather(*(client.post("/api/auth/signin", data=form) for _ in range(size)))
+
+            sem = asyncio.Semaphore(concurrency)
+            latencies, codes = [], []
+
+            async def one():
+                async with sem:
+                    start = time.perf_counter()
+                    r = await client.post("/api/auth/signin", data=form)
+                    latencies.append(time.perf_counter() - start)
+                    codes.append(r.status_code)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            elapsed = time.perf_counter() - start
+
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            print(f"{size:>5} {codes.count(200):>5} {codes.count(503):>5} "
+                  f"{requests / elapsed:>8.1f} {p50:>8.1f} {p99:>8.1f}")
+        passwords.hash_pool.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(bench(args.sizes, args.requests, args.concurrency))
@@ -0,0 +1,149 @@
+"""
+Check streak bookkeeping at day boundaries and across gaps
+
+Each scenario is a sequence of session days for one user, replayed in
+order through the write path (tasks.record_completion and the CASE update
+in user_stats.record_task_change) on a temporary SQLite database. The
+stored (current, longest, last_active_date) must equal the hand-computed
+answer and what streaks_query derives from the sessions table:
+
+- month, year and leap-day rollovers;
+- several sessions on the same day;
+- gaps of one and of several days;
+- a run that ended before today (current_streak() shows 0 for it);
+- random histories, incremental versus set-based.
+
+Usage (from backend/):
+    python benchmarks/streaks_check.py
+    python benchmarks/streaks_check.py --random-users 500 --seed 7
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+parser = argparse.ArgumentParser(description="Compare incremental and set-based streaks")
+parser.add_argument("--random-users", type=int, default=200)
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'streaks.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+import models
+import streaks
+import tasks
+import user_stats
+from database import AsyncSessionLocal, SessionLocal, run_migrations
+
+D = date.fromisoformat
+
+# name -> (session days in the order they happen, expected (current, longest, last day))
+SCENARIOS = {
+    "month rollover": (["2025-01-30", "2025-01-31", "2025-02-01", "2025-02-02"], (4, 4, "2025-02-02")),
+    "year rollover": (["2024-12-30", "2024-12-31", "2025-01-01"], (3, 3, "2025-01-01")),
+    "leap day": (["2024-02-28", "2024-02-29", "2024-03-01"], (3, 3, "2024-03-01")),
+    "no leap day": (["2023-02-28", "2023-03-01"], (2, 2, "2023-03-01")),
+    "same day twice": (["2025-03-10", "2025-03-10", "2025-03-11", "2025-03-11", "2025-03-11"], (2, 2, "2025-03-11")),
+    "one missed day": (["2025-03-01", "2025-03-02", "2025-03-04"], (1, 2, "2025-03-04")),
+    "longer gap": (["2025-03-01", "2025-03-02", "2025-03-03", "2025-03-04", "2025-03-08", "2025-03-09"],
+                   (2, 4, "2025-03-09")),
+    "longest run first": (["2025-04-01", "2025-04-02", "2025-04-03", "2025-04-10", "2025-04-20", "2025-04-21"],
+                          (2, 3, "2025-04-21")),
+    "single day": (["2025-06-15"], (1, 1, "2025-06-15")),
+}
+
+failures = 0
+
+def check(label, ok, detail=""):
+    global failures
+    print(f"{'✅' if ok else '❌'} {label}{': ' + detail if detail else ''}")
+    failures += not ok
+
+def create_users(count: int) -> list:
+    db = SessionLocal()
+    first = len(db.query(models.User.id).all()) + 1
+    db.execute(insert(models.User), [
+        {"id": first + i, "email": f"streak{first + i}@example.com", "username": f"streak{first + i}",
+         "display_name": "Streak", "hashed_password": "-"}
+        for i in range(count)
+    ])
+    db.execute(insert(models.UserStats), [{"user_id": first + i} for i in range(count)])
+    db.commit()
+    db.close()
+    return list(range(first, first + count))
+
+async def replay(user_id: int, days):
+    """One completion per day in order, the way apply_status_changes records it"""
+    for day in days:
+        async with AsyncSessionLocal() as db:
+            await tasks.record_completion(db, user_id, day)
+            await user_stats.record_task_change(db, user_id, completed_delta=1, active_day=day)
+            await db.commit()
+
+async def stored(user_id: int):
+    async with AsyncSessionLocal() as db:
+        stats = await db.get(models.UserStats, user_id)
+        return stats, (stats.current_streak, stats.longest_streak, stats.last_active_date)
+
+def from_sessions(user_ids):
+    db = SessionLocal()
+    try:
+        return streaks.recompute(db, user_ids)
+    finally:
+        db.close()
+
+async def run():
+    run_migrations()
+
+    # 1. Hand-computed scenarios
+    user_ids = create_users(len(SCENARIOS))
+    for user_id, days in zip(user_ids, (days for days, _ in SCENARIOS.values())):
+        await replay(user_id, [D(day) for day in days])
+    recomputed = from_sessions(user_ids)
+    for user_id, (name, (_, (current, longest, last))) in zip(user_ids, SCENARIOS.items()):
+        expected = (current, longest, D(last))
+        _, incremental = await stored(user_id)
+        check(f"{name}: incremental", incremental == expected, f"{incremental} vs {expected}")
+        check(f"{name}: streaks_query", recomputed.get(user_id) == expected, f"{recomputed.get(user_id)} vs {expected}")
+
+    # 2. A run that ended before today is stored as is but shown as 0
+    stats, _ = await stored(user_ids[list(SCENARIOS).index("year rollover")])
+    last = stats.last_active_date
+    shown = [user_stats.current_streak(stats, last + timedelta(days=offset)) for offset in (0, 1, 2, 30)]
+    check("ended run shows only on its last day", shown == [3, 0, 0, 0], str(shown))
+
+    # 3. Random histories: bursts of consecutive days, repeats and gaps
+    rng = random.Random(args.seed)
+    user_ids = create_users(args.random_users)
+    histories = {}
+    for user_id in user_ids:
+        day = date(2023, 12, 1) + timedelta(days=rng.randrange(120))
+        days = []
+        for _ in range(rng.randint(1, 12)):
+            for _ in range(rng.randint(1, 6)):
+                days.extend([day] * rng.choice((1, 1, 1, 2)))
+                day += timedelta(days=1)
+            day += timedelta(days=rng.choice((1, 1, 2, 3, 10, 40)))
+        histories[user_id] = days
+    for user_id, days in histories.items():
+        await replay(user_id, days)
+    recomputed = from_sessions(user_ids)
+    mismatched = [user_id for user_id in user_ids if (await stored(user_id))[1] != recomputed.get(user_id)]
+    check(f"{len(user_ids)} random histories agree", not mismatched, f"mismatched users {mismatched[:10]}")
+
+    db = SessionLocal()
+    try:
+        check("user_stats.py verify finds no drift", user_stats.verify_streaks(db) == [])
+    finally:
+        db.close()
+
+asyncio.run(run())
+sys.exit(1 if failures else 0)
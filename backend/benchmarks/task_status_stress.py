@@ -0,0 +1,160 @@
+"""
+Concurrency stress test for task status updates
+
+Fires parallel PUT /api/tasks/{id}/status requests through the real app and
+checks that no rows are duplicated and no counters drift:
+
+1. every task is marked done by several "devices" at once: each must count
+   exactly once in completed_tasks, points and today's session task_count;
+2. random status changes race on the same tasks: user_stats must still
+   match the user_tasks table afterwards;
+3. several devices send the same "mark all done" batch at once through
+   PUT /api/tasks/status:batch: only one of them may count each task.
+
+Exits 1 if any check fails. The defaults (50 tasks, 4 devices, 500 random
+changes, 32 requests in flight) must pass on a temp SQLite file.
+
+Usage (from backend/):
+    python benchmarks/task_status_stress.py
+    python benchmarks/task_status_stress.py --tasks 200 --devices 8 --concurrency 64
+    python benchmarks/task_status_stress.py --database-url postgresql://.../empty_db
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description="Race task status updates and check the counters")
+parser.add_argument("--tasks", type=int, default=50)
+parser.add_argument("--devices", type=int, default=4, help="concurrent 'done' requests per task")
+parser.add_argument("--random", type=int, default=500, help="random concurrent status changes")
+parser.add_argument("--concurrency", type=int, default=32)
+parser.add_argument("--database-url", help="existing empty database to use instead of a temp SQLite file")
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+import httpx
+from sqlalchemy import func, select
+
+import main
+import models
+from database import AsyncSessionLocal
+
+async def fire(client, headers, updates, concurrency):
+    """Send (task_id, status) updates concurrently; return (elapsed, failures)"""
+    sem = asyncio.Semaphore(concurrency)
+    failures = []
+
+    async def one(task_id, status):
+        async with sem:
+            r = await client.put(f"/api/tasks/{task_id}/status", json={"status": status}, headers=headers)
+            if r.status_code != 200:
+                failures.append((task_id, status, r.status_code, r.text[:200]))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(task_id, status) for task_id, status in updates))
+    return time.perf_counter() - start, failures
+
+async def snapshot(user_id):
+    async with AsyncSessionLocal() as db:
+        stats = await db.get(models.UserStats, user_id)
+        rows = (await db.execute(
+            select(models.UserTask.task_id, func.count()).where(models.UserTask.user_id == user_id)
+            .group_by(models.UserTask.task_id)
+        )).all()
+        done = await db.scalar(select(func.count()).select_from(models.UserTask).where(
+            models.UserTask.user_id == user_id, models.UserTask.status == "done"
+        ))
+        sessions = (await db.execute(
+            select(models.Session.date, models.Session.task_count).where(models.Session.user_id == user_id)
+        )).all()
+        return stats, rows, done, sessions
+
+def check(label, condition, detail):
+    print(f"{'✅' if condition else '❌'} {label}: {detail}")
+    return condition
+
+async def run():
+    await main.app.router.startup()
+    ok = True
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://stress", timeout=60) as client:
+            await client.post("/api/auth/signup", json={
+                "email": "stress@example.com", "username": "stress", "password": "stress-password"
+            })
+            token = (await client.post("/api/auth/signin", data={
+                "username": "stress@example.com", "password": "stress-password"
+            })).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            user_id = (await client.get("/api/user/profile", headers=headers)).json()["id"]
+
+            task_ids = []
+            for i in range(args.tasks):
+                r = await client.post("/api/tasks", headers=headers, json={
+                    "title": f"Stress {i}", "description": "stress", "level": "beginner", "type": "Coding"
+                })
+                task_ids.append(r.json()["id"])
+
+            # 1. Several devices complete every task at the same moment
+            updates = [(task_id, "done") for task_id in task_ids for _ in range(args.devices)]
+            random.shuffle(updates)
+            elapsed, failures = await fire(client, headers, updates, args.concurrency)
+            print(f"phase 1: {len(updates)} requests in {elapsed:.2f}s ({len(updates) / elapsed:.0f} req/s)")
+            stats, rows, done, sessions = await snapshot(user_id)
+            today = datetime.now().date()
+            ok &= check("requests", not failures, failures[:3] or "all 200")
+            ok &= check("one row per task", all(count == 1 for _, count in rows) and len(rows) == args.tasks,
+                        f"{len(rows)} tasks, max {max(count for _, count in rows)} rows each")
+            ok &= check("completed once each", stats.completed_tasks == done == args.tasks,
+                        f"completed_tasks={stats.completed_tasks} done rows={done} expected={args.tasks}")
+            ok &= check("points", stats.points == args.tasks * main.user_stats.POINTS_PER_TASK, f"points={stats.points}")
+            ok &= check("session counter", sessions == [(today, args.tasks)], f"sessions={sessions}")
+
+            # 2. Random transitions racing on the same tasks
+            updates = [(random.choice(task_ids), random.choice(["pending", "progress", "done"])) for _ in range(args.random)]
+            elapsed, failures = await fire(client, headers, updates, args.concurrency)
+            print(f"phase 2: {len(updates)} requests in {elapsed:.2f}s ({len(updates) / elapsed:.0f} req/s)")
+            stats, rows, done, sessions = await snapshot(user_id)
+            ok &= check("requests", not failures, failures[:3] or "all 200")
+            ok &= check("one row per task", all(count == 1 for _, count in rows), f"{len(rows)} tasks")
+            ok &= check("total_tasks", stats.total_tasks == len(rows), f"{stats.total_tasks} vs {len(rows)} rows")
+            ok &= check("completed_tasks", stats.completed_tasks == done, f"{stats.completed_tasks} vs {done} done rows")
+            ok &= check("points", stats.points == done * main.user_stats.POINTS_PER_TASK, f"points={stats.points}")
+            ok &= check("one session per day", len(sessions) == len({day for day, _ in sessions}), f"sessions={sessions}")
+
+            # 3. Reset everything, then several devices mark all done in one batch each
+            r = await client.put("/api/tasks/status:batch", headers=headers,
+                                 json=[{"task_id": task_id, "status": "pending"} for task_id in task_ids])
+            ok &= check("reset batch", r.status_code == 200 and all(item["updated"] for item in r.json()), r.status_code)
+            before, _, _, before_sessions = await snapshot(user_id)
+            batch = [{"task_id": task_id, "status": "done"} for task_id in task_ids]
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.put("/api/tasks/status:batch", json=batch, headers=headers) for _ in range(args.devices)
+            ))
+            elapsed = time.perf_counter() - start
+            print(f"phase 3: {args.devices} batches of {len(batch)} in {elapsed:.2f}s")
+            stats, rows, done, sessions = await snapshot(user_id)
+            ok &= check("requests", all(r.status_code == 200 for r in responses), [r.status_code for r in responses])
+            ok &= check("one row per task", all(count == 1 for _, count in rows), f"{len(rows)} tasks")
+            ok &= check("completed_tasks", stats.completed_tasks == done == len(rows),
+                        f"{stats.completed_tasks} vs {done} done rows")
+            ok &= check("points", stats.points == done * main.user_stats.POINTS_PER_TASK, f"points={stats.points}")
+            today_before = dict(before_sessions).get(today, 0)
+            ok &= check("session counter", dict(sessions)[today] == today_before + len(rows),
+                        f"{today_before} -> {dict(sessions)[today]}, expected +{len(rows)}")
+    finally:
+        await main.app.router.shutdown()
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run()) else 1)
@@ -0,0 +1,97 @@
+"""
+User search latency: indexed search versus a plain ILIKE scan
+
+Seeds a freshly migrated throwaway database with synthetic users (1M by
+default) and times the first page of results for a mix of short,
+prefix and substring queries with both approaches.
+
+Usage (from backend/):
+    python benchmarks/user_search.py --users 1000000
+    python benchmarks/user_search.py --database-url postgresql://.../bench_db
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+parser.add_argument("--users", type=int, default=1_000_000)
+parser.add_argument("--database-url", help="existing empty database to use instead of a temp SQLite file")
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select
+
+import models
+import search
+from database import SessionLocal, engine, run_migrations
+
+SYLLABLES = ["ka", "ri", "to", "mo", "na", "le", "si", "dev", "an", "jo", "pi", "xu", "be", "ra", "el"]
+QUERIES = ["a", "ka", "kar", "dev", "mole", "user42", "ritonale", "zzzz"]
+PAGE_SIZE = 20
+
+def synthetic_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+def seed(count: int, chunk_size: int = 20_000):
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(0, count, chunk_size):
+            rows = []
+            for i in range(start, min(count, start + chunk_size)):
+                name = synthetic_name(rng)
+                username = f"{name}{i}" if rng.random() < 0.9 else f"user{i}"
+                rows.append({
+                    "email": f"{username}@bench.example",
+                    "username": username,
+                    "display_name": name.capitalize() + " " + rng.choice(string.ascii_uppercase),
+                    "hashed_password": "x",
+                })
+            conn.execute(insert(models.User), rows)
+
+def naive_query(q: str, user_id: int):
+    return select(models.User).where(
+        (models.User.username.ilike(f"%{q}%") | models.User.display_name.ilike(f"%{q}%")) &
+        (models.User.id != user_id)
+    ).limit(PAGE_SIZE)
+
+def timed(run) -> float:
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+if __name__ == "__main__":
+    run_migrations()
+    start = time.perf_counter()
+    seed(args.users)
+    print(f"seeded {args.users:,} users (indexes maintained) in {time.perf_counter() - start:.1f}s\n")
+
+    db = SessionLocal()
+    try:
+        print(f"{'query':<10} {'scan ms':>9} {'indexed ms':>11} {'speedup':>8}")
+        for q in QUERIES:
+            scan = timed(lambda: db.execute(naive_query(q, 1)).all())
+            indexed = timed(lambda: search.search_page(db, q, 1, PAGE_SIZE))
+            print(f"{q:<10} {scan:>9.2f} {indexed:>11.2f} {scan / indexed:>7.1f}x")
+
+        # Walking deep pages should cost the same as the first one
+        after, pages, start = None, 0, time.perf_counter()
+        while pages < 50:
+            page = search.search_page(db, "ka", 1, PAGE_SIZE, after)
+            pages += 1
+            if not page["next_cursor"]:
+                break
+            after = search.decode_cursor(page["next_cursor"])
+        print(f"\n{pages} keyset pages of 'ka': {(time.perf_counter() - start) * 1000 / pages:.2f} ms/page")
+    finally:
+        db.close()
@@ -0,0 +1,137 @@
+"""
+WebSocket fan-out load test
+
+Starts one uvicorn worker against a throwaway SQLite database, opens
+thousands of /ws connections spread over a set of users, then sends chat
+messages to those users and measures how long each event takes to reach
+every socket.
+
+Usage (from backend/):
+    python benchmarks/ws_fanout.py --sockets 2000 --users 20 --messages 50
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'ws.db')}",
+        # Signups are setup cost here, not what's being measured
+        ARGON2_MEMORY_COST="1024",
+        ARGON2_TIME_COST="1",
+        REALTIME_QUEUE_SIZE="1000",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+async def wait_ready(client: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await client.get("/health")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+async def signup(client: httpx.AsyncClient, name: str) -> tuple:
+    await client.post("/api/auth/signup", json={"email": f"{name}@bench.io", "username": name, "password": "pw"})
+    r = await client.post("/api/auth/signin", data={"username": f"{name}@bench.io", "password": "pw"})
+    token = r.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    me = (await client.get("/api/user/profile", headers=headers)).json()
+    return me["id"], token, headers
+
+async def run(args):
+    port = free_port()
+    server = start_server(port)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            await wait_ready(client)
+
+            sender_id, _, sender_headers = await signup(client, "sender")
+            receivers = []
+            for i in range(args.users):
+                user_id, token, headers = await signup(client, f"receiver{i}")
+                await client.post("/api/friends/request", json={"user_id": user_id}, headers=sender_headers)
+                request = (await client.get("/api/friends/requests", headers=headers)).json()[0]
+                await client.put(f"/api/friends/requests/{request['id']}/accept", headers=headers)
+                receivers.append((user_id, token, request["id"]))
+
+            # Open the sockets, spread evenly over the receivers
+            sockets = []
+            start = time.perf_counter()
+            for i in range(args.sockets):
+                user_id, token, chat_id = receivers[i % len(receivers)]
+                ws = await websockets.connect(f"ws://127.0.0.1:{port}/ws?token={token}", max_queue=None)
+                sockets.append((chat_id, ws))
+            print(f"opened {len(sockets)} sockets in {time.perf_counter() - start:.1f}s")
+
+            latencies = []
+
+            async def listen(chat_id, ws, expected):
+                got = 0
+                while got < expected:
+                    event = await ws.recv()
+                    if '"type":"message"' in event.replace(" ", ""):
+                        latencies.append(time.perf_counter() - sent_at[chat_id])
+                        got += 1
+
+            sent_at = {}
+            listeners = [
+                asyncio.create_task(listen(chat_id, ws, args.messages))
+                for chat_id, ws in sockets
+            ]
+            start = time.perf_counter()
+            for round_number in range(1, args.messages + 1):
+                for _, _, chat_id in receivers:
+                    sent_at[chat_id] = time.perf_counter()
+                    await client.post(f"/api/chats/{chat_id}/messages", json={"content": "ping"}, headers=sender_headers)
+                # Let this round reach every socket before the next overwrites sent_at
+                while len(latencies) < len(sockets) * round_number:
+                    await asyncio.sleep(0.001)
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*listeners)
+
+            latencies.sort()
+            pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+            print(f"delivered {len(latencies)} events in {elapsed:.1f}s "
+                  f"({len(latencies) / elapsed:.0f} events/s)")
+            print(f"send-to-receive latency ms: p50 {pct(0.5):.1f}  p95 {pct(0.95):.1f}  p99 {pct(0.99):.1f}")
+
+            for _, ws in sockets:
+                await ws.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+
+    # Both ends of every socket live on this machine
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.sockets * 2 + 256)), hard))
+    asyncio.run(run(args))
@@ -0,0 +1,110 @@
+"""
+Default task catalogue
+
+The default tasks (user_id IS NULL, created by seed.py) almost never
+change, yet GET /api/tasks used to read all of them on every request.
+Each worker now holds one immutable snapshot of them: frozen TaskRow
+dataclasses, grouped by level and shared by every request, so a request
+only queries the user's custom tasks and statuses and reuses the cached
+objects for every task it has no status for. orjson serializes the
+dataclasses directly (see fastjson.py).
+
+Whatever changes the default tasks calls bump_version() in the same
+transaction. A snapshot remembers the version it was built from; workers
+poll that one-row stamp every CATALOG_REFRESH_SECONDS and rebuild when it
+moved, the same way leaderboard.py converges on writes from other workers.
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass, fields
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+import models
+
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+
+# catalog_versions row for the default tasks
+TASKS = "tasks"
+
+@dataclass(frozen=True)
+class TaskRow:
+    """One GET /api/tasks item (the fields of schemas.TaskResponse)"""
+    id: int
+    title: str
+    description: str
+    level: str
+    type: str
+    icon: str
+    user_id: Optional[int]
+    created_at: datetime
+    status: str = "pending"
+
+# Task columns in TaskRow field order, so rows can be built positionally
+TASK_COLUMNS = tuple(getattr(models.Task, field.name) for field in fields(TaskRow) if field.name != "status")
+
+class Snapshot(NamedTuple):
+    version: int
+    tasks: Tuple[TaskRow, ...]
+    by_level: Mapping[str, Tuple[TaskRow, ...]]
+
+    def for_level(self, level: Optional[str]) -> Tuple[TaskRow, ...]:
+        return self.by_level.get(level, ()) if level else self.tasks
+
+_snapshot: Optional[Snapshot] = None
+
+async def _version(db: AsyncSession) -> int:
+    return await db.scalar(
+        select(models.CatalogVersion.version).where(models.CatalogVersion.name == TASKS)
+    ) or 0
+
+async def reload(db: AsyncSession) -> Snapshot:
+    """Rebuild the snapshot from the tasks table"""
+    global _snapshot
+    # Read the stamp first: a bump racing with the load only causes one
+    # extra rebuild on the next poll, never a stale snapshot that looks fresh
+    version = await _version(db)
+    rows = (await db.execute(
+        select(*TASK_COLUMNS).where(models.Task.user_id == None).order_by(models.Task.id)
+    )).all()
+    tasks = tuple(TaskRow(*row) for row in rows)
+    by_level = {}
+    for task in tasks:
+        by_level.setdefault(task.level, []).append(task)
+    _snapshot = Snapshot(version, tasks, MappingProxyType({level: tuple(group) for level, group in by_level.items()}))
+    return _snapshot
+
+async def get(db: AsyncSession) -> Snapshot:
+    """The current snapshot, loading it on first use"""
+    return _snapshot or await reload(db)
+
+async def refresh_if_stale(db: AsyncSession):
+    if _snapshot is None or await _version(db) != _snapshot.version:
+        await reload(db)
+
+async def refresh_periodically(session_factory, interval: float = CATALOG_REFRESH_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        async with session_factory() as db:
+            await refresh_if_stale(db)
+
+def bump_version(db: Session):
+    """Mark the default tasks as changed (no commit)
+
+    Call it in the transaction that changes them; async handlers can use
+    `await db.run_sync(catalog.bump_version)`.
+    """
+    now = datetime.utcnow()
+    insert = dialect_insert(db)
+    stmt = insert(models.CatalogVersion).values(name=TASKS, version=1, updated_at=now)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.CatalogVersion.name],
+        set_={"version": models.CatalogVersion.version + 1, "updated_at": stmt.excluded.updated_at},
+    ))
@@ -0,0 +1,69 @@
+"""
+Conditional GET for read-heavy endpoints
+
+A handler first derives a cheap version of what it is about to return
+(counters, updated_at columns, in-memory state) and passes it to
+not_modified(). When the client's If-None-Match names that version the
+handler returns the 304 straight away and skips the full query;
+otherwise the validators are attached to the normal response.
+
+Responses are per user, so they are marked private and must be
+revalidated on every use.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"
+
+def fingerprint(*parts) -> str:
+    """Short stable digest of the parts' reprs"""
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+def etag_for(*parts) -> str:
+    return f'"{fingerprint(*parts)}"'
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison: intermediaries may have weakened our tag
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return last_modified.replace(microsecond=0) <= since.astimezone(timezone.utc).replace(tzinfo=None)
+
+def not_modified(
+    request: Request,
+    response: Response,
+    *version,
+    last_modified: Optional[datetime] = None,
+) -> Optional[Response]:
+    """304 response if the client's copy is current, else None after
+    setting ETag (and Last-Modified) on the response being built
+
+    Only pass last_modified (naive UTC) when it alone captures every
+    change to the payload; If-Modified-Since is ignored whenever the
+    client also sent If-None-Match.
+    """
+    headers = {"ETag": etag_for(request.url.path, *version), "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, headers["ETag"])
+    else:
+        fresh = bool(last_modified and if_modified_since and _not_modified_since(if_modified_since, last_modified))
+    if fresh:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,168 @@
+"""
+Denormalized conversation rows behind the chat list
+
+Each accepted friendship has a conversations row holding its latest
+message and an unread counter per participant, so /api/chats is a single
+indexed query. send_message and mark_as_read keep the row current; the
+backfill rebuilds rows from the messages table.
+
+Usage:
+    python conversations.py backfill [--chunk-size 1000]
+"""
+
+import argparse
+from typing import List
+
+from sqlalchemy import and_, case, delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+
+def unread_count_for(user_id: int):
+    """Column expression for user_id's unread counter, whichever side they are"""
+    return case(
+        (models.Conversation.user_id == user_id, models.Conversation.user_unread_count),
+        else_=models.Conversation.friend_unread_count,
+    )
+
+# ===========================
+# REBUILD FROM MESSAGES
+# ===========================
+
+def rebuild(db: Session, friendship_ids: List[int]):
+    """Recompute and replace conversation rows for accepted friendships (no commit)"""
+    if not friendship_ids:
+        return
+
+    friendships = select(
+        models.Friendship.id, models.Friendship.user_id, models.Friendship.friend_id
+    ).where(
+        models.Friendship.id.in_(friendship_ids),
+        models.Friendship.status == "accepted",
+    ).subquery()
+    between_friends = or_(
+        and_(models.Message.sender_id == friendships.c.user_id, models.Message.receiver_id == friendships.c.friend_id),
+        and_(models.Message.sender_id == friendships.c.friend_id, models.Message.receiver_id == friendships.c.user_id),
+    )
+
+    # Latest message per friendship
+    latest = select(
+        friendships.c.id.label("friendship_id"),
+        models.Message.id,
+        models.Message.created_at,
+        func.row_number().over(
+            partition_by=friendships.c.id,
+            order_by=(models.Message.created_at.desc(), models.Message.id.desc()),
+        ).label("recency"),
+    ).join(models.Message, between_friends).subquery()
+    last_messages = {
+        row.friendship_id: (row.id, row.created_at)
+        for row in db.execute(select(latest).where(latest.c.recency == 1))
+    }
+
+    unread = {
+        (friendship_id, receiver_id): count
+        for friendship_id, receiver_id, count in db.execute(
+            select(friendships.c.id, models.Message.receiver_id, func.count())
+            .join(models.Message, between_friends)
+            .where(models.Message.is_read == False)
+            .group_by(friendships.c.id, models.Message.receiver_id)
+        )
+    }
+
+    rows = []
+    for friendship_id, user_id, friend_id in db.execute(select(friendships)):
+        last_id, last_at = last_messages.get(friendship_id, (None, None))
+        rows.append({
+            "friendship_id": friendship_id,
+            "user_id": user_id,
+            "friend_id": friend_id,
+            "last_message_id": last_id,
+            "last_message_at": last_at,
+            "user_unread_count": unread.get((friendship_id, user_id), 0),
+            "friend_unread_count": unread.get((friendship_id, friend_id), 0),
+        })
+    db.execute(delete(models.Conversation).where(models.Conversation.friendship_id.in_(friendship_ids)))
+    if rows:
+        db.execute(insert(models.Conversation), rows)
+
+def backfill(db: Session, chunk_size: int = 1000) -> int:
+    """Rebuild conversations for every accepted friendship, committing per chunk"""
+    done = 0
+    last_id = 0
+    while True:
+        friendship_ids = db.scalars(
+            select(models.Friendship.id)
+            .where(models.Friendship.id > last_id, models.Friendship.status == "accepted")
+            .order_by(models.Friendship.id)
+            .limit(chunk_size)
+        ).all()
+        if not friendship_ids:
+            return done
+        rebuild(db, list(friendship_ids))
+        db.commit()
+        done += len(friendship_ids)
+        last_id = friendship_ids[-1]
+
+# ===========================
+# INCREMENTAL UPDATES
+# ===========================
+
+async def record_message(db: AsyncSession, friendship_id: int, message: models.Message):
+    """Make message the latest in its conversation and bump the receiver's unread count"""
+    result = await db.execute(
+        update(models.Conversation)
+        .where(models.Conversation.friendship_id == friendship_id)
+        .values(
+            last_message_id=message.id,
+            last_message_at=message.created_at,
+            user_unread_count=case(
+                (models.Conversation.user_id == message.receiver_id, models.Conversation.user_unread_count + 1),
+                else_=models.Conversation.user_unread_count,
+            ),
+            friend_unread_count=case(
+                (models.Conversation.friend_id == message.receiver_id, models.Conversation.friend_unread_count + 1),
+                else_=models.Conversation.friend_unread_count,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # No row yet (not backfilled): build it from messages, this one included
+    if result.rowcount == 0:
+        await db.flush()
+        await db.run_sync(rebuild, [friendship_id])
+
+async def record_read(db: AsyncSession, friendship_id: int, user_id: int):
+    """Clear user_id's unread counter for the conversation"""
+    await db.execute(
+        update(models.Conversation)
+        .where(models.Conversation.friendship_id == friendship_id)
+        .values(
+            user_unread_count=case(
+                (models.Conversation.user_id == user_id, 0),
+                else_=models.Conversation.user_unread_count,
+            ),
+            friend_unread_count=case(
+                (models.Conversation.friend_id == user_id, 0),
+                else_=models.Conversation.friend_unread_count,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+if __name__ == "__main__":
+    from database import SessionLocal, run_migrations
+
+    parser = argparse.ArgumentParser(description="Maintain the conversations table")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    run_migrations()
+    db = SessionLocal()
+    try:
+        count = backfill(db, args.chunk_size)
+        print(f"✅ Rebuilt {count} conversations")
+    finally:
+        db.close()
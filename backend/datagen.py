@@ -0,0 +1,321 @@
+"""
+Synthetic production-scale data for local load and query-plan testing
+
+Generates users, task statuses, sessions, friendships and messages with
+the skew real usage has: a few users with thousands of friends and most
+with a handful, conversations that arrive in bursts separated by long
+silences, and session histories made of streaks rather than scattered
+days. Every table is produced by a generator and written in fixed-size
+batches (COPY on PostgreSQL, executemany INSERTs elsewhere), so memory
+stays flat however many rows are asked for.
+
+Output depends only on the seed and the volume options. Each user's
+profile and friend list is drawn from an RNG seeded with (seed, user id)
+and can be re-derived on demand, which is how friendships are kept
+unique and messages line up with them without holding either in memory.
+
+Usage (from backend/):
+    python seed.py generate --users 100000
+    python seed.py generate --users 1000000 --days 365 --seed 7
+"""
+
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+import badges
+import conversations
+import models
+import passwords
+import user_stats
+
+DEFAULT_PASSWORD = "trackitnow"
+
+# Separate RNG streams so changing one table's generator leaves the others alone
+USERS, TASKS, SESSIONS, FRIENDS, MESSAGES = range(5)
+
+STATUSES = ("pending", "progress", "done")
+LOCATIONS = ("Berlin", "Bengaluru", "Lagos", "London", "New York", "São Paulo", "Tokyo", None, None, None)
+PHRASES = (
+    "done with today's run", "how far did you get?", "that problem took me an hour",
+    "streak still alive", "let's do the 5km tomorrow", "nice!", "haha", "ok",
+    "can you review my solution?", "skipping today, back tomorrow", "same time tomorrow?",
+)
+
+class Volumes(NamedTuple):
+    users: int
+    days: int = 180              # history length; signups and activity fall inside it
+    friends: float = 8.0         # mean friend requests a user sends
+    max_friends: int = 5000
+    messages: float = 20.0       # mean messages per accepted friendship
+    max_messages: int = 5000
+    batch_size: int = 10000
+
+class Generator:
+    """Deterministic row generators for one (seed, volumes) pair"""
+
+    def __init__(self, seed: int, volumes: Volumes, first_user_id: int, task_ids: Sequence[int], now: datetime):
+        self.seed = seed
+        self.volumes = volumes
+        self.first_id = first_user_id
+        self.last_id = first_user_id + volumes.users - 1
+        self.task_ids = list(task_ids)
+        self.now = now
+        self.start = now - timedelta(days=volumes.days)
+
+        # Popularity is Zipf-like in a user's rank; ranks are spread over ids
+        # with an affine permutation so popular users aren't all low ids
+        n = volumes.users
+        self._stride = next(a for a in range(max(2, int(n * 0.618)), 2 * n + 2) if _gcd(a, n) == 1) if n > 1 else 1
+
+    def rng(self, stream: int, key: int) -> random.Random:
+        return random.Random((self.seed << 48) ^ (stream << 40) ^ key)
+
+    # ===========================
+    # PER-USER PROFILE
+    # ===========================
+
+    def profile(self, user_id: int) -> Tuple[datetime, float]:
+        """(signup time, engagement in 0..1) for a user"""
+        return self._draw_profile(self.rng(USERS, user_id))
+
+    def _draw_profile(self, rng: random.Random) -> Tuple[datetime, float]:
+        # Growth: more signups towards the end of the window
+        signup = self.now - timedelta(days=self.volumes.days * rng.random() ** 2, seconds=rng.randrange(86400))
+        return max(signup, self.start), rng.betavariate(0.7, 2.0)
+
+    def popular_user(self, rng: random.Random) -> int:
+        """A user id drawn with probability roughly proportional to 1/rank"""
+        n = self.volumes.users
+        rank = min(n - 1, int(n ** rng.random()) - 1)
+        return self.first_id + (rank * self._stride) % n
+
+    def friend_choices(self, user_id: int) -> Tuple[Set[int], random.Random]:
+        """Users this user sends requests to, and the RNG to continue with"""
+        rng = self.rng(FRIENDS, user_id)
+        # Pareto(1.5) has mean 3, so scale it to the requested mean
+        wanted = int(self.volumes.friends / 3 * rng.paretovariate(1.5))
+        wanted = min(wanted, self.volumes.max_friends, self.volumes.users - 1)
+        chosen: Set[int] = set()
+        for _ in range(wanted * 2):
+            if len(chosen) == wanted:
+                break
+            other = self.popular_user(rng)
+            if other != user_id:
+                chosen.add(other)
+        return chosen, rng
+
+    # ===========================
+    # TABLES
+    # ===========================
+
+    def users(self, hashed_password: str) -> Iterator[tuple]:
+        for user_id in range(self.first_id, self.last_id + 1):
+            rng = self.rng(USERS, user_id)
+            signup, _ = self._draw_profile(rng)
+            yield (user_id, f"gen{user_id}@example.com", f"gen{user_id}", f"Generated User {user_id}",
+                   hashed_password, None, rng.choice(LOCATIONS), signup, signup)
+
+    def user_tasks(self) -> Iterator[tuple]:
+        if not self.task_ids:
+            return
+        for user_id in range(self.first_id, self.last_id + 1):
+            signup, engagement = self.profile(user_id)
+            rng = self.rng(TASKS, user_id)
+            picked = rng.sample(self.task_ids, rng.randint(0, len(self.task_ids)))
+            for task_id in picked:
+                roll = rng.random()
+                status = "done" if roll < engagement else "progress" if roll < engagement + 0.2 else "pending"
+                created = signup + (self.now - signup) * rng.random()
+                yield (user_id, task_id, status, created, created + (self.now - created) * rng.random())
+
+    def sessions(self) -> Iterator[tuple]:
+        """Two-state Markov chain per user: active days come in runs"""
+        today = self.now.date()
+        for user_id in range(self.first_id, self.last_id + 1):
+            signup, engagement = self.profile(user_id)
+            rng = self.rng(SESSIONS, user_id)
+            keep_going = 0.5 + 0.45 * engagement
+            come_back = 0.02 + 0.3 * engagement
+            mean_tasks = 1 + 4 * engagement
+            active = False
+            day = signup.date()
+            while day <= today:
+                active = rng.random() < (keep_going if active else come_back)
+                if active:
+                    count = 1 + int(rng.expovariate(1 / mean_tasks))
+                    yield (user_id, day, count, datetime.combine(day, signup.time()))
+                day += timedelta(days=1)
+
+    def friendships(self) -> Iterator[tuple]:
+        """(user_id, friend_id, status, created_at) with each pair exactly once
+
+        Both sides may choose each other; the pair is then emitted only by
+        the lower id, which is found by re-deriving the other side's choices.
+        """
+        for user_id in range(self.first_id, self.last_id + 1):
+            chosen, rng = self.friend_choices(user_id)
+            signup, _ = self.profile(user_id)
+            for other in sorted(chosen):
+                if other < user_id and user_id in self.friend_choices(other)[0]:
+                    continue
+                other_signup, _ = self.profile(other)
+                earliest = max(signup, other_signup)
+                created = earliest + (self.now - earliest) * rng.random() ** 3
+                status = "pending" if rng.random() < 0.1 else "accepted"
+                if rng.random() < 0.5:
+                    yield (user_id, other, status, created)
+                else:
+                    yield (other, user_id, status, created)
+
+    def messages(self) -> Iterator[tuple]:
+        """Threads of bursts: quick back-and-forth, then hours or days of silence"""
+        for user_id, friend_id, status, since in self.friendships():
+            if status != "accepted":
+                continue
+            rng = self.rng(MESSAGES, min(user_id, friend_id) * (self.volumes.users + self.first_id) + max(user_id, friend_id))
+            if rng.random() < 0.3:
+                continue
+            # Pareto(1.3) has mean 1.3 / 0.3; scale it to the requested mean of the 70% that talk
+            budget = int(self.volumes.messages / 0.7 / (1.3 / 0.3) * rng.paretovariate(1.3))
+            budget = min(budget, self.volumes.max_messages)
+            at = since + timedelta(seconds=rng.expovariate(1 / 86400))
+            sender, receiver = (user_id, friend_id) if rng.random() < 0.5 else (friend_id, user_id)
+            last_read = self.now - timedelta(hours=rng.expovariate(1 / 12))
+            while budget > 0 and at < self.now:
+                burst = min(budget, 1 + int(rng.expovariate(1 / 6)))
+                for _ in range(burst):
+                    if at >= self.now:
+                        break
+                    yield (sender, receiver, rng.choice(PHRASES), at < last_read, at)
+                    budget -= 1
+                    if rng.random() < 0.6:
+                        sender, receiver = receiver, sender
+                    at += timedelta(seconds=5 + rng.expovariate(1 / 60))
+                at += timedelta(seconds=rng.expovariate(1 / (2 * 86400)))
+
+def _gcd(a: int, b: int) -> int:
+    while b:
+        a, b = b, a % b
+    return a
+
+# ===========================
+# LOADING
+# ===========================
+
+TABLES = [
+    ("users", models.User.__table__,
+     ("id", "email", "username", "display_name", "hashed_password", "bio", "location", "created_at", "updated_at")),
+    ("user_tasks", models.UserTask.__table__, ("user_id", "task_id", "status", "created_at", "updated_at")),
+    ("sessions", models.Session.__table__, ("user_id", "date", "task_count", "created_at")),
+    ("friendships", models.Friendship.__table__, ("user_id", "friend_id", "status", "created_at")),
+    ("messages", models.Message.__table__, ("sender_id", "receiver_id", "content", "is_read", "created_at")),
+]
+
+def batches(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, str):
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return str(value)
+
+def load(db: Session, table, columns: Sequence[str], rows: Iterable[tuple], batch_size: int) -> int:
+    """Write rows in batches and return how many were written (no commit)"""
+    written = 0
+    if db.get_bind().dialect.name == "postgresql":
+        cursor = db.connection().connection.cursor()
+        statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+        for batch in batches(rows, batch_size):
+            buffer = io.StringIO()
+            for row in batch:
+                buffer.write("\t".join(_copy_value(value) for value in row))
+                buffer.write("\n")
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+            written += len(batch)
+        cursor.close()
+    else:
+        statement = insert(table)
+        for batch in batches(rows, batch_size):
+            db.execute(statement, [dict(zip(columns, row)) for row in batch])
+            written += len(batch)
+    return written
+
+def reset_sequences(db: Session):
+    """Move serial sequences past explicitly inserted ids (PostgreSQL only)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for _, table, _ in TABLES:
+        if "id" in table.c:
+            db.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+            ))
+
+def generate(
+    db: Session,
+    volumes: Volumes,
+    seed: int = 1,
+    password: str = DEFAULT_PASSWORD,
+    derived: bool = True,
+    now: Optional[datetime] = None,
+):
+    """Append a generated population after the existing users
+
+    Each table is committed once it is fully loaded. With derived=True the
+    user_stats, conversations and badges tables are rebuilt afterwards so
+    the API serves the new rows correctly.
+    """
+    first_user_id = (db.scalar(select(func.max(models.User.id))) or 0) + 1
+    task_ids = db.scalars(
+        select(models.Task.id).where(models.Task.user_id.is_(None)).order_by(models.Task.id)
+    ).all()
+    # Midnight keeps the output independent of when the command runs within a day
+    now = now or datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    generator = Generator(seed, volumes, first_user_id, task_ids, now)
+    hashed_password = passwords.pwd_context.hash(password)
+
+    sources = {
+        "users": generator.users(hashed_password),
+        "user_tasks": generator.user_tasks(),
+        "sessions": generator.sessions(),
+        "friendships": generator.friendships(),
+        "messages": generator.messages(),
+    }
+    total = 0
+    started = time.perf_counter()
+    for name, table, columns in TABLES:
+        table_started = time.perf_counter()
+        count = load(db, table, columns, sources[name], volumes.batch_size)
+        db.commit()
+        total += count
+        elapsed = time.perf_counter() - table_started
+        print(f"  {name:<12} {count:>12,} rows  {elapsed:7.1f}s  {count / max(elapsed, 1e-9):>10,.0f} rows/s")
+    reset_sequences(db)
+    db.commit()
+    print(f"✅ Generated {total:,} rows in {time.perf_counter() - started:.1f}s "
+          f"(users {first_user_id}-{generator.last_id}, password '{password}')")
+
+    if derived:
+        started = time.perf_counter()
+        user_stats.rebuild_all(db)
+        conversations.backfill(db)
+        badges.backfill(db)
+        db.commit()
+        print(f"✅ Rebuilt stats, conversations and badges in {time.perf_counter() - started:.1f}s")
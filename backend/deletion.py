@@ -0,0 +1,288 @@
+"""
+Background account deletion
+
+DELETE /api/user/account used to delete the user and everything they own
+in one transaction, which for a heavy user meant hundreds of thousands of
+rows deleted while holding the write lock. The request now only disables
+the account (users.disabled_at) and queues an account_deletions row, and
+a worker in each API process purges the rows in bounded bulk DELETEs, one
+short transaction per batch:
+
+    friendships (with their conversations and the friends' counts)
+    -> sent and received messages -> task statuses -> custom tasks
+    -> sessions -> badges -> stats -> the users row
+
+Every batch records the stage it reached and the rows it removed in the
+same transaction, so a purge cut short by a restart resumes where it
+stopped, and every step is safe to repeat. A worker takes a lease on a
+deletion before purging it, so several processes can poll the same table
+without working on the same user.
+
+A purge only starts DELETION_GRACE_SECONDS after the request, once every
+worker's principal cache has let go of the disabled user.
+
+Usage (from backend/):
+    python deletion.py status          # unfinished and recent deletions
+    python deletion.py run             # purge everything due now
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import dialect_insert
+import models
+import user_stats
+
+logger = logging.getLogger(__name__)
+
+DELETION_BATCH_SIZE = int(os.getenv("DELETION_BATCH_SIZE", "1000"))
+DELETION_POLL_SECONDS = float(os.getenv("DELETION_POLL_SECONDS", "30"))
+# Defaults to the principal cache TTL so no worker still serves the user
+DELETION_GRACE_SECONDS = float(os.getenv("DELETION_GRACE_SECONDS", os.getenv("PRINCIPAL_CACHE_TTL", "60")))
+# A worker that stops renewing its lease for this long is presumed dead
+LEASE_SECONDS = 120
+
+DONE = "done"
+
+# Nothing purged is loaded in the session, so skip fetching deleted ids
+BULK = {"synchronize_session": False}
+
+_wakeup = asyncio.Event()
+
+# ===========================
+# STEPS
+# ===========================
+# Each step deletes at most `limit` rows of one kind for the user and
+# returns how many it removed; 0 means the stage is finished.
+
+async def _delete_batch(db: AsyncSession, entity, condition, limit: int) -> int:
+    batch = select(entity.id).where(condition).limit(limit)
+    result = await db.execute(delete(entity).where(entity.id.in_(batch)), execution_options=BULK)
+    return result.rowcount
+
+async def _friendships(db: AsyncSession, user_id: int, limit: int) -> int:
+    Friendship = models.Friendship
+    rows = (await db.execute(
+        select(Friendship.id, Friendship.user_id, Friendship.friend_id, Friendship.status)
+        .where(or_(Friendship.user_id == user_id, Friendship.friend_id == user_id))
+        .limit(limit)
+    )).all()
+    if not rows:
+        return 0
+    ids = [row.id for row in rows]
+    friends = [
+        row.friend_id if row.user_id == user_id else row.user_id
+        for row in rows if row.status == "accepted"
+    ]
+    conversations = delete(models.Conversation).where(models.Conversation.friendship_id.in_(ids))
+    await db.execute(conversations, execution_options=BULK)
+    await db.execute(delete(Friendship).where(Friendship.id.in_(ids)), execution_options=BULK)
+    if friends:
+        await user_stats.record_friendship_change(db, friends, -1)
+    return len(rows)
+
+async def _sent_messages(db: AsyncSession, user_id: int, limit: int) -> int:
+    return await _delete_batch(db, models.Message, models.Message.sender_id == user_id, limit)
+
+async def _received_messages(db: AsyncSession, user_id: int, limit: int) -> int:
+    return await _delete_batch(db, models.Message, models.Message.receiver_id == user_id, limit)
+
+async def _task_statuses(db: AsyncSession, user_id: int, limit: int) -> int:
+    return await _delete_batch(db, models.UserTask, models.UserTask.user_id == user_id, limit)
+
+async def _custom_task_statuses(db: AsyncSession, user_id: int, limit: int) -> int:
+    """Statuses other users hold on the user's custom tasks"""
+    custom = select(models.Task.id).where(models.Task.user_id == user_id)
+    rows = (await db.execute(
+        select(models.UserTask.id, models.UserTask.user_id)
+        .where(models.UserTask.task_id.in_(custom))
+        .limit(limit)
+    )).all()
+    if not rows:
+        return 0
+    await db.execute(
+        delete(models.UserTask).where(models.UserTask.id.in_([row.id for row in rows])), execution_options=BULK
+    )
+    # Their totals and points counted these statuses
+    others = sorted({row.user_id for row in rows} - {user_id})
+    await db.run_sync(user_stats.rebuild_users, others)
+    return len(rows)
+
+async def _custom_tasks(db: AsyncSession, user_id: int, limit: int) -> int:
+    return await _delete_batch(db, models.Task, models.Task.user_id == user_id, limit)
+
+async def _sessions(db: AsyncSession, user_id: int, limit: int) -> int:
+    return await _delete_batch(db, models.Session, models.Session.user_id == user_id, limit)
+
+async def _badges(db: AsyncSession, user_id: int, limit: int) -> int:
+    return await _delete_batch(db, models.UserBadge, models.UserBadge.user_id == user_id, limit)
+
+async def _stats(db: AsyncSession, user_id: int, limit: int) -> int:
+    stats = delete(models.UserStats).where(models.UserStats.user_id == user_id)
+    result = await db.execute(stats, execution_options=BULK)
+    return result.rowcount
+
+async def _user(db: AsyncSession, user_id: int, limit: int) -> int:
+    result = await db.execute(delete(models.User).where(models.User.id == user_id), execution_options=BULK)
+    return result.rowcount
+
+# Run in this order: rows go before whatever they reference
+STAGES: List[Tuple[str, Callable]] = [
+    ("friendships", _friendships),
+    ("sent_messages", _sent_messages),
+    ("received_messages", _received_messages),
+    ("task_statuses", _task_statuses),
+    ("custom_task_statuses", _custom_task_statuses),
+    ("custom_tasks", _custom_tasks),
+    ("sessions", _sessions),
+    ("badges", _badges),
+    ("stats", _stats),
+    ("user", _user),
+]
+STAGE_NAMES = [name for name, _ in STAGES]
+
+# ===========================
+# REQUESTS AND LEASES
+# ===========================
+
+async def request(db: AsyncSession, user: models.User):
+    """Disable the account and queue its purge (no commit)
+
+    Safe to repeat: another worker may still have the user cached and
+    accept a second request, which must not restart or duplicate the purge.
+    """
+    now = datetime.utcnow()
+    if user.disabled_at is None:
+        user.disabled_at = now
+    await db.execute(
+        dialect_insert(db)(models.AccountDeletion)
+        .values(user_id=user.id, requested_at=now, stage=STAGE_NAMES[0], deleted_rows=0)
+        .on_conflict_do_nothing(index_elements=[models.AccountDeletion.user_id])
+    )
+
+def wake():
+    """Have this process's worker look for due deletions right away"""
+    _wakeup.set()
+
+async def _claim(db: AsyncSession, user_id: int) -> bool:
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(models.AccountDeletion)
+        .where(
+            models.AccountDeletion.user_id == user_id,
+            models.AccountDeletion.completed_at.is_(None),
+            or_(models.AccountDeletion.claimed_until.is_(None), models.AccountDeletion.claimed_until < now),
+        )
+        .values(claimed_until=now + timedelta(seconds=LEASE_SECONDS))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+async def due(db: AsyncSession) -> List[int]:
+    """Unfinished deletions past their grace period that nobody holds"""
+    now = datetime.utcnow()
+    return list((await db.scalars(
+        select(models.AccountDeletion.user_id)
+        .where(
+            models.AccountDeletion.completed_at.is_(None),
+            models.AccountDeletion.requested_at <= now - timedelta(seconds=DELETION_GRACE_SECONDS),
+            or_(models.AccountDeletion.claimed_until.is_(None), models.AccountDeletion.claimed_until < now),
+        )
+        .order_by(models.AccountDeletion.requested_at)
+    )).all())
+
+# ===========================
+# PURGE
+# ===========================
+
+async def purge(session_factory, user_id: int, batch_size: int = DELETION_BATCH_SIZE) -> bool:
+    """Run the user's remaining stages; False if another worker holds it"""
+    async with session_factory() as db:
+        if not await _claim(db, user_id):
+            return False
+        stage = await db.scalar(
+            select(models.AccountDeletion.stage).where(models.AccountDeletion.user_id == user_id)
+        )
+
+    index = STAGE_NAMES.index(stage)
+    while index < len(STAGES):
+        name, step = STAGES[index]
+        async with session_factory() as db:
+            removed = await step(db, user_id, batch_size)
+            now = datetime.utcnow()
+            values = {
+                "deleted_rows": models.AccountDeletion.deleted_rows + removed,
+                "claimed_until": now + timedelta(seconds=LEASE_SECONDS),
+            }
+            if not removed:
+                index += 1
+                if index == len(STAGES):
+                    values.update(stage=DONE, completed_at=now, claimed_until=None)
+                else:
+                    values["stage"] = STAGE_NAMES[index]
+            await db.execute(
+                update(models.AccountDeletion)
+                .where(models.AccountDeletion.user_id == user_id)
+                .values(**values)
+            )
+            await db.commit()
+    return True
+
+async def run_due(session_factory, batch_size: int = DELETION_BATCH_SIZE) -> int:
+    """Purge every due deletion; returns how many this call finished"""
+    async with session_factory() as db:
+        user_ids = await due(db)
+    finished = 0
+    for user_id in user_ids:
+        if await purge(session_factory, user_id, batch_size):
+            finished += 1
+    return finished
+
+async def run_periodically(session_factory, interval: float = DELETION_POLL_SECONDS):
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), interval)
+            # Woken by a new request: wait out its grace period first
+            await asyncio.sleep(DELETION_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        try:
+            await run_due(session_factory)
+        except Exception:
+            # The lease lapses and the next poll (here or elsewhere) resumes it
+            logger.exception("Account deletion failed")
+
+if __name__ == "__main__":
+    from database import AsyncSessionLocal, run_migrations
+
+    parser = argparse.ArgumentParser(description="Purge accounts queued for deletion")
+    parser.add_argument("command", choices=["run", "status"])
+    parser.add_argument("--batch-size", type=int, default=DELETION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    async def status():
+        async with AsyncSessionLocal() as db:
+            rows = (await db.scalars(
+                select(models.AccountDeletion).order_by(models.AccountDeletion.requested_at.desc()).limit(50)
+            )).all()
+        if not rows:
+            print("No account deletions")
+        for row in rows:
+            state = f"done {row.completed_at:%Y-%m-%d %H:%M}" if row.completed_at else f"at {row.stage}"
+            print(f"user {row.user_id}: requested {row.requested_at:%Y-%m-%d %H:%M}, {state}, "
+                  f"{row.deleted_rows} rows removed")
+
+    run_migrations()
+    if args.command == "status":
+        asyncio.run(status())
+    else:
+        finished = asyncio.run(run_due(AsyncSessionLocal, args.batch_size))
+        print(f"✅ Purged {finished} accounts")
@@ -0,0 +1,34 @@
+"""
+Fast JSON path for list responses
+
+FastAPI validates whatever a handler returns against its response_model,
+converts the result to JSON-compatible Python and only then encodes it.
+For long lists built from our own database rows that work repeats what
+the schema already guarantees. The hot list endpoints instead select
+exactly the response fields as plain columns, turn each row into a dict
+(or a frozen dataclass) and return json_response(), which orjson encodes
+in one pass. The response_model stays on the route for the OpenAPI docs.
+
+orjson writes datetimes in the same ISO 8601 form as the default path.
+"""
+
+from typing import Any, List, Optional, Type
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+def columns(entity, schema: Type[BaseModel], prefix: str = "") -> List:
+    """The entity's column for every field of schema, labelled prefix + field"""
+    return [getattr(entity, name).label(prefix + name) for name in schema.model_fields]
+
+def pick(row, schema: Type[BaseModel], prefix: str = "") -> dict:
+    """The schema's fields from a row selected with columns()"""
+    mapping = row._mapping
+    return {name: mapping[prefix + name] for name in schema.model_fields}
+
+def json_response(content: Any, response: Optional[Response] = None) -> Response:
+    """orjson-encoded response, keeping any headers the handler already
+    set on its injected Response (ETag and friends)"""
+    headers = dict(response.headers) if response is not None else None
+    return Response(orjson.dumps(content), media_type="application/json", headers=headers)
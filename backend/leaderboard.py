@@ -0,0 +1,234 @@
+"""
+Global points leaderboard
+
+Every user is kept in an in-memory order-statistic structure keyed by
+(-points, user_id), so "my rank", "top N" and "users around me" are
+answered in logarithmic time instead of an ORDER BY over all users.
+The board is loaded from user_stats at startup, updated by the handlers
+that change points and periodically reloaded so that each worker process
+converges on writes made by the others.
+"""
+
+import asyncio
+import os
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "300"))
+
+Key = Tuple[int, int]
+
+class RankIndex:
+    """Sorted list of keys split into buckets, with a Fenwick tree over the
+    bucket sizes for positional lookups"""
+
+    LOAD = 256
+
+    def __init__(self, keys: Optional[List[Key]] = None):
+        keys = sorted(keys or [])
+        self._lists = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._lists]
+        self._len = len(keys)
+        self._build_tree()
+
+    def __len__(self):
+        return self._len
+
+    def _build_tree(self):
+        size = len(self._lists)
+        tree = [0] * (size + 1)
+        for i, bucket in enumerate(self._lists, start=1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, bucket: int, delta: int):
+        i = bucket + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, bucket: int) -> int:
+        """Number of keys in buckets before the given one"""
+        total, i = 0, bucket
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        """Map a global position to (bucket, offset) by descending the tree"""
+        bucket, step = 0, 1 << (len(self._lists).bit_length())
+        while step:
+            nxt = bucket + step
+            if nxt < len(self._tree) and self._tree[nxt] <= position:
+                bucket = nxt
+                position -= self._tree[nxt]
+            step >>= 1
+        return bucket, position
+
+    def insert(self, key: Key):
+        if not self._lists:
+            self._lists, self._maxes, self._len = [[key]], [key], 1
+            self._build_tree()
+            return
+        i = min(bisect_left(self._maxes, key), len(self._lists) - 1)
+        bucket = self._lists[i]
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+        self._len += 1
+        if len(bucket) > 2 * self.LOAD:
+            self._lists[i:i + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self._maxes[i:i + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+            self._build_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def remove(self, key: Key):
+        i = bisect_left(self._maxes, key)
+        bucket = self._lists[i]
+        del bucket[bisect_left(bucket, key)]
+        self._len -= 1
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._lists[i]
+            del self._maxes[i]
+            self._build_tree()
+
+    def index(self, key: Key) -> int:
+        """Number of keys strictly smaller than key"""
+        i = bisect_left(self._maxes, key)
+        if i == len(self._lists):
+            return self._len
+        return self._prefix(i) + bisect_left(self._lists[i], key)
+
+    def slice(self, start: int, stop: int) -> Iterator[Key]:
+        start, stop = max(start, 0), min(stop, self._len)
+        if start >= stop:
+            return
+        bucket, offset = self._locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            items = self._lists[bucket][offset:offset + remaining]
+            yield from items
+            remaining -= len(items)
+            bucket, offset = bucket + 1, 0
+
+class Leaderboard:
+    """Users ordered by points, highest first"""
+
+    def __init__(self):
+        self._index = RankIndex()
+        self._points: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def load(self, rows: List[Tuple[int, int]]):
+        points = dict(rows)
+        # Swap both structures in at once so readers never see a mix
+        self._index, self._points = RankIndex([(-p, uid) for uid, p in points.items()]), points
+
+    def points(self, user_id: int) -> Optional[int]:
+        return self._points.get(user_id)
+
+    def set_points(self, user_id: int, points: int):
+        old = self._points.get(user_id)
+        if old == points:
+            return
+        if old is not None:
+            self._index.remove((-old, user_id))
+        self._index.insert((-points, user_id))
+        self._points[user_id] = points
+
+    def add_missing(self, user_id: int, points: int):
+        """Add a user read from the database, keeping any points already held
+
+        Writes keep the board current through add_points, while the read may
+        come from a lagging replica.
+        """
+        if user_id not in self._points:
+            self.set_points(user_id, points)
+
+    def add_points(self, user_id: int, delta: int):
+        self.set_points(user_id, max(self._points.get(user_id, 0) + delta, 0))
+
+    def remove(self, user_id: int):
+        old = self._points.pop(user_id, None)
+        if old is not None:
+            self._index.remove((-old, user_id))
+
+    def rank_for_points(self, points: int) -> int:
+        """1-based rank shared by everyone on the same points"""
+        return self._index.index((-points, 0)) + 1
+
+    def rank(self, user_id: int) -> Optional[int]:
+        points = self._points.get(user_id)
+        return None if points is None else self.rank_for_points(points)
+
+    def _entries(self, start: int, stop: int) -> List[Tuple[int, int, int]]:
+        return [(self.rank_for_points(-neg), uid, -neg) for neg, uid in self._index.slice(start, stop)]
+
+    def top(self, limit: int) -> List[Tuple[int, int, int]]:
+        """(rank, user_id, points) for the first `limit` users"""
+        return self._entries(0, limit)
+
+    def rank_among(self, user_ids) -> List[Tuple[int, int, int]]:
+        """(rank, user_id, points) ranking only the given users against each other"""
+        scored = sorted((-self._points.get(uid, 0), uid) for uid in set(user_ids))
+        result = []
+        for position, (neg, uid) in enumerate(scored):
+            tied = position and neg == scored[position - 1][0]
+            result.append((result[-1][0] if tied else position + 1, uid, -neg))
+        return result
+
+    def around(self, user_id: int, radius: int) -> List[Tuple[int, int, int]]:
+        """(rank, user_id, points) for up to `radius` users either side of user_id"""
+        points = self._points.get(user_id)
+        if points is None:
+            return []
+        position = self._index.index((-points, user_id))
+        return self._entries(position - radius, position + radius + 1)
+
+board = Leaderboard()
+
+# ===========================
+# LOADING
+# ===========================
+
+async def reload(db: AsyncSession):
+    """Rebuild the board from user_stats (users without a row score 0)"""
+    rows = (await db.execute(
+        select(models.User.id, func.coalesce(models.UserStats.points, 0))
+        .outerjoin(models.UserStats, models.UserStats.user_id == models.User.id)
+        .where(models.User.disabled_at.is_(None))
+    )).all()
+    board.load([tuple(row) for row in rows])
+
+async def with_users(db: AsyncSession, rows: List[Tuple[int, int, int]]) -> List[dict]:
+    """Attach User rows to (rank, user_id, points) tuples in one query"""
+    user_ids = [user_id for _, user_id, _ in rows]
+    users = {
+        user.id: user
+        for user in (await db.scalars(select(models.User).where(models.User.id.in_(user_ids)))).all()
+    }
+    return [
+        {"rank": rank, "points": points, "user": users[user_id]}
+        for rank, user_id, points in rows
+        if user_id in users
+    ]
+
+async def refresh_periodically(session_factory, interval: float = LEADERBOARD_REFRESH_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        async with session_factory() as db:
+            await reload(db)
@@ -1,34 +1,64 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Query, WebSocket, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import select, update, delete, func, case, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from dataclasses import replace
+from datetime import date, datetime, timedelta
 from typing import List, Optional
-import cloudinary
-import cloudinary.uploader
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+import asyncio
+import hashlib
 import os
+import secrets
+import time
 from dotenv import load_dotenv
 
 # Import models and schemas (these will be in separate files)
-from database import get_db, engine
+from database import get_db, AsyncSessionLocal, ReadSessionLocal, run_migrations
+from passwords import get_password_hash, verify_password, hash_pool
+from cache import TTLCache
+import user_stats
+import leaderboard
+import badges
+import conversations
+import realtime
+import search
+import tasks
+import catalog
+import deletion
+import replicas
+import activity
+import avatars
+import conditional
+import fastjson
+import metrics
 import models
 import schemas
 
 # Load environment variables
 load_dotenv()
 
-# Create tables
-models.Base.metadata.create_all(bind=engine)
+# Bring the schema up to date; set AUTO_MIGRATE=false to run
+# `alembic upgrade head` as a separate deploy step instead
+if os.getenv("AUTO_MIGRATE", "true").lower() == "true":
+    run_migrations()
 
 # Initialize FastAPI
 app = FastAPI(
     title="Trackitnow API",
     description="Complete task tracking and habit building API",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Added before CORS so it runs inside it and a rejected upload still
+# carries the CORS headers
+app.add_middleware(avatars.UploadLimitMiddleware)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -36,34 +66,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ETag/Last-Modified feed the client's conditional GETs; X-Read-Primary-Until
+    # is echoed back after a write (see replicas.py)
+    expose_headers=["ETag", "Last-Modified", replicas.STICKY_HEADER],
 )
 
-# Cloudinary Configuration
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
+# Outermost, so the timings include every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Profile photos stored on local disk (AVATAR_STORAGE=local) are served from here
+if avatars.local_root():
+    os.makedirs(avatars.local_root(), exist_ok=True)
+    app.mount("/media", StaticFiles(directory=avatars.local_root()), name="media")
 
 # Security Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
-# this line give us error while hasing the user password 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Authenticated-principal caches (per worker process)
+# user_cache holds detached User rows by id, token_cache maps a token digest
+# to its user id so repeat requests skip decoding the JWT
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+user_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+token_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# Largest list accepted by PUT /api/tasks/status:batch
+MAX_STATUS_BATCH = int(os.getenv("MAX_STATUS_BATCH", "500"))
+
 # ===========================
 # UTILITY FUNCTIONS
 # ===========================
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -74,36 +111,109 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Requests with any other method may write, which pins the user's reads
+# to the primary for a moment (see replicas.py)
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+async def get_current_user(
+    request: Request,
+    response: Response,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+):
+    user = await authenticate(token, db)
+    if request.method not in SAFE_METHODS:
+        replicas.note_write(user.id, response)
+    return user
+
+async def get_read_db(
+    request: Request,
+    current_user: models.User = Depends(get_current_user)
+):
+    """Session for read-only handlers: the replica unless the user just wrote"""
+    async with replicas.session_factory(current_user.id, request)() as read_db:
+        yield read_db
+
+async def authenticate(token: str, db: AsyncSession) -> models.User:
+    """Resolve a bearer token to a User attached to db"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    token_key = hashlib.sha256(token.encode()).digest()
+    user_id = token_cache.get(token_key)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id = int(payload.get("sub"))
+        except (JWTError, TypeError, ValueError):
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        # Never keep a token around past its own expiry
+        token_cache.set(token_key, user_id, ttl=payload["exp"] - time.time())
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    cached = user_cache.get(user_id)
+    if cached is None:
+        user = await db.get(models.User, user_id)
+        if user is None or user.disabled_at is not None:
+            raise credentials_exception
+        db.expunge(user)
+        user_cache.set(user_id, user)
+        # End the lookup's transaction so it doesn't hold SQLite's write
+        # lock while the handler opens sessions of its own
+        await db.commit()
+        cached = user
+    
+    # Attach a copy to this request's session without another SELECT, so
+    # handlers can modify and commit it as usual
+    return await db.merge(cached, load=False)
+
+# ===========================
+# LIFECYCLE
+# ===========================
+
+@app.on_event("startup")
+async def load_leaderboard():
+    async with ReadSessionLocal() as db:
+        await leaderboard.reload(db)
+    app.state.leaderboard_refresh = asyncio.create_task(
+        leaderboard.refresh_periodically(ReadSessionLocal)
+    )
+
+@app.on_event("startup")
+async def load_task_catalog():
+    async with ReadSessionLocal() as db:
+        await catalog.reload(db)
+    app.state.catalog_refresh = asyncio.create_task(
+        catalog.refresh_periodically(ReadSessionLocal)
+    )
+
+@app.on_event("startup")
+async def start_deletion_worker():
+    app.state.deletion_worker = asyncio.create_task(
+        deletion.run_periodically(AsyncSessionLocal)
+    )
+
+@app.on_event("shutdown")
+async def shutdown_background_work():
+    app.state.leaderboard_refresh.cancel()
+    app.state.catalog_refresh.cancel()
+    app.state.deletion_worker.cancel()
+    hash_pool.shutdown()
+    avatars.image_pool.shutdown()
+    await realtime.broker.close()
 
 # ===========================
 # AUTHENTICATION ROUTES
 # ===========================
 
 @app.post("/api/auth/signup", response_model=schemas.UserResponse)
-async def signup(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def signup(user_data: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     """Create a new user account"""
     # Check if user already exists
-    existing_user = db.query(models.User).filter(
+    existing_user = await db.scalar(select(models.User).where(
         (models.User.email == user_data.email) | (models.User.username == user_data.username)
-    ).first()
+    ).limit(1))
     
     if existing_user:
         raise HTTPException(
@@ -112,32 +222,53 @@ async def signup(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     new_user = models.User(
         email=user_data.email,
         username=user_data.username,
         display_name=user_data.display_name or user_data.username,
         hashed_password=hashed_password
     )
+    new_user.stats = models.UserStats()
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    leaderboard.board.set_points(new_user.id, 0)
     
     return new_user
 
 @app.post("/api/auth/signin", response_model=schemas.Token)
-async def signin(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def signin(
+    response: Response,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
     """Sign in and get access token"""
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+    user = await db.scalar(select(models.User).where(
+        models.User.email == form_data.username, models.User.disabled_at.is_(None)
+    ))
+    
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await verify_password(form_data.password, user.hashed_password)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Stored hash used old argon2 parameters, replace it while we have the password
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+        user_cache.invalidate(user.id)
+    
+    # A fresh signup may not have reached the replica yet
+    replicas.note_write(user.id, response)
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
@@ -154,60 +285,53 @@ async def signout(current_user: models.User = Depends(get_current_user)):
 # USER/PROFILE ROUTES
 # ===========================
 
+def profile_payload(user: models.User, stats: models.UserStats, rank: int, today) -> dict:
+    return {
+        **user.__dict__,
+        "total_points": stats.points,
+        "streak": user_stats.current_streak(stats, today),
+        "longest_streak": stats.longest_streak,
+        "rank": rank,
+        "friends_count": stats.friends_count,
+        "total_tasks": stats.total_tasks,
+        "completed_tasks": stats.completed_tasks
+    }
+
 @app.get("/api/user/profile", response_model=schemas.ProfileResponse)
-async def get_profile(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_profile(
+    request: Request,
+    response: Response,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
     """Get current user profile with stats"""
-    # Calculate stats
-    total_tasks = db.query(models.UserTask).filter(models.UserTask.user_id == current_user.id).count()
-    completed_tasks = db.query(models.UserTask).filter(
-        models.UserTask.user_id == current_user.id,
-        models.UserTask.status == "done"
-    ).count()
-    
-    # Calculate streak
-    sessions = db.query(models.Session).filter(
-        models.Session.user_id == current_user.id
-    ).order_by(models.Session.date.desc()).all()
-    
-    current_streak = 0
-    if sessions:
-        current_date = datetime.now().date()
-        for session in sessions:
-            if session.date == current_date:
-                current_streak += 1
-                current_date -= timedelta(days=1)
-            else:
-                break
-    
-    # Get friends count
-    friends_count = db.query(models.Friendship).filter(
-        ((models.Friendship.user_id == current_user.id) | (models.Friendship.friend_id == current_user.id)) &
-        (models.Friendship.status == "accepted")
-    ).count()
+    stats = await user_stats.get_user_stats(db, current_user.id)
+    leaderboard.board.add_missing(current_user.id, stats.points)
+    
+    # Rank moves with other users' points and the streak with the date
+    today = datetime.now().date()
+    rank = leaderboard.board.rank(current_user.id)
+    cached = conditional.not_modified(
+        request, response, current_user.id, current_user.updated_at, stats.updated_at, rank, today
+    )
+    if cached:
+        return cached
     
-    return {
-        **current_user.__dict__,
-        "total_points": completed_tasks * 10,  # 10 points per completed task
-        "streak": current_streak,
-        "rank": 156,  # This would be calculated based on all users
-        "friends_count": friends_count,
-        "total_tasks": total_tasks,
-        "completed_tasks": completed_tasks
-    }
+    return profile_payload(current_user, stats, rank, today)
 
 @app.put("/api/user/profile", response_model=schemas.UserResponse)
 async def update_profile(
     profile_data: schemas.ProfileUpdate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update user profile"""
     if profile_data.username:
         # Check if username is already taken
-        existing = db.query(models.User).filter(
+        existing = await db.scalar(select(models.User).where(
             models.User.username == profile_data.username,
             models.User.id != current_user.id
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="Username already taken")
         current_user.username = profile_data.username
@@ -230,8 +354,9 @@ async def update_profile(
     if profile_data.twitter_url:
         current_user.twitter_url = profile_data.twitter_url
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
+    user_cache.invalidate(current_user.id)
     
     return current_user
 
@@ -239,36 +364,33 @@ async def update_profile(
 async def upload_profile_photo(
     file: UploadFile = File(...),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Upload profile photo to Cloudinary"""
-    try:
-        # Upload to Cloudinary
-        result = cloudinary.uploader.upload(
-            file.file,
-            folder="trackitnow/profiles",
-            public_id=f"user_{current_user.id}",
-            overwrite=True,
-            resource_type="image"
-        )
-        
-        # Update user's avatar URL
-        current_user.avatar_url = result['secure_url']
-        db.commit()
-        
-        return {"avatar_url": result['secure_url']}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.delete("/api/user/account")
+    """Resize a profile photo into the avatar sizes and store it"""
+    data, digest = await avatars.read_upload(file)
+    urls = await avatars.store(data, digest)
+    avatar_url = urls[avatars.AVATAR_SIZES[0]]
+    
+    # Re-uploading the current photo changes nothing
+    if current_user.avatar_url != avatar_url:
+        current_user.avatar_url = avatar_url
+        await db.commit()
+        user_cache.invalidate(current_user.id)
+    
+    return {"avatar_url": avatar_url, "sizes": urls}
+
+@app.delete("/api/user/account", status_code=status.HTTP_202_ACCEPTED)
 async def delete_account(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Delete user account"""
-    db.delete(current_user)
-    db.commit()
-    return {"message": "Account deleted successfully"}
+    """Disable the account now and delete its data in the background"""
+    await deletion.request(db, current_user)
+    await db.commit()
+    user_cache.invalidate(current_user.id)
+    leaderboard.board.remove(current_user.id)
+    deletion.wake()
+    return {"message": "Account scheduled for deletion"}
 
 # ===========================
 # TASK ROUTES
@@ -276,41 +398,52 @@ async def delete_account(
 
 @app.get("/api/tasks", response_model=List[schemas.TaskResponse])
 async def get_tasks(
+    request: Request,
+    response: Response,
     level: Optional[str] = None,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all tasks (default + custom user tasks)"""
-    query = db.query(models.Task).filter(
-        (models.Task.user_id == None) | (models.Task.user_id == current_user.id)
-    )
-    
+    # Default tasks come from the shared in-process catalogue
+    snapshot = await catalog.get(db)
+    
+    # Every status change bumps updated_at and custom tasks are only ever added
+    mine = models.UserTask.user_id == current_user.id
+    custom = models.Task.user_id == current_user.id
+    version = (await db.execute(select(
+        select(func.count()).where(mine).scalar_subquery(),
+        select(func.max(models.UserTask.updated_at)).where(mine).scalar_subquery(),
+        select(func.count()).select_from(models.Task).where(custom).scalar_subquery(),
+        select(func.max(models.Task.id)).where(custom).scalar_subquery(),
+    ))).one()
+    cached = conditional.not_modified(request, response, current_user.id, level, snapshot.version, *version)
+    if cached:
+        return cached
+    
+    query = select(*catalog.TASK_COLUMNS).where(models.Task.user_id == current_user.id).order_by(models.Task.id)
     if level:
-        query = query.filter(models.Task.level == level)
-    
-    tasks = query.all()
+        query = query.where(models.Task.level == level)
+    custom_tasks = [catalog.TaskRow(*row) for row in (await db.execute(query)).all()]
     
     # Get user task statuses
-    user_tasks = db.query(models.UserTask).filter(
-        models.UserTask.user_id == current_user.id
-    ).all()
-    
-    user_task_map = {ut.task_id: ut.status for ut in user_tasks}
+    user_task_map = dict((await db.execute(
+        select(models.UserTask.task_id, models.UserTask.status).where(models.UserTask.user_id == current_user.id)
+    )).all())
     
+    # Tasks without a status of their own are returned as the cached objects
     result = []
-    for task in tasks:
-        result.append({
-            **task.__dict__,
-            "status": user_task_map.get(task.id, "pending")
-        })
+    for task in (*snapshot.for_level(level), *custom_tasks):
+        status = user_task_map.get(task.id, "pending")
+        result.append(task if status == task.status else replace(task, status=status))
     
-    return result
+    return fastjson.json_response(result, response)
 
 @app.post("/api/tasks", response_model=schemas.TaskResponse)
 async def create_custom_task(
     task_data: schemas.TaskCreate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a custom task"""
     new_task = models.Task(
@@ -323,55 +456,76 @@ async def create_custom_task(
     )
     
     db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+    await db.commit()
+    await db.refresh(new_task)
     
     return new_task
 
+async def apply_status_changes(db: AsyncSession, user_id: int, changes: List[tasks.StatusChange]):
+    """Update session, stats, badges and leaderboard for status changes, then commit"""
+    # Only the transition into done counts towards today's session and streak
+    today = datetime.now().date()
+    newly_done = sum(1 for change in changes if change.completed_delta > 0)
+    completed_delta = sum(change.completed_delta for change in changes)
+    if newly_done:
+        await tasks.record_completion(db, user_id, today, newly_done)
+    
+    stats_changes = await user_stats.record_task_change(
+        db,
+        user_id,
+        total_delta=sum(1 for change in changes if change.created),
+        completed_delta=completed_delta,
+        active_day=today if newly_done else None,
+    )
+    
+    # Only the events that happened: a second task on the same day leaves
+    # the streak where it was, so the streak rules aren't looked at
+    await badges.award_for_events(db, user_id, badges.events_for(stats_changes), stats_changes)
+    
+    await db.commit()
+    leaderboard.board.add_points(user_id, completed_delta * user_stats.POINTS_PER_TASK)
+
+@app.put("/api/tasks/status:batch", response_model=List[schemas.TaskStatusResult])
+async def update_task_statuses(
+    items: List[schemas.TaskStatusBatchItem],
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Update many task statuses in one transaction"""
+    if len(items) > MAX_STATUS_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATUS_BATCH} tasks per batch")
+    requested = {item.task_id: item.status for item in items}
+    if len(requested) != len(items):
+        raise HTTPException(status_code=400, detail="Each task may appear only once per batch")
+    
+    # Default tasks and the user's own custom tasks, in one query
+    visible = set((await db.scalars(select(models.Task.id).where(
+        models.Task.id.in_(requested),
+        (models.Task.user_id == None) | (models.Task.user_id == current_user.id)
+    ))).all())
+    
+    changes = await tasks.set_statuses(
+        db, current_user.id, {task_id: status for task_id, status in requested.items() if task_id in visible}
+    )
+    await apply_status_changes(db, current_user.id, list(changes.values()))
+    
+    return [
+        {"task_id": item.task_id, "status": item.status, "updated": item.task_id in visible}
+        for item in items
+    ]
+
 @app.put("/api/tasks/{task_id}/status")
 async def update_task_status(
     task_id: int,
     status_data: schemas.TaskStatusUpdate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update task status for user"""
-    # Check if user_task exists
-    user_task = db.query(models.UserTask).filter(
-        models.UserTask.user_id == current_user.id,
-        models.UserTask.task_id == task_id
-    ).first()
-    
-    if user_task:
-        user_task.status = status_data.status
-        user_task.updated_at = datetime.utcnow()
-    else:
-        user_task = models.UserTask(
-            user_id=current_user.id,
-            task_id=task_id,
-            status=status_data.status
-        )
-        db.add(user_task)
-    
-    # If task is completed, create a session entry
-    if status_data.status == "done":
-        today = datetime.now().date()
-        session = db.query(models.Session).filter(
-            models.Session.user_id == current_user.id,
-            models.Session.date == today
-        ).first()
-        
-        if session:
-            session.task_count += 1
-        else:
-            session = models.Session(
-                user_id=current_user.id,
-                date=today,
-                task_count=1
-            )
-            db.add(session)
-    
-    db.commit()
+    if not await tasks.is_visible(db, task_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    change = await tasks.set_status(db, current_user.id, task_id, status_data.status)
+    await apply_status_changes(db, current_user.id, [change])
     
     return {"message": "Task status updated successfully"}
 
@@ -381,48 +535,72 @@ async def update_task_status(
 
 @app.get("/api/friends", response_model=List[schemas.FriendResponse])
 async def get_friends(
+    request: Request,
+    response: Response,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all friends"""
-    friendships = db.query(models.Friendship).filter(
+    # Aggregate over the same rows: which friendships, and when any friend last changed
+    is_mine = (
         ((models.Friendship.user_id == current_user.id) | (models.Friendship.friend_id == current_user.id)) &
         (models.Friendship.status == "accepted")
-    ).all()
-    
-    friends = []
-    for friendship in friendships:
-        friend = friendship.friend if friendship.user_id == current_user.id else friendship.user
-        friends.append(friend)
-    
-    return friends
+    )
+    other_id = case((models.Friendship.user_id == current_user.id, models.Friendship.friend_id), else_=models.Friendship.user_id)
+    version = (await db.execute(
+        select(func.count(), func.sum(models.Friendship.id), func.max(models.User.updated_at))
+        .select_from(models.Friendship)
+        .join(models.User, models.User.id == other_id)
+        .where(is_mine)
+    )).one()
+    cached = conditional.not_modified(request, response, current_user.id, *version)
+    if cached:
+        return cached
+    
+    rows = (await db.execute(
+        select(*fastjson.columns(models.User, schemas.FriendResponse))
+        .select_from(models.Friendship)
+        .join(models.User, models.User.id == other_id)
+        .where(is_mine)
+    )).all()
+    
+    return fastjson.json_response([fastjson.pick(row, schemas.FriendResponse) for row in rows], response)
 
-@app.get("/api/friends/search")
+@app.get("/api/friends/search", response_model=schemas.UserSearchPage)
 async def search_users(
-    q: str,
+    q: str = "",
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Search for users"""
-    users = db.query(models.User).filter(
-        (models.User.username.ilike(f"%{q}%") | models.User.display_name.ilike(f"%{q}%")) &
-        (models.User.id != current_user.id)
-    ).limit(20).all()
-    
-    return users
+    """Search for users, best matches first and friends last"""
+    after = None
+    if cursor:
+        after = search.decode_cursor(cursor)
+        if after is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return await db.run_sync(search.search_page, q, current_user.id, limit, after)
 
 @app.post("/api/friends/request")
 async def send_friend_request(
     request_data: schemas.FriendRequestCreate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Send friend request"""
+    # A disabled account is being purged; a new friendship would appear
+    # behind the purge and keep the user row from being deleted
+    target = await db.get(models.User, request_data.user_id)
+    if target is None or target.disabled_at is not None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
     # Check if request already exists
-    existing = db.query(models.Friendship).filter(
+    existing = await db.scalar(select(models.Friendship).where(
         ((models.Friendship.user_id == current_user.id) & (models.Friendship.friend_id == request_data.user_id)) |
         ((models.Friendship.user_id == request_data.user_id) & (models.Friendship.friend_id == current_user.id))
-    ).first()
+    ).limit(1))
     
     if existing:
         raise HTTPException(status_code=400, detail="Friend request already exists")
@@ -434,20 +612,20 @@ async def send_friend_request(
     )
     
     db.add(friendship)
-    db.commit()
+    await db.commit()
     
     return {"message": "Friend request sent"}
 
 @app.get("/api/friends/requests", response_model=List[schemas.FriendRequestResponse])
 async def get_friend_requests(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get pending friend requests"""
-    requests = db.query(models.Friendship).filter(
+    requests = (await db.scalars(select(models.Friendship).where(
         models.Friendship.friend_id == current_user.id,
         models.Friendship.status == "pending"
-    ).all()
+    ))).all()
     
     return requests
 
@@ -455,19 +633,23 @@ async def get_friend_requests(
 async def accept_friend_request(
     request_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Accept friend request"""
-    friendship = db.query(models.Friendship).filter(
+    friendship = await db.scalar(select(models.Friendship).where(
         models.Friendship.id == request_id,
         models.Friendship.friend_id == current_user.id
-    ).first()
+    ))
     
     if not friendship:
         raise HTTPException(status_code=404, detail="Friend request not found")
     
-    friendship.status = "accepted"
-    db.commit()
+    if friendship.status != "accepted":
+        friendship.status = "accepted"
+        await user_stats.record_friendship_change(db, [friendship.user_id, friendship.friend_id], 1)
+        await db.flush()
+        await db.run_sync(conversations.rebuild, [friendship.id])
+    await db.commit()
     
     return {"message": "Friend request accepted"}
 
@@ -475,19 +657,22 @@ async def accept_friend_request(
 async def decline_friend_request(
     request_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Decline friend request"""
-    friendship = db.query(models.Friendship).filter(
+    friendship = await db.scalar(select(models.Friendship).where(
         models.Friendship.id == request_id,
         models.Friendship.friend_id == current_user.id
-    ).first()
+    ))
     
     if not friendship:
         raise HTTPException(status_code=404, detail="Friend request not found")
     
-    db.delete(friendship)
-    db.commit()
+    if friendship.status == "accepted":
+        await user_stats.record_friendship_change(db, [friendship.user_id, friendship.friend_id], -1)
+    await db.execute(delete(models.Conversation).where(models.Conversation.friendship_id == friendship.id))
+    await db.delete(friendship)
+    await db.commit()
     
     return {"message": "Friend request declined"}
 
@@ -498,71 +683,114 @@ async def decline_friend_request(
 @app.get("/api/chats", response_model=List[schemas.ChatResponse])
 async def get_chats(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all chat conversations"""
-    # Get all friendships
-    friendships = db.query(models.Friendship).filter(
-        ((models.Friendship.user_id == current_user.id) | (models.Friendship.friend_id == current_user.id)) &
-        (models.Friendship.status == "accepted")
-    ).all()
-    
-    chats = []
-    for friendship in friendships:
-        friend = friendship.friend if friendship.user_id == current_user.id else friendship.user
-        
-        # Get last message
-        last_message = db.query(models.Message).filter(
-            ((models.Message.sender_id == current_user.id) & (models.Message.receiver_id == friend.id)) |
-            ((models.Message.sender_id == friend.id) & (models.Message.receiver_id == current_user.id))
-        ).order_by(models.Message.created_at.desc()).first()
-        
-        # Get unread count
-        unread_count = db.query(models.Message).filter(
-            models.Message.sender_id == friend.id,
-            models.Message.receiver_id == current_user.id,
-            models.Message.is_read == False
-        ).count()
-        
-        chats.append({
-            "id": friendship.id,
-            "friend": friend,
-            "last_message": last_message,
-            "unread_count": unread_count
-        })
-    
-    return chats
-
-@app.get("/api/chats/{chat_id}/messages", response_model=List[schemas.MessageResponse])
+    friend_id = case(
+        (models.Conversation.user_id == current_user.id, models.Conversation.friend_id),
+        else_=models.Conversation.user_id
+    )
+    rows = (await db.execute(
+        select(
+            models.Conversation.friendship_id,
+            *fastjson.columns(models.User, schemas.FriendResponse, "friend_"),
+            *fastjson.columns(models.Message, schemas.MessageResponse, "message_"),
+            conversations.unread_count_for(current_user.id).label("unread_count")
+        )
+        .join(models.User, models.User.id == friend_id)
+        .outerjoin(models.Message, models.Message.id == models.Conversation.last_message_id)
+        .where((models.Conversation.user_id == current_user.id) | (models.Conversation.friend_id == current_user.id))
+        .order_by(models.Conversation.last_message_at.desc().nulls_last(), models.Conversation.friendship_id)
+    )).all()
+    
+    return fastjson.json_response([
+        {
+            "id": row.friendship_id,
+            "friend": fastjson.pick(row, schemas.FriendResponse, "friend_"),
+            "last_message": fastjson.pick(row, schemas.MessageResponse, "message_") if row.message_id else None,
+            "unread_count": row.unread_count
+        }
+        for row in rows
+    ])
+
+@app.get("/api/chats/{chat_id}/messages", response_model=schemas.MessagePage)
 async def get_messages(
     chat_id: int,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get messages for a chat"""
-    friendship = db.query(models.Friendship).filter(models.Friendship.id == chat_id).first()
+    """Get a page of messages for a chat
+
+    Without a cursor this is the latest page; `before` walks back through
+    older messages and `after` forward through newer ones.
+    """
+    friendship = await db.get(models.Friendship, chat_id)
     
     if not friendship:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    friend_id = friendship.friend_id if friendship.user_id == current_user.id else friendship.user_id
-    
-    messages = db.query(models.Message).filter(
-        ((models.Message.sender_id == current_user.id) & (models.Message.receiver_id == friend_id)) |
-        ((models.Message.sender_id == friend_id) & (models.Message.receiver_id == current_user.id))
-    ).order_by(models.Message.created_at).all()
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
     
-    return messages
+    friend_id = friendship.friend_id if friendship.user_id == current_user.id else friendship.user_id
+    newest_first = after is None
+    
+    conditions = []
+    if before or after:
+        cursor = await db.get(models.Message, before or after)
+        if not cursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        position = tuple_(models.Message.created_at, models.Message.id)
+        cursor_position = tuple_(cursor.created_at, cursor.id)
+        conditions.append(position < cursor_position if before else position > cursor_position)
+    
+    def ordering(entity):
+        if newest_first:
+            return (entity.created_at.desc(), entity.id.desc())
+        return (entity.created_at, entity.id)
+    
+    # Each direction of the conversation is read from its own index range and
+    # limited there, so a page costs the same however long the chat is
+    directions = [
+        select(models.Message).where(
+            models.Message.sender_id == sender_id,
+            models.Message.receiver_id == receiver_id,
+            *conditions
+        ).order_by(*ordering(models.Message)).limit(limit + 1).subquery()
+        for sender_id, receiver_id in ((current_user.id, friend_id), (friend_id, current_user.id))
+    ]
+    page = aliased(models.Message, union_all(*(select(d) for d in directions)).subquery())
+    messages = list((await db.execute(
+        select(*fastjson.columns(page, schemas.MessageResponse)).order_by(*ordering(page)).limit(limit + 1)
+    )).all())
+    
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if newest_first:
+        messages.reverse()
+    
+    next_cursor = None
+    if has_more:
+        next_cursor = messages[0].id if newest_first else messages[-1].id
+    
+    return fastjson.json_response({
+        "messages": [fastjson.pick(row, schemas.MessageResponse) for row in messages],
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+    })
 
 @app.post("/api/chats/{chat_id}/messages", response_model=schemas.MessageResponse)
 async def send_message(
     chat_id: int,
     message_data: schemas.MessageCreate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Send a message"""
-    friendship = db.query(models.Friendship).filter(models.Friendship.id == chat_id).first()
+    friendship = await db.get(models.Friendship, chat_id)
     
     if not friendship:
         raise HTTPException(status_code=404, detail="Chat not found")
@@ -576,8 +804,21 @@ async def send_message(
     )
     
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.flush()
+    await conversations.record_message(db, friendship.id, message)
+    unread_count = await db.scalar(
+        select(conversations.unread_count_for(friend_id)).where(models.Conversation.friendship_id == friendship.id)
+    )
+    await db.commit()
+    await db.refresh(message)
+    
+    payload = schemas.MessageResponse.model_validate(message).model_dump(mode="json")
+    await realtime.publish(
+        [current_user.id, friend_id], {"type": "message", "chat_id": chat_id, "message": payload}
+    )
+    await realtime.publish(
+        [friend_id], {"type": "unread", "chat_id": chat_id, "unread_count": unread_count or 0}
+    )
     
     return message
 
@@ -585,90 +826,234 @@ async def send_message(
 async def mark_as_read(
     chat_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mark messages as read"""
-    friendship = db.query(models.Friendship).filter(models.Friendship.id == chat_id).first()
+    friendship = await db.get(models.Friendship, chat_id)
     
     if not friendship:
         raise HTTPException(status_code=404, detail="Chat not found")
     
     friend_id = friendship.friend_id if friendship.user_id == current_user.id else friendship.user_id
     
-    db.query(models.Message).filter(
+    await db.execute(update(models.Message).where(
         models.Message.sender_id == friend_id,
         models.Message.receiver_id == current_user.id,
         models.Message.is_read == False
-    ).update({"is_read": True})
+    ).values(is_read=True))
+    await conversations.record_read(db, friendship.id, current_user.id)
+    
+    await db.commit()
     
-    db.commit()
+    await realtime.publish([friend_id], {"type": "read", "chat_id": chat_id, "reader_id": current_user.id})
+    await realtime.publish([current_user.id], {"type": "unread", "chat_id": chat_id, "unread_count": 0})
     
     return {"message": "Messages marked as read"}
 
+@app.websocket("/ws")
+async def websocket_events(websocket: WebSocket, token: str = Query(...)):
+    """Push chat events (new messages, read receipts, unread counts) to the client
+
+    Browsers can't set headers on a WebSocket, so the JWT comes as ?token=.
+    """
+    # Only hold a database connection for the authentication itself
+    async with ReadSessionLocal() as db:
+        try:
+            user = await authenticate(token, db)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+    
+    await websocket.accept()
+    await realtime.serve(websocket, user.id)
+
 # ===========================
 # PROGRESS/STATS ROUTES
 # ===========================
 
+# Badge definitions only change with a deploy, which must invalidate
+# clients' cached copies
+BADGE_CATALOGUE_TAG = conditional.fingerprint(badges.BADGE_CATALOGUE)
+BADGE_CATALOGUE_LOADED_AT = datetime.utcnow()
+
 @app.get("/api/progress/activity")
 async def get_activity_data(
+    request: Request,
+    response: Response,
+    format: str = Query("map", pattern="^(map|packed)$"),
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get 12-month activity data"""
-    # Get sessions for last 12 months
-    twelve_months_ago = datetime.now() - timedelta(days=365)
-    sessions = db.query(models.Session).filter(
-        models.Session.user_id == current_user.id,
-        models.Session.date >= twelve_months_ago.date()
-    ).all()
-    
-    # Convert to format for frontend
-    activity_map = {session.date.isoformat(): session.task_count for session in sessions}
+    """Get activity data (last 12 months unless from/to are given)"""
+    today = datetime.now().date()
+    try:
+        start, end = activity.resolve_range(start, end, today)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Sessions only change on completions, which always touch user_stats;
+    # the default window itself moves with the date
+    stats = await user_stats.get_user_stats(db, current_user.id)
+    cached = conditional.not_modified(request, response, current_user.id, stats.updated_at, today, format, start, end)
+    if cached:
+        return cached
+    
+    rows = await activity.daily_counts(db, current_user.id, start, end)
+    if format == "packed":
+        return activity.pack(start, end, rows)
+    return {"activity": activity.as_map(rows)}
+
+async def badge_list(db: AsyncSession, user_id: int) -> List[dict]:
+    """Every badge in the catalogue, flagged with whether the user earned it"""
+    earned_badge_types = set((await db.scalars(select(models.UserBadge.badge_type).where(
+        models.UserBadge.user_id == user_id
+    ))).all())
     
-    return {"activity": activity_map}
+    return [{**badge, "is_earned": badge["type"] in earned_badge_types} for badge in badges.BADGE_CATALOGUE]
 
 @app.get("/api/progress/badges", response_model=List[schemas.BadgeResponse])
 async def get_badges(
+    request: Request,
+    response: Response,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get user badges"""
-    user_badges = db.query(models.UserBadge).filter(
-        models.UserBadge.user_id == current_user.id
-    ).all()
-    
-    earned_badge_types = {ub.badge_type for ub in user_badges}
-    
-    # Define all badge types
-    all_badges = [
-        {"type": "bronze", "name": "First Steps", "description": "Complete your first task"},
-        {"type": "silver", "name": "Week Warrior", "description": "7-day streak"},
-        {"type": "gold", "name": "Gold Standard", "description": "Earn 1000 points"},
-        {"type": "platinum", "name": "Platinum Pro", "description": "30-day streak"},
-        {"type": "diamond", "name": "Diamond Elite", "description": "100-day streak"},
-    ]
-    
-    result = []
-    for badge in all_badges:
-        result.append({
-            **badge,
-            "is_earned": badge["type"] in earned_badge_types
-        })
+    # Badges are only ever added, so the latest award dates the payload
+    count, last_earned = (await db.execute(
+        select(func.count(), func.max(models.UserBadge.earned_at)).where(models.UserBadge.user_id == current_user.id)
+    )).one()
+    cached = conditional.not_modified(
+        request, response, current_user.id, BADGE_CATALOGUE_TAG, count, last_earned,
+        last_modified=max(last_earned or BADGE_CATALOGUE_LOADED_AT, BADGE_CATALOGUE_LOADED_AT),
+    )
+    if cached:
+        return cached
     
-    return result
+    return await badge_list(db, current_user.id)
 
 @app.get("/api/progress/goals")
 async def get_weekly_goals(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get weekly goals"""
+    return await weekly_goals(db, current_user.id)
+
+async def weekly_goals(db: AsyncSession, user_id: int) -> List[dict]:
     # This is a placeholder - implement based on your goal tracking logic
     return [
         {"id": 1, "title": "10km run", "current": 6, "total": 10, "unit": "km", "color": "emerald"},
         {"id": 2, "title": "1000 pushups", "current": 340, "total": 1000, "color": "amber"}
     ]
 
+# ===========================
+# DASHBOARD ROUTES
+# ===========================
+
+async def dashboard_profile(db: AsyncSession, user: models.User) -> dict:
+    stats = await user_stats.get_user_stats(db, user.id)
+    leaderboard.board.add_missing(user.id, stats.points)
+    return profile_payload(user, stats, leaderboard.board.rank(user.id), datetime.now().date())
+
+async def dashboard_activity(db: AsyncSession, user: models.User) -> dict:
+    start, end = activity.resolve_range(None, None, datetime.now().date())
+    return activity.pack(start, end, await activity.daily_counts(db, user.id, start, end))
+
+# Section name -> builder run on its own session
+DASHBOARD_SECTIONS = {
+    "profile": dashboard_profile,
+    "activity": dashboard_activity,
+    "badges": lambda db, user: badge_list(db, user.id),
+    "goals": lambda db, user: weekly_goals(db, user.id),
+}
+
+@app.get("/api/dashboard", response_model=schemas.DashboardResponse, response_model_exclude_unset=True)
+async def get_dashboard(
+    request: Request,
+    include: Optional[str] = Query(None, description="Comma-separated sections, default all"),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Profile, activity, badges and goals in one response"""
+    sections = list(DASHBOARD_SECTIONS)
+    if include:
+        sections = list(dict.fromkeys(name.strip() for name in include.split(",") if name.strip()))
+        unknown = [name for name in sections if name not in DASHBOARD_SECTIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown dashboard sections: {', '.join(unknown)}")
+    
+    # An AsyncSession runs one statement at a time, so each section gets
+    # its own session and the queries run concurrently on separate connections
+    session_factory = replicas.session_factory(current_user.id, request)
+    async def build(name: str):
+        async with session_factory() as db:
+            return await DASHBOARD_SECTIONS[name](db, current_user)
+    
+    results = await asyncio.gather(*(build(name) for name in sections))
+    return dict(zip(sections, results))
+
+# ===========================
+# LEADERBOARD ROUTES
+# ===========================
+
+async def ensure_on_leaderboard(db: AsyncSession, user_id: int):
+    # Users created by another worker may not have reached this board yet
+    if leaderboard.board.points(user_id) is None:
+        stats = await user_stats.get_user_stats(db, user_id)
+        leaderboard.board.add_missing(user_id, stats.points)
+
+@app.get("/api/leaderboard", response_model=List[schemas.LeaderboardEntry])
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get the top users by points"""
+    return await leaderboard.with_users(db, leaderboard.board.top(limit))
+
+@app.get("/api/leaderboard/me", response_model=schemas.LeaderboardRank)
+async def get_my_rank(
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get the current user's global rank"""
+    await ensure_on_leaderboard(db, current_user.id)
+    return {
+        "rank": leaderboard.board.rank(current_user.id),
+        "points": leaderboard.board.points(current_user.id),
+        "total_users": len(leaderboard.board)
+    }
+
+@app.get("/api/leaderboard/around", response_model=List[schemas.LeaderboardEntry])
+async def get_leaderboard_around_me(
+    radius: int = Query(10, ge=1, le=50),
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get the users ranked just above and below the current user"""
+    await ensure_on_leaderboard(db, current_user.id)
+    return await leaderboard.with_users(db, leaderboard.board.around(current_user.id, radius))
+
+@app.get("/api/leaderboard/friends", response_model=List[schemas.LeaderboardEntry])
+async def get_friends_leaderboard(
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Rank the current user against their friends"""
+    await ensure_on_leaderboard(db, current_user.id)
+    rows = (await db.execute(select(models.Friendship.user_id, models.Friendship.friend_id).where(
+        ((models.Friendship.user_id == current_user.id) | (models.Friendship.friend_id == current_user.id)) &
+        (models.Friendship.status == "accepted")
+    ))).all()
+    
+    user_ids = {current_user.id}
+    for user_id, friend_id in rows:
+        user_ids.add(friend_id if user_id == current_user.id else user_id)
+    
+    return await leaderboard.with_users(db, leaderboard.board.rank_among(user_ids))
+
 # ===========================
 # HEALTH CHECK
 # ===========================
@@ -681,6 +1066,15 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Request, SQL and pool metrics of this worker in Prometheus text format"""
+    if metrics.METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {metrics.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
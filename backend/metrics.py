@@ -0,0 +1,299 @@
+"""
+Request, SQL and connection-pool instrumentation
+
+MetricsMiddleware times every HTTP request and labels it with the route
+template (not the raw path, so ids don't explode the label set). SQL
+statements are counted and timed by engine event hooks into a
+per-request context, which gives queries-per-request and DB time per
+route; the pool class wrapper records how long each connection checkout
+waited. render() returns everything in the Prometheus text format for
+the /metrics endpoint.
+
+A route that runs more statements than its query budget is logged and
+counted, which is how an N+1 shows up in staging before it ships. With
+METRICS_DEBUG_HEADERS=true each response also carries its own numbers
+(X-DB-Queries and Server-Timing).
+
+Every worker process keeps its own registry, so Prometheus should scrape
+each worker (or sum over them).
+"""
+
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Statements per request above which a warning is logged; 0 disables the default
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "0"))
+# Per-route overrides: "GET /api/chats=2,PUT /api/tasks/{task_id}/status=6"
+QUERY_BUDGETS = os.getenv("QUERY_BUDGETS", "")
+DEBUG_HEADERS = os.getenv("METRICS_DEBUG_HEADERS", "false").lower() == "true"
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, limit = item.rpartition("=")
+        budgets[" ".join(route.split())] = int(limit)
+    return budgets
+
+budgets = parse_budgets(QUERY_BUDGETS)
+
+# ===========================
+# REGISTRY
+# ===========================
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+class Gauge(Counter):
+    """Gauge read from a callback at scrape time, or set directly"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Optional[float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        if self.callback is not None:
+            value = self.callback()
+            if value is not None:
+                yield f"{self.name} {_number(value)}"
+            return
+        yield from super().samples()
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> [per-bucket counts..., sum, count]
+        self.values: Dict[tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[i] += 1
+                break
+        entry[-2] += value
+        entry[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        for labels, entry in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(float(entry[-2]))}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {entry[-1]}"
+
+registry: List = []
+
+def register(metric):
+    registry.append(metric)
+    return metric
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+ROUTE_LABELS = ("method", "route")
+
+requests_total = register(Counter(
+    "http_requests_total", "HTTP requests by route and status code", ROUTE_LABELS + ("status",)))
+request_duration = register(Histogram(
+    "http_request_duration_seconds", "Time to the end of the response body", LATENCY_BUCKETS, ROUTE_LABELS))
+requests_in_progress = register(Gauge(
+    "http_requests_in_progress", "Requests currently being handled"))
+request_queries = register(Histogram(
+    "http_request_db_queries", "SQL statements run per request", QUERY_BUCKETS, ROUTE_LABELS))
+request_db_time = register(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request", LATENCY_BUCKETS, ROUTE_LABELS))
+budget_violations = register(Counter(
+    "http_request_query_budget_exceeded_total", "Requests that ran more statements than their budget", ROUTE_LABELS))
+queries_total = register(Counter(
+    "db_queries_total", "SQL statements executed, including background work"))
+query_seconds_total = register(Counter(
+    "db_query_seconds_total", "Time spent executing SQL, including background work"))
+pool_checkout_wait = register(Histogram(
+    "db_pool_checkout_seconds", "Time to obtain a connection from the pool", WAIT_BUCKETS))
+
+# ===========================
+# PER-REQUEST CONTEXT
+# ===========================
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+# ===========================
+# ENGINE AND POOL HOOKS
+# ===========================
+
+def instrument_engine(sync_engine):
+    """Count and time statements on an engine (use .sync_engine for async ones)"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        query_seconds_total.inc(amount=elapsed)
+        # SQLite's BEGIN IMMEDIATE is issued as a statement; other backends
+        # begin implicitly, so leave it out to keep counts comparable
+        if statement.startswith("BEGIN"):
+            return
+        queries_total.inc()
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        started = exception_context.connection.info.get("metrics_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+def timed_pool(pool_class):
+    """Subclass of pool_class that records how long each checkout waited"""
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                pool_checkout_wait.observe(time.perf_counter() - started)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+def watch_pool(pool_getter: Callable[[], object]):
+    """Export checked-out and overflow connection gauges for a queue pool"""
+
+    def reading(method):
+        def read():
+            value = getattr(pool_getter(), method, None)
+            return value() if callable(value) else None
+        return read
+
+    register(Gauge("db_pool_checked_out", "Connections currently checked out", callback=reading("checkedout")))
+    register(Gauge("db_pool_size", "Configured pool size", callback=reading("size")))
+    register(Gauge("db_pool_overflow", "Connections open beyond the pool size", callback=reading("overflow")))
+
+# ===========================
+# MIDDLEWARE
+# ===========================
+
+def budget_for(method: str, route: str) -> int:
+    return budgets.get(f"{method} {route}", QUERY_BUDGET)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and SQL usage per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if DEBUG_HEADERS:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-queries", str(stats.queries).encode()))
+                    headers.append((b"server-timing", (
+                        f"db;dur={stats.db_seconds * 1000:.2f}, app;dur={elapsed_ms:.2f}"
+                    ).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_progress.inc(amount=-1)
+            _current.reset(token)
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners can't grow the registry
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            requests_total.inc(*labels, str(status_code))
+            request_duration.observe(time.perf_counter() - started, *labels)
+            request_queries.observe(stats.queries, *labels)
+            request_db_time.observe(stats.db_seconds, *labels)
+
+            budget = budget_for(*labels)
+            if budget and stats.queries > budget:
+                budget_violations.inc(*labels)
+                logger.warning("Query budget exceeded: %s %s ran %d statements (budget %d)",
+                               labels[0], labels[1], stats.queries, budget)
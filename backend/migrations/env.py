@@ -0,0 +1,49 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import engine
+import models
+
+config = context.config
+
+# run_migrations() leaves the application's logging alone
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+# Search objects from 0004 that have no model (the FTS5 table and its
+# shadow tables, expression indexes)
+UNMODELED_PREFIXES = ("users_search", "ix_users_username_", "ix_users_display_name_")
+
+def include_object(obj, name, type_, reflected, compare_to):
+    return not (reflected and compare_to is None and name and name.startswith(UNMODELED_PREFIXES))
+
+def run_migrations_offline():
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        # SQLite can only alter most constraints by rebuilding the table
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,76 @@
+"""user_stats, conversations and the badge/message indexes
+
+Catches up with the schema changes shipped before migrations existed.
+create_all() may already have built some of these objects on a database
+adopted at 0001, so each one is only created when it is missing.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 21:20:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'user_stats' not in tables:
+        op.create_table('user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total_tasks', sa.Integer(), nullable=False),
+        sa.Column('completed_tasks', sa.Integer(), nullable=False),
+        sa.Column('points', sa.Integer(), nullable=False),
+        sa.Column('current_streak', sa.Integer(), nullable=False),
+        sa.Column('longest_streak', sa.Integer(), nullable=False),
+        sa.Column('last_active_date', sa.Date(), nullable=True),
+        sa.Column('friends_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+        )
+
+    if 'conversations' not in tables:
+        op.create_table('conversations',
+        sa.Column('friendship_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('friend_id', sa.Integer(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('user_unread_count', sa.Integer(), nullable=False),
+        sa.Column('friend_unread_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['friend_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['friendship_id'], ['friendships.id'], ),
+        sa.ForeignKeyConstraint(['last_message_id'], ['messages.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('friendship_id')
+        )
+        op.create_index('ix_conversations_user_recent', 'conversations', ['user_id', 'last_message_at'], unique=False)
+        op.create_index('ix_conversations_friend_recent', 'conversations', ['friend_id', 'last_message_at'], unique=False)
+
+    if 'ix_messages_pair_created' not in {index['name'] for index in inspector.get_indexes('messages')}:
+        op.create_index('ix_messages_pair_created', 'messages', ['sender_id', 'receiver_id', 'created_at', 'id'], unique=False)
+
+    if 'uq_user_badges_user_badge' not in {c['name'] for c in inspector.get_unique_constraints('user_badges')}:
+        # Keep the first award of each badge
+        op.execute(
+            "DELETE FROM user_badges WHERE id NOT IN "
+            "(SELECT MIN(id) FROM user_badges GROUP BY user_id, badge_type)"
+        )
+        with op.batch_alter_table('user_badges') as batch_op:
+            batch_op.create_unique_constraint('uq_user_badges_user_badge', ['user_id', 'badge_type'])
+
+def downgrade():
+    with op.batch_alter_table('user_badges') as batch_op:
+        batch_op.drop_constraint('uq_user_badges_user_badge', type_='unique')
+    op.drop_index('ix_messages_pair_created', table_name='messages')
+    op.drop_index('ix_conversations_friend_recent', table_name='conversations')
+    op.drop_index('ix_conversations_user_recent', table_name='conversations')
+    op.drop_table('conversations')
+    op.drop_table('user_stats')
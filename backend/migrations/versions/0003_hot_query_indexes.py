@@ -0,0 +1,64 @@
+"""composite indexes and unique constraints for the hot queries
+
+- user_tasks(user_id, task_id) and sessions(user_id, date) become unique, so
+  a user has one row per task and per day. Duplicates left by concurrent
+  requests are folded together first.
+- friendships get (user_id, status) and (friend_id, status) for the friend
+  list, pending requests and friend-id lookups.
+- tasks gets user_id for the default + custom task listing.
+- messages gets receiver_id for the receiving side of a user's messages.
+  messages(sender_id, receiver_id, created_at) is already served by
+  ix_messages_pair_created from 0002.
+
+Run `python user_stats.py rebuild` afterwards if duplicates were removed.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 21:40:00.000000
+"""
+
+from alembic import op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Keep the most recently created row for each task
+    op.execute(
+        "DELETE FROM user_tasks WHERE id NOT IN "
+        "(SELECT MAX(id) FROM user_tasks GROUP BY user_id, task_id)"
+    )
+    # Fold each day's duplicate sessions into the first one
+    op.execute(
+        "UPDATE sessions SET task_count = ("
+        "SELECT SUM(COALESCE(other.task_count, 0)) FROM sessions other "
+        "WHERE other.user_id = sessions.user_id AND other.date = sessions.date"
+        ") WHERE id IN ("
+        "SELECT MIN(id) FROM sessions GROUP BY user_id, date HAVING COUNT(*) > 1)"
+    )
+    op.execute(
+        "DELETE FROM sessions WHERE id NOT IN "
+        "(SELECT MIN(id) FROM sessions GROUP BY user_id, date)"
+    )
+
+    with op.batch_alter_table('user_tasks') as batch_op:
+        batch_op.create_unique_constraint('uq_user_tasks_user_task', ['user_id', 'task_id'])
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.create_unique_constraint('uq_sessions_user_date', ['user_id', 'date'])
+
+    op.create_index('ix_friendships_user_status', 'friendships', ['user_id', 'status'], unique=False)
+    op.create_index('ix_friendships_friend_status', 'friendships', ['friend_id', 'status'], unique=False)
+    op.create_index('ix_tasks_user_id', 'tasks', ['user_id'], unique=False)
+    op.create_index('ix_messages_receiver_id', 'messages', ['receiver_id'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_messages_receiver_id', table_name='messages')
+    op.drop_index('ix_tasks_user_id', table_name='tasks')
+    op.drop_index('ix_friendships_friend_status', table_name='friendships')
+    op.drop_index('ix_friendships_user_status', table_name='friendships')
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.drop_constraint('uq_sessions_user_date', type_='unique')
+    with op.batch_alter_table('user_tasks') as batch_op:
+        batch_op.drop_constraint('uq_user_tasks_user_task', type_='unique')
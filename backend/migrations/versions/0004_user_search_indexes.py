@@ -0,0 +1,72 @@
+"""user search indexes
+
+Backs search.py: lower() b-trees for exact and prefix matches, plus a
+trigram index for substrings (pg_trgm GIN indexes on PostgreSQL, an FTS5
+trigram table kept in sync by triggers on SQLite). None of these can be
+expressed on the models, so env.py keeps autogenerate away from them.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 22:00:00.000000
+"""
+
+from alembic import op
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+POSTGRESQL_UPGRADE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (lower(username) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_display_name_trgm ON users USING gin (lower(display_name) gin_trgm_ops)",
+    # Byte order, so the same index serves prefix ranges and ORDER BY
+    'CREATE INDEX IF NOT EXISTS ix_users_username_lower ON users ((lower(username) COLLATE "C"), id)',
+    'CREATE INDEX IF NOT EXISTS ix_users_display_name_lower ON users ((lower(display_name) COLLATE "C"), id)',
+]
+
+SQLITE_UPGRADE = [
+    "CREATE INDEX IF NOT EXISTS ix_users_username_lower ON users (lower(username))",
+    "CREATE INDEX IF NOT EXISTS ix_users_display_name_lower ON users (lower(display_name))",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5("
+    "username, display_name, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_search_insert AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_search(rowid, username, display_name) VALUES (new.id, new.username, new.display_name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_delete AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_search(users_search, rowid, username, display_name) "
+    "VALUES ('delete', old.id, old.username, old.display_name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_update AFTER UPDATE OF username, display_name ON users BEGIN "
+    "INSERT INTO users_search(users_search, rowid, username, display_name) "
+    "VALUES ('delete', old.id, old.username, old.display_name); "
+    "INSERT INTO users_search(rowid, username, display_name) VALUES (new.id, new.username, new.display_name); END",
+    # Index the users that existed before the table did
+    "INSERT INTO users_search(users_search) VALUES ('rebuild')",
+]
+
+POSTGRESQL_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_users_display_name_lower",
+    "DROP INDEX IF EXISTS ix_users_username_lower",
+    "DROP INDEX IF EXISTS ix_users_display_name_trgm",
+    "DROP INDEX IF EXISTS ix_users_username_trgm",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS users_search_update",
+    "DROP TRIGGER IF EXISTS users_search_delete",
+    "DROP TRIGGER IF EXISTS users_search_insert",
+    "DROP TABLE IF EXISTS users_search",
+    "DROP INDEX IF EXISTS ix_users_display_name_lower",
+    "DROP INDEX IF EXISTS ix_users_username_lower",
+]
+
+def _run(postgresql, sqlite):
+    dialect = op.get_bind().dialect.name
+    for statement in {"postgresql": postgresql, "sqlite": sqlite}.get(dialect, []):
+        op.execute(statement)
+
+def upgrade():
+    _run(POSTGRESQL_UPGRADE, SQLITE_UPGRADE)
+
+def downgrade():
+    _run(POSTGRESQL_DOWNGRADE, SQLITE_DOWNGRADE)
@@ -0,0 +1,28 @@
+"""catalog_versions
+
+Version stamps for the in-process caches of shared catalogues such as the
+default tasks.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 22:30:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('catalog_versions',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+def downgrade():
+    op.drop_table('catalog_versions')
@@ -0,0 +1,38 @@
+"""account_deletions
+
+users.disabled_at marks accounts whose deletion was requested, and
+account_deletions tracks the background purge of their rows. The
+user_tasks(task_id) index serves removing statuses on a deleted user's
+custom tasks.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 23:40:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('users', sa.Column('disabled_at', sa.DateTime(), nullable=True))
+    op.create_table('account_deletions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('requested_at', sa.DateTime(), nullable=False),
+    sa.Column('stage', sa.String(), nullable=False),
+    sa.Column('deleted_rows', sa.Integer(), nullable=False),
+    sa.Column('claimed_until', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_user_tasks_task_id', 'user_tasks', ['task_id'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_user_tasks_task_id', table_name='user_tasks')
+    op.drop_table('account_deletions')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('disabled_at')
@@ -0,0 +1,88 @@
+"""backfill user_stats
+
+Handlers only ever UPDATE user_stats rows, so users created before the
+table existed need one. Disabled accounts are skipped: their purge may
+already have passed the stats stage, and a new row would keep the users
+row from being deleted.
+
+Kept self-contained rather than calling user_stats.py, which follows the
+current models rather than the schema at this revision.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 10:15:00.000000
+"""
+
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+POINTS_PER_TASK = 10
+CHUNK_SIZE = 1000
+
+user_stats = sa.table('user_stats',
+    sa.column('user_id', sa.Integer), sa.column('total_tasks', sa.Integer),
+    sa.column('completed_tasks', sa.Integer), sa.column('points', sa.Integer),
+    sa.column('current_streak', sa.Integer), sa.column('longest_streak', sa.Integer),
+    sa.column('last_active_date', sa.Date), sa.column('friends_count', sa.Integer),
+    sa.column('updated_at', sa.DateTime),
+)
+sessions = sa.table('sessions', sa.column('user_id', sa.Integer), sa.column('date', sa.Date))
+
+def upgrade():
+    conn = op.get_bind()
+    missing = [row[0] for row in conn.execute(sa.text(
+        "SELECT id FROM users WHERE disabled_at IS NULL "
+        "AND id NOT IN (SELECT user_id FROM user_stats) ORDER BY id"
+    ))]
+    if not missing:
+        return
+
+    counts = {}
+    for key, sql in (
+        ('total_tasks', "SELECT user_id, COUNT(*) FROM user_tasks GROUP BY user_id"),
+        ('completed_tasks', "SELECT user_id, COUNT(*) FROM user_tasks WHERE status = 'done' GROUP BY user_id"),
+        ('friends_count', "SELECT user_id, COUNT(*) FROM friendships WHERE status = 'accepted' GROUP BY user_id"),
+        ('friends_count', "SELECT friend_id, COUNT(*) FROM friendships WHERE status = 'accepted' GROUP BY friend_id"),
+    ):
+        for user_id, count in conn.execute(sa.text(sql)):
+            counts.setdefault(user_id, {}).setdefault(key, 0)
+            counts[user_id][key] += count
+
+    # (current run, longest run, last day) from distinct session days in order
+    streaks = {}
+    days = sa.select(sessions.c.user_id, sessions.c.date).distinct().order_by(sessions.c.user_id, sessions.c.date)
+    for user_id, day in conn.execute(days):
+        current, longest, last = streaks.get(user_id, (0, 0, None))
+        current = current + 1 if last is not None and day - last == timedelta(days=1) else 1
+        streaks[user_id] = (current, max(longest, current), day)
+
+    now = datetime.utcnow()
+    for i in range(0, len(missing), CHUNK_SIZE):
+        rows = []
+        for user_id in missing[i:i + CHUNK_SIZE]:
+            user_counts = counts.get(user_id, {})
+            current, longest, last = streaks.get(user_id, (0, 0, None))
+            completed = user_counts.get('completed_tasks', 0)
+            rows.append({
+                'user_id': user_id,
+                'total_tasks': user_counts.get('total_tasks', 0),
+                'completed_tasks': completed,
+                'points': completed * POINTS_PER_TASK,
+                'current_streak': current,
+                'longest_streak': longest,
+                'last_active_date': last,
+                'friends_count': user_counts.get('friends_count', 0),
+                'updated_at': now,
+            })
+        conn.execute(user_stats.insert(), rows)
+
+def downgrade():
+    # The rows are derived data; user_stats.py rebuild recreates them
+    pass
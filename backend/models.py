@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -21,6 +21,7 @@ class User(Base):
     twitter_url = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    disabled_at = Column(DateTime, nullable=True)  # deletion requested; rows are purged in the background
     
     # Relationships
     tasks = relationship("UserTask", back_populates="user", cascade="all, delete-orphan")
@@ -29,9 +30,11 @@ class User(Base):
     received_messages = relationship("Message", foreign_keys="Message.receiver_id", back_populates="receiver")
     sessions = relationship("Session", back_populates="user", cascade="all, delete-orphan")
     badges = relationship("UserBadge", back_populates="user", cascade="all, delete-orphan")
+    stats = relationship("UserStats", back_populates="user", uselist=False, cascade="all, delete-orphan")
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (Index("ix_tasks_user_id", "user_id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -48,6 +51,10 @@ class Task(Base):
 
 class UserTask(Base):
     __tablename__ = "user_tasks"
+    __table_args__ = (
+        UniqueConstraint("user_id", "task_id", name="uq_user_tasks_user_task"),
+        Index("ix_user_tasks_task_id", "task_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -62,6 +69,10 @@ class UserTask(Base):
 
 class Friendship(Base):
     __tablename__ = "friendships"
+    __table_args__ = (
+        Index("ix_friendships_user_status", "user_id", "status"),
+        Index("ix_friendships_friend_status", "friend_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -75,6 +86,11 @@ class Friendship(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves keyset pagination of one direction of a conversation
+        Index("ix_messages_pair_created", "sender_id", "receiver_id", "created_at", "id"),
+        Index("ix_messages_receiver_id", "receiver_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -89,6 +105,7 @@ class Message(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (UniqueConstraint("user_id", "date", name="uq_sessions_user_date"),)
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -101,6 +118,7 @@ class Session(Base):
 
 class UserBadge(Base):
     __tablename__ = "user_badges"
+    __table_args__ = (UniqueConstraint("user_id", "badge_type", name="uq_user_badges_user_badge"),)
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -109,3 +127,57 @@ class UserBadge(Base):
     
     # Relationships
     user = relationship("User", back_populates="badges")
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    
+    # One row per user, maintained by the handlers that change the counts
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_tasks = Column(Integer, default=0, nullable=False)
+    completed_tasks = Column(Integer, default=0, nullable=False)
+    points = Column(Integer, default=0, nullable=False)
+    current_streak = Column(Integer, default=0, nullable=False)  # run of days ending at last_active_date
+    longest_streak = Column(Integer, default=0, nullable=False)
+    last_active_date = Column(Date, nullable=True)
+    friends_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    user = relationship("User", back_populates="stats")
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ix_conversations_user_recent", "user_id", "last_message_at"),
+        Index("ix_conversations_friend_recent", "friend_id", "last_message_at"),
+    )
+    
+    # One row per accepted friendship; user_id/friend_id mirror the friendship
+    friendship_id = Column(Integer, ForeignKey("friendships.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    friend_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    last_message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+    user_unread_count = Column(Integer, default=0, nullable=False)  # messages user_id hasn't read
+    friend_unread_count = Column(Integer, default=0, nullable=False)  # messages friend_id hasn't read
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+    
+    # Bumped in the same transaction as any change to a shared catalogue,
+    # so every worker can tell its cached copy is stale (see catalog.py)
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AccountDeletion(Base):
+    __tablename__ = "account_deletions"
+    
+    # Progress of a background account purge (see deletion.py). No foreign
+    # key: the users row is the last thing deleted and this row outlives it.
+    user_id = Column(Integer, primary_key=True)
+    requested_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    stage = Column(String, nullable=False)  # next step to run
+    deleted_rows = Column(Integer, default=0, nullable=False)
+    claimed_until = Column(DateTime, nullable=True)  # lease held by the worker purging it
+    completed_at = Column(DateTime, nullable=True)
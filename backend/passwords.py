@@ -0,0 +1,100 @@
+"""
+Password hashing off the event loop
+
+Argon2 is slow on purpose, so hashing and verification run in a bounded
+process pool instead of inside the async signup/signin handlers. When more
+jobs are outstanding than the pool is allowed to queue, requests are
+rejected straight away with a 503 rather than piling up behind each other.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+load_dotenv()
+
+# Argon2 cost parameters (passlib defaults unless overridden)
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "102400"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "8"))
+
+# Pool sizing: worker processes and the maximum number of outstanding jobs
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_POOL_SIZE * 4)))
+
+# min_rounds makes hashes created with a lower time cost report as needing
+# an update; a memory cost change is picked up by passlib on its own
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=ARGON2_TIME_COST,
+    argon2__min_rounds=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
+
+# ===========================
+# WORKER FUNCTIONS
+# ===========================
+# These run inside the pool processes, so they must stay module-level
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+# ===========================
+# POOL
+# ===========================
+
+class HashPool:
+    """Process pool with a cap on outstanding hashing jobs"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+hash_pool = HashPool(HASH_POOL_SIZE, HASH_QUEUE_LIMIT)
+
+async def get_password_hash(password: str) -> str:
+    return await hash_pool.run(_hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning (valid, new_hash)
+
+    new_hash is set when the stored hash was made with different argon2
+    parameters and should be replaced.
+    """
+    return await hash_pool.run(_verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,122 @@
+"""
+Real-time delivery over WebSockets
+
+Handlers publish events (new messages, read receipts, unread counts) to a
+broker after committing, and every open /ws connection for the target user
+receives them. The default broker fans out in-process, which is enough for
+a single worker; set REALTIME_BROKER to another registered name to plug in
+an external broker (e.g. Redis pub/sub) once the API runs on several workers.
+"""
+
+import asyncio
+import os
+from typing import Callable, Dict, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+
+REALTIME_BROKER = os.getenv("REALTIME_BROKER", "memory")
+# Events buffered per connection before a slow client is disconnected
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "100"))
+
+class Subscription:
+    """One connection's inbox"""
+
+    def __init__(self, user_id: int, maxsize: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = asyncio.Event()
+
+    def deliver(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client fell too far behind; it reconnects and refetches
+            self.overflowed.set()
+
+class Broker:
+    """Interface every broker implements"""
+
+    def subscribe(self, user_id: int) -> Subscription:
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription: Subscription):
+        raise NotImplementedError
+
+    async def publish(self, user_id: int, event: dict):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class InProcessBroker(Broker):
+    """Fans events out to the connections held by this process"""
+
+    def __init__(self, queue_size: int = REALTIME_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    async def publish(self, user_id: int, event: dict):
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.deliver(event)
+
+    def connection_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+# External brokers register a factory here under the name REALTIME_BROKER selects
+BROKERS: Dict[str, Callable[[], Broker]] = {
+    "memory": InProcessBroker,
+}
+
+broker: Broker = BROKERS[REALTIME_BROKER]()
+
+async def publish(user_ids, event: dict):
+    """Send event to every connection of each user id"""
+    for user_id in set(user_ids):
+        await broker.publish(user_id, event)
+
+async def serve(websocket: WebSocket, user_id: int):
+    """Pump broker events to an accepted socket until either side goes away"""
+    subscription = broker.subscribe(user_id)
+
+    async def forward():
+        while True:
+            event = await subscription.queue.get()
+            await websocket.send_json(event)
+
+    async def drain():
+        # Clients only send pings; reading is how a disconnect is noticed
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    tasks = [
+        asyncio.create_task(forward()),
+        asyncio.create_task(drain()),
+        asyncio.create_task(subscription.overflowed.wait()),
+    ]
+    done = set()
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in done:
+            task.exception()  # a failed send just means the client is gone
+        broker.unsubscribe(subscription)
+        if subscription.overflowed.is_set() and websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close(code=1013)  # try again later
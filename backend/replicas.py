@@ -0,0 +1,61 @@
+"""
+Read replica routing with read-your-writes
+
+Read-only handlers take their session from get_read_db (main.py), which
+is bound to DATABASE_REPLICA_URL when one is configured. A replica lags
+the primary, so for REPLICA_STICKY_SECONDS after a user writes their
+reads stay on the primary: the worker that handled the write remembers
+the user, and the response carries X-Read-Primary-Until, which the
+client sends back so the other workers honour the same window.
+
+Without a replica every read session is a primary session and nothing
+here does any work.
+"""
+
+import os
+import time
+from typing import Optional
+
+from fastapi import Request, Response
+
+from cache import TTLCache
+from database import ReadSessionLocal, ReplicaSessionLocal, replica_engine
+
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+STICKY_HEADER = "X-Read-Primary-Until"
+
+# user id -> epoch seconds until which their reads go to the primary
+_recent_writers = TTLCache(maxsize=100000, ttl=REPLICA_STICKY_SECONDS)
+
+def enabled() -> bool:
+    return replica_engine is not None
+
+def note_write(user_id: int, response: Optional[Response] = None):
+    """Pin the user's reads to the primary for the sticky window"""
+    if not enabled():
+        return
+    until = time.time() + REPLICA_STICKY_SECONDS
+    _recent_writers.set(user_id, until)
+    if response is not None:
+        response.headers[STICKY_HEADER] = f"{until:.3f}"
+
+def _header_pins(request: Request) -> bool:
+    try:
+        until = float(request.headers.get(STICKY_HEADER, ""))
+    except ValueError:
+        return False
+    now = time.time()
+    # A value beyond the window wasn't issued by us; ignore it rather than
+    # let a client keep itself on the primary
+    return now < until <= now + REPLICA_STICKY_SECONDS + 1
+
+def use_primary(user_id: int, request: Optional[Request] = None) -> bool:
+    if not enabled():
+        return True
+    if _recent_writers.get(user_id) is not None:
+        return True
+    return request is not None and _header_pins(request)
+
+def session_factory(user_id: int, request: Optional[Request] = None):
+    """Session maker for a read on behalf of the user"""
+    return ReadSessionLocal if use_primary(user_id, request) else ReplicaSessionLocal
@@ -40,6 +40,7 @@ class UserResponse(BaseModel):
 class ProfileResponse(UserResponse):
     total_points: int
     streak: int
+    longest_streak: int
     rank: int
     friends_count: int
     total_tasks: int
@@ -77,6 +78,12 @@ class TaskResponse(BaseModel):
 class TaskStatusUpdate(BaseModel):
     status: str  # pending, progress, done
 
+class TaskStatusBatchItem(TaskStatusUpdate):
+    task_id: int
+
+class TaskStatusResult(TaskStatusBatchItem):
+    updated: bool  # false when the task does not exist or is another user's custom task
+
 # ===========================
 # FRIEND SCHEMAS
 # ===========================
@@ -93,6 +100,13 @@ class FriendResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class UserSearchResult(FriendResponse):
+    is_friend: bool
+
+class UserSearchPage(BaseModel):
+    users: List[UserSearchResult]
+    next_cursor: Optional[str] = None  # pass as cursor to fetch the next page
+
 class FriendRequestResponse(BaseModel):
     id: int
     user_id: int
@@ -121,12 +135,31 @@ class MessageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MessagePage(BaseModel):
+    messages: List[MessageResponse]  # oldest first
+    has_more: bool
+    next_cursor: Optional[int] = None  # pass as before/after to continue in the same direction
+
 class ChatResponse(BaseModel):
     id: int
     friend: FriendResponse
     last_message: Optional[MessageResponse] = None
     unread_count: int
 
+# ===========================
+# LEADERBOARD SCHEMAS
+# ===========================
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    points: int
+    user: FriendResponse
+
+class LeaderboardRank(BaseModel):
+    rank: int
+    points: int
+    total_users: int
+
 # ===========================
 # PROGRESS/BADGE SCHEMAS
 # ===========================
@@ -137,9 +170,33 @@ class BadgeResponse(BaseModel):
     description: str
     is_earned: bool
 
+class PackedActivity(BaseModel):
+    start: date
+    end: date
+    counts: str  # base64 of one unsigned LEB128 varint per day from start to end
+    
 class SessionResponse(BaseModel):
     date: date
     task_count: int
     
     class Config:
         from_attributes = True
+
+class WeeklyGoal(BaseModel):
+    id: int
+    title: str
+    current: int
+    total: int
+    unit: Optional[str] = None
+    color: str
+
+# ===========================
+# DASHBOARD SCHEMAS
+# ===========================
+
+class DashboardResponse(BaseModel):
+    # Only the sections asked for with include= are present
+    profile: Optional[ProfileResponse] = None
+    activity: Optional[PackedActivity] = None
+    badges: Optional[List[BadgeResponse]] = None
+    goals: Optional[List[WeeklyGoal]] = None
@@ -0,0 +1,192 @@
+"""
+Indexed user search
+
+Results come in tiers, each read by walking an index in order so a page
+stops as soon as it is full instead of sorting every match:
+
+    0. exact username or display name
+    1. username prefix                (lower(username) b-tree)
+    2. display name prefix            (lower(display_name) b-tree)
+    3. substring of either, 3+ chars  (pg_trgm GIN on PostgreSQL,
+                                       FTS5 trigram table on SQLite)
+    4. existing friends matching in any of the above ways
+
+Pages are keyset-paginated on (tier, rank, name, id), so deep pages cost no
+more than the first one. The indexes, and the triggers keeping the SQLite
+FTS table in sync with users, are created by migration 0004.
+"""
+
+import base64
+import json
+from typing import List, Optional, Tuple
+
+from sqlalchemy import String, and_, case, column, func, literal, not_, or_, select, table, text, true, tuple_
+from sqlalchemy.orm import Session
+
+import models
+
+TRIGRAM_MIN_LENGTH = 3
+
+EXACT, USERNAME_PREFIX, DISPLAY_NAME_PREFIX, SUBSTRING, FRIENDS = range(5)
+
+# ===========================
+# CURSORS
+# ===========================
+
+def encode_cursor(key: Tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+def decode_cursor(cursor: str) -> Optional[Tuple]:
+    try:
+        tier, rank, name, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(tier), int(rank), str(name), int(user_id)
+    except (ValueError, TypeError):
+        return None
+
+# ===========================
+# QUERY
+# ===========================
+
+users_search = table("users_search", column("rowid"))
+
+class _Terms:
+    """Match predicates for one normalized query on one backend"""
+
+    def __init__(self, q: str, dialect: str):
+        self.q = q
+        self.dialect = dialect
+        self.username = self.sort_key(models.User.username)
+        self.display_name = self.sort_key(models.User.display_name)
+
+    def sort_key(self, name_column):
+        key = func.lower(name_column, type_=String)
+        # Must match the index expression for PostgreSQL to use it
+        return key.collate("C") if self.dialect == "postgresql" else key
+
+    def exact(self, key):
+        return key == self.q
+
+    def prefix(self, key):
+        # A plain range is what both backends can answer from the b-tree
+        return and_(key >= self.q, key < self.q + "\U0010ffff")
+
+    def any_exact(self):
+        return or_(self.exact(self.username), self.exact(self.display_name))
+
+    def any_prefix(self):
+        return or_(self.prefix(self.username), self.prefix(self.display_name))
+
+    def substring(self):
+        if self.dialect == "postgresql":
+            pattern = "%" + self.q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            return or_(
+                func.lower(models.User.username).like(pattern, escape="\\"),
+                func.lower(models.User.display_name).like(pattern, escape="\\"),
+            )
+        # FTS5 phrase query; the trigram tokenizer turns it into a substring match
+        return text("users_search MATCH :search_phrase").bindparams(
+            search_phrase='"' + self.q.replace('"', '""') + '"'
+        )
+
+    def any_match(self):
+        if not self.q:
+            return true()
+        if len(self.q) < TRIGRAM_MIN_LENGTH:
+            return self.any_prefix()
+        if self.dialect == "postgresql":
+            return self.substring()
+        return models.User.id.in_(select(users_search.c.rowid).where(self.substring()))
+
+def _tier_query(terms: _Terms, tier: int, user_id: int, friend_ids, limit: int, after: Optional[Tuple]):
+    """Select (User, rank, name) for one tier, in index order, or None to skip it"""
+    query = select(models.User)
+    rank = literal(0)
+    name = terms.username
+    id_column = models.User.id
+    q = terms.q
+    # The cursor always stores (rank, name, id); tiers order by the real columns only
+    key = slice(1, 3)
+
+    if tier == EXACT and q:
+        query = query.where(terms.any_exact())
+    elif tier == USERNAME_PREFIX and q:
+        query = query.where(terms.prefix(terms.username), not_(terms.any_exact()))
+    elif tier == DISPLAY_NAME_PREFIX and q:
+        name = terms.display_name
+        query = query.where(
+            terms.prefix(terms.display_name),
+            not_(terms.prefix(terms.username)),
+            not_(terms.exact(terms.display_name)),
+        )
+    elif tier == SUBSTRING and (not q or len(q) >= TRIGRAM_MIN_LENGTH):
+        # Ordered by id alone, which the trigram lookup yields for free
+        name = literal("")
+        key = slice(2, 3)
+        if q:
+            query = query.where(not_(terms.any_prefix()))
+            if terms.dialect == "postgresql":
+                query = query.where(terms.substring())
+            else:
+                query = query.join(users_search, users_search.c.rowid == models.User.id).where(terms.substring())
+                id_column = users_search.c.rowid
+    elif tier == FRIENDS:
+        # Friends are few, so ranking them in full is cheap
+        if q:
+            rank = case((terms.any_exact(), 0), (terms.any_prefix(), 1), else_=2)
+            key = slice(0, 3)
+        query = query.where(models.User.id.in_(friend_ids), terms.any_match())
+    else:
+        return None
+
+    if tier != FRIENDS:
+        query = query.where(models.User.id.not_in(friend_ids))
+    order = (rank, name, id_column)[key]
+    if after is not None:
+        query = query.where(tuple_(*order) > tuple_(*after[key]))
+    query = query.where(models.User.id != user_id, models.User.disabled_at.is_(None))
+    return query.add_columns(rank, name).order_by(*order).limit(limit)
+
+def search_page(db: Session, q: str, user_id: int, limit: int = 20, cursor: Optional[Tuple] = None) -> dict:
+    """One page of users matching q for user_id, with a cursor for the next
+
+    Walks the tiers from the cursor's, so a page costs at most one short
+    index range read per tier.
+    """
+    terms = _Terms(q.strip().lower(), db.get_bind().dialect.name)
+    friend_ids = select(models.Friendship.friend_id).where(
+        models.Friendship.user_id == user_id, models.Friendship.status == "accepted"
+    ).union_all(
+        select(models.Friendship.user_id).where(
+            models.Friendship.friend_id == user_id, models.Friendship.status == "accepted"
+        )
+    )
+
+    rows: List[Tuple] = []
+    start = cursor[0] if cursor else EXACT
+    for tier in range(start, FRIENDS + 1):
+        after = cursor[1:] if cursor and tier == start else None
+        query = _tier_query(terms, tier, user_id, friend_ids, limit + 1 - len(rows), after)
+        if query is None:
+            continue
+        rows.extend((tier, user, rank, name) for user, rank, name in db.execute(query))
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        tier, user, rank, name = rows[-1]
+        next_cursor = encode_cursor((tier, rank, name, user.id))
+    return {
+        "users": [
+            {
+                "id": user.id,
+                "username": user.username,
+                "display_name": user.display_name,
+                "avatar_url": user.avatar_url,
+                "is_friend": tier == FRIENDS,
+            }
+            for tier, user, _, _ in rows
+        ],
+        "next_cursor": next_cursor,
+    }
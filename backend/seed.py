@@ -1,19 +1,20 @@
 """
 Seed script to populate database with default tasks
 Run this after setting up the database
-"""
 
-from database import SessionLocal, engine
-import models
+Usage:
+    python seed.py                              # default tasks only
+    python seed.py generate --users 100000      # plus a synthetic population (see datagen.py)
+"""
 
-# Create tables
-models.Base.metadata.create_all(bind=engine)
+import argparse
 
-# Create session
-db = SessionLocal()
+from database import SessionLocal, run_migrations
+import catalog
+import models
 
 # Default tasks
-default_tasks = [
+DEFAULT_TASKS = [
     # Beginner Tasks
     {"title": "Run 2km", "description": "Complete a 2km run at your own pace.", "level": "beginner", "type": "Fitness", "icon": "🏃"},
     {"title": "10 Pushups", "description": "Do 10 pushups in one set.", "level": "beginner", "type": "Fitness", "icon": "💪"},
@@ -36,18 +37,58 @@ default_tasks = [
     {"title": "Write 1000 words", "description": "Write 1000 words (blog, journal, etc.).", "level": "expert", "type": "Learning", "icon": "✍️"},
 ]
 
-# Check if tasks already exist
-existing_tasks = db.query(models.Task).filter(models.Task.user_id == None).count()
+def seed_default_tasks(db) -> bool:
+    """Insert the default tasks unless some exist; returns whether it did"""
+    # Check if tasks already exist
+    existing_tasks = db.query(models.Task).filter(models.Task.user_id == None).count()
+
+    if existing_tasks == 0:
+        # Add default tasks
+        for task_data in DEFAULT_TASKS:
+            task = models.Task(**task_data, user_id=None)  # user_id=None means default task
+            db.add(task)
+        
+        # Running API workers pick the new tasks up on their next catalogue poll
+        catalog.bump_version(db)
+        db.commit()
+        print(f"✅ Successfully seeded {len(DEFAULT_TASKS)} default tasks!")
+        return True
 
-if existing_tasks == 0:
-    # Add default tasks
-    for task_data in default_tasks:
-        task = models.Task(**task_data, user_id=None)  # user_id=None means default task
-        db.add(task)
-    
-    db.commit()
-    print(f"✅ Successfully seeded {len(default_tasks)} default tasks!")
-else:
     print(f"⚠️  Database already has {existing_tasks} default tasks. Skipping seed.")
+    return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed default tasks and, optionally, generated data")
+    subcommands = parser.add_subparsers(dest="command")
+    generate = subcommands.add_parser("generate", help="append a synthetic population of users and their activity")
+    generate.add_argument("--users", type=int, required=True)
+    generate.add_argument("--days", type=int, default=180, help="length of the generated history")
+    generate.add_argument("--friends", type=float, default=8.0, help="mean friend requests sent per user")
+    generate.add_argument("--messages", type=float, default=20.0, help="mean messages per accepted friendship")
+    generate.add_argument("--seed", type=int, default=1)
+    generate.add_argument("--batch-size", type=int, default=10000)
+    generate.add_argument("--password", default=None, help="password of every generated user")
+    generate.add_argument("--skip-derived", action="store_true",
+                          help="don't rebuild user_stats, conversations and badges afterwards")
+    args = parser.parse_args()
+
+    # Create tables
+    run_migrations()
+
+    # Create session
+    db = SessionLocal()
+    try:
+        seed_default_tasks(db)
+        if args.command == "generate":
+            import datagen
 
-db.close()
+            volumes = datagen.Volumes(
+                users=args.users, days=args.days, friends=args.friends,
+                messages=args.messages, batch_size=args.batch_size,
+            )
+            datagen.generate(
+                db, volumes, seed=args.seed, password=args.password or datagen.DEFAULT_PASSWORD,
+                derived=not args.skip_derived,
+            )
+    finally:
+        db.close()
@@ -0,0 +1,82 @@
+"""
+Set-based streak computation
+
+Streaks are maintained incrementally in user_stats on every session write.
+This module recomputes them straight from the sessions table with a single
+gaps-and-islands query: consecutive days minus their row number within a
+user give the same value, so grouping on it yields each run of days.
+It backs the user_stats rebuild and the verify command.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, func, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+
+import models
+
+EPOCH = date(1970, 1, 1)
+
+class day_number(FunctionElement):
+    """Days since 1970-01-01 for a DATE column, as an integer"""
+    type = Integer()
+    inherit_cache = True
+
+@compiles(day_number)
+def _day_number_default(element, compiler, **kw):
+    return "(%s - DATE '1970-01-01')" % compiler.process(element.clauses, **kw)
+
+@compiles(day_number, "sqlite")
+def _day_number_sqlite(element, compiler, **kw):
+    return "CAST(julianday(%s) - 2440587.5 AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+def streaks_query(user_ids: Optional[List[int]] = None):
+    """(user_id, current_streak, longest_streak, last_day) for every user with sessions
+
+    current_streak is the run ending at the user's last session day;
+    last_day is a day number (see day_number).
+    """
+    days = select(
+        models.Session.user_id,
+        day_number(models.Session.date).label("day"),
+    ).distinct()
+    if user_ids is not None:
+        days = days.where(models.Session.user_id.in_(user_ids))
+    days = days.subquery()
+
+    islands = select(
+        days.c.user_id,
+        days.c.day,
+        (days.c.day - func.row_number().over(partition_by=days.c.user_id, order_by=days.c.day)).label("island"),
+    ).subquery()
+
+    runs = select(
+        islands.c.user_id,
+        func.max(islands.c.day).label("last_day"),
+        func.count().label("length"),
+    ).group_by(islands.c.user_id, islands.c.island).subquery()
+
+    ranked = select(
+        runs.c.user_id,
+        runs.c.length,
+        runs.c.last_day,
+        func.max(runs.c.length).over(partition_by=runs.c.user_id).label("longest"),
+        func.row_number().over(partition_by=runs.c.user_id, order_by=runs.c.last_day.desc()).label("recency"),
+    ).subquery()
+
+    return select(
+        ranked.c.user_id,
+        ranked.c.length,
+        ranked.c.longest,
+        ranked.c.last_day,
+    ).where(ranked.c.recency == 1)
+
+def recompute(db: Session, user_ids: Optional[List[int]] = None) -> Dict[int, Tuple[int, int, date]]:
+    """Map user id to (current, longest, last_active_date) from the sessions table"""
+    return {
+        user_id: (current, longest, EPOCH + timedelta(days=last_day))
+        for user_id, current, longest, last_day in db.execute(streaks_query(user_ids))
+    }
@@ -0,0 +1,141 @@
+"""
+Task status and daily session writes
+
+Both are single-statement upserts on the (user_id, task_id) and
+(user_id, date) unique constraints, so concurrent requests from several
+devices can neither duplicate rows nor lose increments. The conditional
+DO UPDATE ... WHERE tells the caller which transition happened without a
+prior read: a task counts as completed only when it moves into done.
+
+set_statuses() applies a whole batch with one multi-row INSERT, one
+locking read of the rows that already existed and one UPDATE per target
+status, however many tasks the batch holds.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, NamedTuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import dialect_insert
+import catalog
+import models
+
+DONE = "done"
+
+class StatusChange(NamedTuple):
+    created: bool  # first status ever set for this task
+    completed_delta: int  # +1 into done, -1 out of done, 0 otherwise
+
+async def is_visible(db: AsyncSession, task_id: int, user_id: int) -> bool:
+    """Whether the user may track the task: a default task or one of their own"""
+    snapshot = await catalog.get(db)
+    if any(task.id == task_id for task in snapshot.tasks):
+        return True
+    # Also covers a default task added since the snapshot was taken
+    return await db.scalar(select(models.Task.id).where(
+        models.Task.id == task_id,
+        (models.Task.user_id == None) | (models.Task.user_id == user_id)
+    )) is not None
+
+async def set_status(db: AsyncSession, user_id: int, task_id: int, status: str) -> StatusChange:
+    """Upsert the user's status for a task and report the transition"""
+    now = datetime.utcnow()
+    insert = dialect_insert(db)
+    stmt = insert(models.UserTask).values(
+        user_id=user_id, task_id=task_id, status=status, created_at=now, updated_at=now
+    )
+    # Only the conflicting row can carry an older created_at, so this is
+    # true exactly when the INSERT branch ran
+    inserted = models.UserTask.created_at == now
+
+    def upsert_where(condition):
+        return stmt.on_conflict_do_update(
+            index_elements=[models.UserTask.user_id, models.UserTask.task_id],
+            set_={"status": stmt.excluded.status, "updated_at": stmt.excluded.updated_at},
+            where=condition,
+        ).returning(inserted)
+
+    if status == DONE:
+        row = (await db.execute(upsert_where(models.UserTask.status.is_distinct_from(DONE)))).first()
+        if row is None:
+            return StatusChange(False, 0)  # already done
+        return StatusChange(bool(row[0]), 1)
+
+    # Leaving done is the only other transition that moves a counter.
+    # The conflicting row stays locked even when the WHERE is false, so
+    # the follow-up UPDATE sees the same row.
+    row = (await db.execute(upsert_where(models.UserTask.status == DONE))).first()
+    if row is not None:
+        return StatusChange(bool(row[0]), 0 if row[0] else -1)
+    await db.execute(
+        update(models.UserTask)
+        .where(
+            models.UserTask.user_id == user_id,
+            models.UserTask.task_id == task_id,
+            models.UserTask.status.is_distinct_from(status),
+        )
+        .values(status=status, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return StatusChange(False, 0)
+
+async def set_statuses(db: AsyncSession, user_id: int, statuses: Dict[int, str]) -> Dict[int, StatusChange]:
+    """Apply many status updates with a fixed number of statements"""
+    if not statuses:
+        return {}
+    now = datetime.utcnow()
+    insert = dialect_insert(db)
+    stmt = insert(models.UserTask).values([
+        {"user_id": user_id, "task_id": task_id, "status": status, "created_at": now, "updated_at": now}
+        for task_id, status in statuses.items()
+    ])
+    created = set((await db.scalars(
+        stmt.on_conflict_do_nothing(index_elements=[models.UserTask.user_id, models.UserTask.task_id])
+        .returning(models.UserTask.task_id)
+    )).all())
+
+    # Lock the rows that already existed so the transitions computed from
+    # their previous status cannot be overtaken by a concurrent request
+    existing = [task_id for task_id in statuses if task_id not in created]
+    previous = {}
+    if existing:
+        previous = dict((await db.execute(
+            select(models.UserTask.task_id, models.UserTask.status)
+            .where(models.UserTask.user_id == user_id, models.UserTask.task_id.in_(existing))
+            .with_for_update()
+        )).all())
+
+    changes = {}
+    by_status = defaultdict(list)
+    for task_id, status in statuses.items():
+        if task_id in created:
+            changes[task_id] = StatusChange(True, int(status == DONE))
+            continue
+        before = previous.get(task_id)
+        if before is None or before == status:
+            changes[task_id] = StatusChange(False, 0)
+            continue
+        changes[task_id] = StatusChange(False, (status == DONE) - (before == DONE))
+        by_status[status].append(task_id)
+
+    # One UPDATE per target status rather than one per task
+    for status, task_ids in by_status.items():
+        await db.execute(
+            update(models.UserTask)
+            .where(models.UserTask.user_id == user_id, models.UserTask.task_id.in_(task_ids))
+            .values(status=status, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    return changes
+
+async def record_completion(db: AsyncSession, user_id: int, day: date, count: int = 1):
+    """Count completed tasks in the user's session for day"""
+    insert = dialect_insert(db)
+    stmt = insert(models.Session).values(user_id=user_id, date=day, task_count=count, created_at=datetime.utcnow())
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.Session.user_id, models.Session.date],
+        set_={"task_count": models.Session.task_count + stmt.excluded.task_count},
+    ))
@@ -0,0 +1,259 @@
+"""
+Per-user stats kept in the user_stats table
+
+The profile endpoint reads one row from here instead of counting tasks,
+sessions and friendships on every request. Handlers apply deltas with
+atomic UPDATEs in the same transaction as the change they describe, and
+rebuild_users() recomputes rows from the source tables for backfills or
+repairs.
+
+Usage:
+    python user_stats.py rebuild              # every user
+    python user_stats.py rebuild --user 42    # a single user
+    python user_stats.py verify [--fix]       # compare stored streaks with sessions
+"""
+
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+import streaks
+
+POINTS_PER_TASK = 10
+
+# Columns record_task_change() reports, with the value a missing row stands for
+REPORTED = {
+    "completed_tasks": 0,
+    "points": 0,
+    "current_streak": 0,
+    "longest_streak": 0,
+    "last_active_date": None,
+}
+
+# ===========================
+# REBUILD FROM SOURCE TABLES
+# ===========================
+
+def compute_users(db: Session, user_ids: List[int]) -> List[dict]:
+    """user_stats values for the given users, computed from the source tables"""
+    total = dict(db.execute(
+        select(models.UserTask.user_id, func.count())
+        .where(models.UserTask.user_id.in_(user_ids))
+        .group_by(models.UserTask.user_id)
+    ).all())
+    completed = dict(db.execute(
+        select(models.UserTask.user_id, func.count())
+        .where(models.UserTask.user_id.in_(user_ids), models.UserTask.status == "done")
+        .group_by(models.UserTask.user_id)
+    ).all())
+
+    # A friendship counts for both sides
+    friends = {}
+    for column in (models.Friendship.user_id, models.Friendship.friend_id):
+        rows = db.execute(
+            select(column, func.count())
+            .where(column.in_(user_ids), models.Friendship.status == "accepted")
+            .group_by(column)
+        ).all()
+        for user_id, count in rows:
+            friends[user_id] = friends.get(user_id, 0) + count
+
+    user_streaks = streaks.recompute(db, user_ids)
+
+    rows = []
+    for user_id in user_ids:
+        current, longest, last = user_streaks.get(user_id, (0, 0, None))
+        rows.append({
+            "user_id": user_id,
+            "total_tasks": total.get(user_id, 0),
+            "completed_tasks": completed.get(user_id, 0),
+            "points": completed.get(user_id, 0) * POINTS_PER_TASK,
+            "current_streak": current,
+            "longest_streak": longest,
+            "last_active_date": last,
+            "friends_count": friends.get(user_id, 0),
+            "updated_at": datetime.utcnow(),
+        })
+    return rows
+
+def rebuild_users(db: Session, user_ids: List[int]):
+    """Recompute and replace user_stats rows for the given users (no commit)"""
+    if not user_ids:
+        return
+    rows = compute_users(db, user_ids)
+    db.execute(delete(models.UserStats).where(models.UserStats.user_id.in_(user_ids)))
+    db.execute(insert(models.UserStats), rows)
+
+def rebuild_all(db: Session, chunk_size: int = 1000) -> int:
+    """Rebuild every user's stats, committing after each chunk of users"""
+    done = 0
+    last_id = 0
+    while True:
+        user_ids = db.scalars(
+            select(models.User.id).where(models.User.id > last_id).order_by(models.User.id).limit(chunk_size)
+        ).all()
+        if not user_ids:
+            return done
+        rebuild_users(db, list(user_ids))
+        db.commit()
+        done += len(user_ids)
+        last_id = user_ids[-1]
+
+def verify_streaks(db: Session) -> List[int]:
+    """User ids whose stored streak state disagrees with the sessions table"""
+    expected = streaks.recompute(db)
+    mismatched = []
+    for user_id, current, longest, last in db.execute(select(
+        models.UserStats.user_id,
+        models.UserStats.current_streak,
+        models.UserStats.longest_streak,
+        models.UserStats.last_active_date,
+    )):
+        if (current, longest, last) != expected.pop(user_id, (0, 0, None)):
+            mismatched.append(user_id)
+    # Users with sessions but no stats row at all
+    mismatched.extend(expected)
+    return sorted(mismatched)
+
+# ===========================
+# READS AND INCREMENTAL UPDATES
+# ===========================
+
+async def get_user_stats(db: AsyncSession, user_id: int) -> models.UserStats:
+    """Primary-key lookup, computing the row on the fly when there is none
+
+    A missing row is computed but not saved: db may be a read replica that
+    hasn't caught up with the signup yet, and read paths must not write.
+    """
+    stats = await db.get(models.UserStats, user_id)
+    if stats is None:
+        rows = await db.run_sync(compute_users, [user_id])
+        stats = models.UserStats(**rows[0])
+    return stats
+
+def current_streak(stats: models.UserStats, today: date) -> int:
+    """Streak as shown to the user: it only counts while today has a session"""
+    return stats.current_streak if stats.last_active_date == today else 0
+
+async def _apply(db: AsyncSession, user_ids: List[int], values: dict, returning: Sequence[str] = ()) -> list:
+    """Update the users' rows; the `returning` columns of each row afterwards"""
+    values["updated_at"] = datetime.utcnow()
+    columns = [getattr(models.UserStats, name) for name in returning]
+    stmt = (
+        update(models.UserStats)
+        .where(models.UserStats.user_id.in_(user_ids))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if columns:
+        stmt = stmt.returning(models.UserStats.user_id, *columns)
+    result = await db.execute(stmt)
+    rows = result.all() if columns else []
+    # Rows missing for users created before user_stats existed: build them
+    # from the source tables, including this transaction's pending changes
+    if (len(rows) if columns else result.rowcount) != len(user_ids):
+        await db.flush()
+        existing = set((await db.scalars(
+            select(models.UserStats.user_id).where(models.UserStats.user_id.in_(user_ids))
+        )).all())
+        missing = [uid for uid in user_ids if uid not in existing]
+        await db.run_sync(rebuild_users, missing)
+        if columns:
+            rows += (await db.execute(
+                select(models.UserStats.user_id, *columns).where(models.UserStats.user_id.in_(missing))
+            )).all()
+    return rows
+
+async def record_task_change(
+    db: AsyncSession,
+    user_id: int,
+    total_delta: int = 0,
+    completed_delta: int = 0,
+    active_day: Optional[date] = None,
+) -> Dict[str, Tuple]:
+    """Apply task counter deltas and, when a task was done, extend the streak
+
+    Returns {column: (before, after)} for the REPORTED columns that changed,
+    so callers can tell whether the streak actually moved.
+    """
+    values = {}
+    if total_delta:
+        values["total_tasks"] = models.UserStats.total_tasks + total_delta
+    if completed_delta:
+        values["completed_tasks"] = models.UserStats.completed_tasks + completed_delta
+        values["points"] = models.UserStats.points + completed_delta * POINTS_PER_TASK
+    if active_day:
+        # Every SET expression sees the old row, so the streak can be
+        # extended in the same statement without reading it first
+        new_current = case(
+            (models.UserStats.last_active_date == active_day, models.UserStats.current_streak),
+            (models.UserStats.last_active_date == active_day - timedelta(days=1), models.UserStats.current_streak + 1),
+            else_=1,
+        )
+        values["current_streak"] = new_current
+        values["longest_streak"] = case(
+            (new_current > models.UserStats.longest_streak, new_current),
+            else_=models.UserStats.longest_streak,
+        )
+        values["last_active_date"] = active_day
+    if not values:
+        return {}
+    reported = [name for name in REPORTED if name in values]
+    if not reported:
+        await _apply(db, [user_id], values)
+        return {}
+
+    # Lock the row so nothing changes it between this read and the UPDATE
+    row = (await db.execute(
+        select(*(getattr(models.UserStats, name) for name in reported))
+        .where(models.UserStats.user_id == user_id)
+        .with_for_update()
+    )).first()
+    before = dict(zip(reported, row)) if row is not None else {name: REPORTED[name] for name in reported}
+    after = (await _apply(db, [user_id], values, reported))[0]._mapping
+    return {
+        name: (before[name], after[name])
+        for name in reported if after[name] != before[name]
+    }
+
+async def record_friendship_change(db: AsyncSession, user_ids: List[int], delta: int):
+    await _apply(db, user_ids, {"friends_count": models.UserStats.friends_count + delta})
+
+if __name__ == "__main__":
+    from database import SessionLocal, run_migrations
+
+    parser = argparse.ArgumentParser(description="Maintain the user_stats table")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--user", type=int, help="only rebuild this user id")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--fix", action="store_true", help="rebuild users that fail verification")
+    args = parser.parse_args()
+
+    run_migrations()
+    db = SessionLocal()
+    try:
+        if args.command == "verify":
+            mismatched = verify_streaks(db)
+            if not mismatched:
+                print("✅ All streaks match the sessions table")
+            else:
+                print(f"⚠️  {len(mismatched)} users have drifted streaks: {mismatched[:20]}")
+                if args.fix:
+                    for i in range(0, len(mismatched), args.chunk_size):
+                        rebuild_users(db, mismatched[i:i + args.chunk_size])
+                        db.commit()
+                    print(f"✅ Rebuilt stats for {len(mismatched)} users")
+        elif args.user:
+            rebuild_users(db, [args.user])
+            db.commit()
+            print(f"✅ Rebuilt stats for user {args.user}")
+        else:
+            count = rebuild_all(db, args.chunk_size)
+            print(f"✅ Rebuilt stats for {count} users")
+    finally:
+        db.close()
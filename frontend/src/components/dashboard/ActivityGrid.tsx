@@ -1,6 +1,7 @@
 import { useMemo } from 'react';
 import { motion } from 'framer-motion';
 import { GitCommit } from 'lucide-react';
+import type { PackedActivity } from '../../types';
 
 type ActivityLevel = 0 | 1 | 2 | 3 | 4;
 
@@ -14,6 +15,7 @@ const colors: Record<ActivityLevel, string> = {
 
 interface ActivityGridProps {
   activityData?: Record<string, number>;
+  packed?: PackedActivity;
   weeks?: number;
   title?: string;
 }
@@ -26,6 +28,28 @@ function getLevel(count: number): ActivityLevel {
   return 4;
 }
 
+// One unsigned LEB128 varint per day from `start`, idle days included
+export function decodePackedActivity({ start, counts }: PackedActivity): Record<string, number> {
+  const result: Record<string, number> = {};
+  const day = new Date(`${start}T00:00:00Z`);
+  const bytes = atob(counts);
+  let value = 0;
+  let shift = 0;
+  for (let i = 0; i < bytes.length; i++) {
+    const byte = bytes.charCodeAt(i);
+    value += (byte & 0x7f) * 2 ** shift;
+    if (byte & 0x80) {
+      shift += 7;
+      continue;
+    }
+    if (value) result[day.toISOString().split('T')[0]] = value;
+    day.setUTCDate(day.getUTCDate() + 1);
+    value = 0;
+    shift = 0;
+  }
+  return result;
+}
+
 function generateDummyGrid(weeks: number): { date: string; count: number }[][] {
   const grid: { date: string; count: number }[][] = [];
   const now = new Date();
@@ -43,9 +67,11 @@ function generateDummyGrid(weeks: number): { date: string; count: number }[][] {
   return grid;
 }
 
-export default function ActivityGrid({ activityData, weeks = 52, title = '12 Months Contribution' }: ActivityGridProps) {
+export default function ActivityGrid({ activityData, packed, weeks = 52, title = '12 Months Contribution' }: ActivityGridProps) {
+  const counts = useMemo(() => (packed ? decodePackedActivity(packed) : activityData), [packed, activityData]);
+
   const grid = useMemo(() => {
-    if (activityData) {
+    if (counts) {
       const g: { date: string; count: number }[][] = Array.from({ length: 7 }, () => []);
       const now = new Date();
       for (let col = 0; col < weeks; col++) {
@@ -53,13 +79,13 @@ export default function ActivityGrid({ activityData, weeks = 52, title = '12 Mon
           const date = new Date(now);
           date.setDate(date.getDate() - ((weeks - col - 1) * 7 + (6 - row)));
           const key = date.toISOString().split('T')[0];
-          g[row].push({ date: key, count: activityData[key] ?? 0 });
+          g[row].push({ date: key, count: counts[key] ?? 0 });
         }
       }
       return g;
     }
     return generateDummyGrid(weeks);
-  }, [activityData, weeks]);
+  }, [counts, weeks]);
 
   const dayLabels = ['', 'Mon', '', 'Wed', '', 'Fri', ''];
 
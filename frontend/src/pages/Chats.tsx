@@ -36,7 +36,13 @@ export default function Chats() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [newMsg, setNewMsg] = useState('');
   const [sending, setSending] = useState(false);
+  const [olderCursor, setOlderCursor] = useState<number | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const messagesBoxRef = useRef<HTMLDivElement>(null);
+  const keepScrollRef = useRef<number | null>(null);
+  const openChatIdRef = useRef<number | null>(null);
+  openChatIdRef.current = openChatId;
 
   // Load real data
   useEffect(() => {
@@ -52,10 +58,46 @@ export default function Chats() {
       .catch(() => {});
   }, []);
 
+  // Live updates pushed by the server
+  useEffect(() => {
+    return chatsApi.subscribe(event => {
+      const isOpen = event.chat_id === openChatIdRef.current;
+
+      if (event.type === 'message') {
+        if (isOpen) {
+          setMessages(prev =>
+            prev.some(m => m.id === event.message.id) ? prev : [...prev, event.message]
+          );
+          if (event.message.sender_id !== user?.id) {
+            chatsApi.markAsRead(event.chat_id).catch(() => {});
+          }
+        }
+        setChats(prev =>
+          prev.map(c => (c.id === event.chat_id ? { ...c, last_message: event.message } : c))
+        );
+      } else if (event.type === 'unread') {
+        setChats(prev =>
+          prev.map(c =>
+            c.id === event.chat_id ? { ...c, unread_count: isOpen ? 0 : event.unread_count } : c
+          )
+        );
+      } else if (event.type === 'read' && isOpen) {
+        setMessages(prev =>
+          prev.map(m => (m.sender_id === user?.id ? { ...m, is_read: true } : m))
+        );
+      }
+    });
+  }, [user?.id]);
+
   useEffect(() => {
     if (openChatId) {
+      setMessages([]);
+      setOlderCursor(null);
       chatsApi.getMessages(openChatId)
-        .then(setMessages)
+        .then(page => {
+          setMessages(page.messages);
+          setOlderCursor(page.has_more ? page.next_cursor ?? null : null);
+        })
         .catch(() => {});
 
       chatsApi.markAsRead(openChatId).catch(() => {});
@@ -69,9 +111,35 @@ export default function Chats() {
   }, [openChatId]);
 
   useEffect(() => {
+    // After prepending older messages keep the view where it was
+    const box = messagesBoxRef.current;
+    if (keepScrollRef.current !== null && box) {
+      box.scrollTop = box.scrollHeight - keepScrollRef.current;
+      keepScrollRef.current = null;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
+  const loadOlder = async () => {
+    if (!openChatId || olderCursor === null || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const page = await chatsApi.getMessages(openChatId, { before: olderCursor });
+      const box = messagesBoxRef.current;
+      keepScrollRef.current = box ? box.scrollHeight - box.scrollTop : null;
+      setMessages(prev => [...page.messages, ...prev]);
+      setOlderCursor(page.has_more ? page.next_cursor ?? null : null);
+    } catch (err) {
+      console.error('Failed to load older messages:', err);
+    }
+    setLoadingOlder(false);
+  };
+
+  const handleMessagesScroll = (e: React.UIEvent<HTMLDivElement>) => {
+    if (e.currentTarget.scrollTop < 40) loadOlder();
+  };
+
   const handleAccept = async (id: number) => {
     try {
       await friendsApi.acceptFriendRequest(id);
@@ -112,8 +180,11 @@ export default function Chats() {
     try {
       const sent = await chatsApi.sendMessage(openChatId, text);
 
+      // The socket may already have delivered the real message
       setMessages(prev =>
-        prev.map(m => (m.id === optimistic.id ? sent : m))
+        prev.some(m => m.id === sent.id)
+          ? prev.filter(m => m.id !== optimistic.id)
+          : prev.map(m => (m.id === optimistic.id ? sent : m))
       );
 
       setChats(prev =>
@@ -159,7 +230,14 @@ export default function Chats() {
               </div>
 
               {/* messages */}
-              <div className="flex min-h-[300px] max-h-[50vh] flex-col gap-3 overflow-y-auto p-4">
+              <div ref={messagesBoxRef} onScroll={handleMessagesScroll}
+                className="flex min-h-[300px] max-h-[50vh] flex-col gap-3 overflow-y-auto p-4">
+                {olderCursor !== null && (
+                  <button onClick={loadOlder} disabled={loadingOlder}
+                    className="mx-auto rounded-full px-3 py-1 text-xs text-slate-400 hover:bg-slate-100 disabled:opacity-50">
+                    {loadingOlder ? 'Loading…' : 'Load earlier messages'}
+                  </button>
+                )}
                 {messages.length === 0 ? (
                   <p className="py-8 text-center text-sm text-slate-400">
                     No messages yet. Say hi! 👋
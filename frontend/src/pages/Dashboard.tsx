@@ -8,13 +8,19 @@ import { PointsChart, MonthlyProgressChart } from '../components/dashboard/Chart
 import ActivityGrid from '../components/dashboard/ActivityGrid';
 import { ProgressBar } from '../components/dashboard/ProgressBar';
 import StreakRate from '../components/dashboard/StreakRate';
-import { progressApi, userApi } from '../services/api';
-import type { Badge, ActivityData, UserProfile } from '../types';
+import { dashboardApi, userApi } from '../services/api';
+import type { Badge, PackedActivity, UserProfile, WeeklyGoal } from '../types';
+
+const DEFAULT_GOALS: WeeklyGoal[] = [
+  { id: 1, title: '10km run', current: 6, total: 10, unit: 'km', color: 'emerald' },
+  { id: 2, title: '1000 pushups', current: 340, total: 1000, color: 'amber' },
+];
 
 export default function Dashboard() {
-  const { user, refreshUser } = useAuth();
+  const { user, setUser, refreshUser } = useAuth();
   const [badges, setBadges] = useState<Badge[]>([]);
-  const [activity, setActivity] = useState<ActivityData | null>(null);
+  const [activity, setActivity] = useState<PackedActivity | undefined>();
+  const [goals, setGoals] = useState<WeeklyGoal[]>(DEFAULT_GOALS);
   const [editOpen, setEditOpen] = useState(false);
   const [editForm, setEditForm] = useState({
     display_name: '', username: '', bio: '', location: '',
@@ -23,8 +29,15 @@ export default function Dashboard() {
   const [saving, setSaving] = useState(false);
 
   useEffect(() => {
-    progressApi.getBadges().then(setBadges).catch(() => {});
-    progressApi.getActivityData().then(setActivity).catch(() => {});
+    // One round trip for every section of the page
+    dashboardApi.getDashboard()
+      .then(data => {
+        if (data.profile) setUser(data.profile);
+        if (data.badges) setBadges(data.badges);
+        if (data.activity) setActivity(data.activity);
+        if (data.goals) setGoals(data.goals);
+      })
+      .catch(() => {});
   }, []);
 
   useEffect(() => {
@@ -101,8 +114,16 @@ export default function Dashboard() {
                 <h3 className="font-display text-lg font-semibold text-slate-900">Weekly Goals</h3>
               </div>
               <div className="space-y-5">
-                <ProgressBar label="10km run" current={6} total={10} unit="km" color="emerald" />
-                <ProgressBar label="1000 pushups" current={340} total={1000} color="amber" />
+                {goals.map(goal => (
+                  <ProgressBar
+                    key={goal.id}
+                    label={goal.title}
+                    current={goal.current}
+                    total={goal.total}
+                    unit={goal.unit}
+                    color={goal.color as 'amber' | 'emerald' | 'blue'}
+                  />
+                ))}
               </div>
             </motion.section>
 
@@ -113,7 +134,7 @@ export default function Dashboard() {
             </div>
 
             {/* Activity Grid */}
-            <ActivityGrid activityData={activity?.activity} title="12 Months Contribution" />
+            <ActivityGrid packed={activity} title="12 Months Contribution" />
 
             {/* Streak Rate */}
             <StreakRate
@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
 import { Search as SearchIcon, UserPlus, Check } from 'lucide-react';
 import { friendsApi } from '../services/api';
-import type { User } from '../types';
+import type { UserSearchResult } from '../types';
 
 function Avatar({ name, url }: { name: string; url?: string }) {
   return (
@@ -18,7 +18,8 @@ function Avatar({ name, url }: { name: string; url?: string }) {
 
 export default function SearchFriends() {
   const [query, setQuery] = useState('');
-  const [users, setUsers] = useState<User[]>([]);
+  const [users, setUsers] = useState<UserSearchResult[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
   const [requested, setRequested] = useState<Set<number>>(new Set());
 
@@ -26,8 +27,8 @@ export default function SearchFriends() {
   useEffect(() => {
     const loadInitialUsers = async () => {
       try {
-        const results = await friendsApi.searchUsers('');
-        setUsers(results.slice(0, 4)); // show only 4 users
+        const page = await friendsApi.searchUsers('', null, 4);
+        setUsers(page.users); // show only 4 users
       } catch (error) {
         console.error('Initial load failed:', error);
       }
@@ -42,21 +43,24 @@ export default function SearchFriends() {
       if (!query.trim()) {
         // reload initial 4 users
         try {
-          const results = await friendsApi.searchUsers('');
-          setUsers(results.slice(0, 4));
+          const page = await friendsApi.searchUsers('', null, 4);
+          setUsers(page.users);
         } catch {
           setUsers([]);
         }
+        setNextCursor(null);
         return;
       }
 
       setLoading(true);
       try {
-        const results = await friendsApi.searchUsers(query);
-        setUsers(results);
+        const page = await friendsApi.searchUsers(query);
+        setUsers(page.users);
+        setNextCursor(page.next_cursor ?? null);
       } catch (error) {
         console.error('Search error:', error);
         setUsers([]);
+        setNextCursor(null);
       } finally {
         setLoading(false);
       }
@@ -65,6 +69,20 @@ export default function SearchFriends() {
     return () => clearTimeout(timer);
   }, [query]);
 
+  const loadMore = async () => {
+    if (!nextCursor || loading) return;
+    setLoading(true);
+    try {
+      const page = await friendsApi.searchUsers(query, nextCursor);
+      setUsers(prev => [...prev, ...page.users]);
+      setNextCursor(page.next_cursor ?? null);
+    } catch (error) {
+      console.error('Search error:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleAddFriend = async (userId: number) => {
     try {
       await friendsApi.sendFriendRequest(userId);
@@ -122,7 +140,7 @@ export default function SearchFriends() {
             <h2 className="font-display font-semibold text-slate-900">
               {query ? `Results for "${query}"` : 'Suggested Users'}
               <span className="ml-2 text-sm font-normal text-slate-400">
-                ({users.length})
+                ({users.length}{nextCursor ? '+' : ''})
               </span>
             </h2>
           </div>
@@ -155,14 +173,14 @@ export default function SearchFriends() {
                     whileHover={{ scale: 1.05 }}
                     whileTap={{ scale: 0.95 }}
                     onClick={() => handleAddFriend(u.id)}
-                    disabled={requested.has(u.id)}
+                    disabled={u.is_friend || requested.has(u.id)}
                     className={`flex h-9 w-9 shrink-0 items-center justify-center rounded-full border transition-all ${
-                      requested.has(u.id)
+                      u.is_friend || requested.has(u.id)
                         ? 'bg-emerald-100 border-emerald-200 text-emerald-600'
                         : 'bg-white border-slate-200 text-slate-500 hover:border-amber-300 hover:bg-amber-50 hover:text-amber-600'
                     }`}
                   >
-                    {requested.has(u.id) ? (
+                    {u.is_friend || requested.has(u.id) ? (
                       <Check className="h-4 w-4" />
                     ) : (
                       <UserPlus className="h-4 w-4" />
@@ -172,6 +190,16 @@ export default function SearchFriends() {
               ))}
             </ul>
           )}
+
+          {nextCursor && (
+            <button
+              onClick={loadMore}
+              disabled={loading}
+              className="w-full border-t border-slate-100 py-3 text-sm font-medium text-amber-600 hover:bg-amber-50 disabled:opacity-50"
+            >
+              {loading ? 'Loading...' : 'Show more'}
+            </button>
+          )}
         </motion.section>
       </div>
     </div>
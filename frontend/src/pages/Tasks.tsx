@@ -78,6 +78,21 @@ export default function Tasks() {
     }
   };
 
+  const markLevelDone = async () => {
+    const pending = tasks.filter(t => t.level === selectedLevel && t.status !== 'done');
+    if (pending.length === 0) return;
+    const ids = new Set(pending.map(t => t.id));
+    setTasks(prev => prev.map(t => ids.has(t.id) ? { ...t, status: 'done' } : t));
+
+    try {
+      // One request for the whole level instead of one per task
+      await tasksApi.updateTaskStatuses(pending.map(t => ({ task_id: t.id, status: 'done' })));
+      console.log('Task statuses updated in backend');
+    } catch (error) {
+      console.log('Backend not available - task statuses saved locally only');
+    }
+  };
+
   const handleCreateTask = async (e: React.FormEvent) => {
     e.preventDefault();
     setCreating(true);
@@ -123,15 +138,26 @@ export default function Tasks() {
             <h1 className="text-3xl font-bold text-gray-900">Tasks</h1>
             <p className="mt-1 text-gray-600">Complete tasks by level. Track your progress.</p>
           </div>
-          <motion.button
-            whileHover={{ scale: 1.05 }}
-            whileTap={{ scale: 0.95 }}
-            onClick={() => setShowCreateModal(true)}
-            className="flex items-center gap-2 rounded-xl bg-amber-500 px-5 py-2.5 text-sm font-semibold text-white shadow-md transition hover:bg-amber-600"
-          >
-            <Plus className="h-4 w-4" />
-            New Task
-          </motion.button>
+          <div className="flex items-center gap-2">
+            <motion.button
+              whileHover={{ scale: 1.05 }}
+              whileTap={{ scale: 0.95 }}
+              onClick={markLevelDone}
+              className="flex items-center gap-2 rounded-xl border border-emerald-200 bg-white px-4 py-2.5 text-sm font-semibold text-emerald-700 shadow-sm transition hover:bg-emerald-50"
+            >
+              <Check className="h-4 w-4" />
+              Mark all done
+            </motion.button>
+            <motion.button
+              whileHover={{ scale: 1.05 }}
+              whileTap={{ scale: 0.95 }}
+              onClick={() => setShowCreateModal(true)}
+              className="flex items-center gap-2 rounded-xl bg-amber-500 px-5 py-2.5 text-sm font-semibold text-white shadow-md transition hover:bg-amber-600"
+            >
+              <Plus className="h-4 w-4" />
+              New Task
+            </motion.button>
+          </div>
         </motion.div>
 
         {/* Task of the day */}
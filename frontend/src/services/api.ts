@@ -1,10 +1,12 @@
 import axios from 'axios';
 import type {
   User, UserProfile, Token, SignUpData, ProfileUpdateData,
-  Task, TaskCreate, TaskStatusUpdate,
-  Friend, FriendRequest,
-  Chat, Message,
-  Badge, ActivityData, WeeklyGoal,
+  Task, TaskCreate, TaskStatusUpdate, TaskStatusBatchItem, TaskStatusResult,
+  Friend, FriendRequest, UserSearchPage,
+  Chat, ChatEvent, Message, MessagePage, MessagePageParams,
+  LeaderboardEntry, LeaderboardRank,
+  Badge, ActivityData, PackedActivity, WeeklyGoal,
+  DashboardData, DashboardSection,
 } from '../types';
 
 
@@ -19,23 +21,63 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: { 'Content-Type': 'application/json' },
+  // 304 answers a conditional GET; the interceptor below fills in the body
+  validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
 });
 
+// Last ETag and body per GET url, revalidated with If-None-Match so
+// unchanged data costs an empty 304 instead of the full payload
+const etagCache = new Map<string, { etag: string; data: unknown }>();
+
+const cacheKey = (url?: string, params?: unknown): string => `${url}?${JSON.stringify(params ?? {})}`;
+
+export const clearResponseCache = (): void => etagCache.clear();
+
+// After a write the API may name a moment until which this user's reads
+// must come from the primary database; echo it so every worker honours it
+const READ_PRIMARY_HEADER = 'X-Read-Primary-Until';
+let readPrimaryUntil: string | null = null;
+
 // Attach token to every request
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem('access_token');
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  if (readPrimaryUntil && Number(readPrimaryUntil) * 1000 > Date.now()) {
+    config.headers[READ_PRIMARY_HEADER] = readPrimaryUntil;
+  }
+  if ((config.method ?? 'get') === 'get') {
+    const cached = etagCache.get(cacheKey(config.url, config.params));
+    if (cached) {
+      config.headers['If-None-Match'] = cached.etag;
+    }
+  }
   return config;
 });
 
-// Handle 401 globally
+// Handle 304 and 401 globally
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const until = response.headers[READ_PRIMARY_HEADER.toLowerCase()];
+    if (until) {
+      readPrimaryUntil = until;
+    }
+    const key = cacheKey(response.config.url, response.config.params);
+    if (response.status === 304) {
+      const cached = etagCache.get(key);
+      if (cached) {
+        response.data = cached.data;
+      }
+    } else if ((response.config.method ?? 'get') === 'get' && response.headers.etag) {
+      etagCache.set(key, { etag: response.headers.etag, data: response.data });
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       localStorage.removeItem('access_token');
+      clearResponseCache();
       window.location.href = '/signin';
     }
     return Promise.reject(error);
@@ -63,12 +105,14 @@ export const authApi = {
     const res = await api.post<Token>('/api/auth/signin', formData, {
       headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
     });
+    clearResponseCache();
     return res.data;
   },
 
   signout: async (): Promise<void> => {
     await api.post('/api/auth/signout');
     localStorage.removeItem('access_token');
+    clearResponseCache();
   },
 };
 
@@ -103,6 +147,7 @@ export const userApi = {
   deleteAccount: async (): Promise<void> => {
     await api.delete('/api/user/account');
     localStorage.removeItem('access_token');
+    clearResponseCache();
   },
 };
 
@@ -111,6 +156,7 @@ export const userApi = {
 // GET  /api/tasks?level=beginner
 // POST /api/tasks
 // PUT  /api/tasks/{task_id}/status
+// PUT  /api/tasks/status:batch
 // ===========================
 
 export const tasksApi = {
@@ -129,6 +175,11 @@ export const tasksApi = {
     const res = await api.put<{ message: string }>(`/api/tasks/${taskId}/status`, data);
     return res.data;
   },
+
+  updateTaskStatuses: async (items: TaskStatusBatchItem[]): Promise<TaskStatusResult[]> => {
+    const res = await api.put<TaskStatusResult[]>('/api/tasks/status:batch', items);
+    return res.data;
+  },
 };
 
 // ===========================
@@ -147,8 +198,10 @@ export const friendsApi = {
     return res.data;
   },
 
-  searchUsers: async (q: string): Promise<User[]> => {
-    const res = await api.get<User[]>('/api/friends/search', { params: { q } });
+  searchUsers: async (q: string, cursor?: string | null, limit?: number): Promise<UserSearchPage> => {
+    const res = await api.get<UserSearchPage>('/api/friends/search', {
+      params: { q, cursor: cursor ?? undefined, limit },
+    });
     return res.data;
   },
 
@@ -176,9 +229,10 @@ export const friendsApi = {
 // ===========================
 // CHAT ROUTES
 // GET  /api/chats
-// GET  /api/chats/{chat_id}/messages
+// GET  /api/chats/{chat_id}/messages?before=&after=&limit=
 // POST /api/chats/{chat_id}/messages
 // PUT  /api/chats/{chat_id}/read
+// WS   /ws?token=...           (pushes ChatEvent)
 // ===========================
 
 export const chatsApi = {
@@ -187,8 +241,8 @@ export const chatsApi = {
     return res.data;
   },
 
-  getMessages: async (chatId: number): Promise<Message[]> => {
-    const res = await api.get<Message[]>(`/api/chats/${chatId}/messages`);
+  getMessages: async (chatId: number, params: MessagePageParams = {}): Promise<MessagePage> => {
+    const res = await api.get<MessagePage>(`/api/chats/${chatId}/messages`, { params });
     return res.data;
   },
 
@@ -201,11 +255,68 @@ export const chatsApi = {
     const res = await api.put<{ message: string }>(`/api/chats/${chatId}/read`);
     return res.data;
   },
+
+  // Live chat events; returns a function that closes the socket
+  subscribe: (onEvent: (event: ChatEvent) => void): (() => void) => {
+    const token = localStorage.getItem('access_token');
+    if (!token) return () => {};
+    const url = new URL('/ws', API_BASE_URL.replace(/^http/, 'ws'));
+    url.searchParams.set('token', token);
+
+    let socket: WebSocket | null = null;
+    let closed = false;
+    let retryTimer: ReturnType<typeof setTimeout>;
+
+    const connect = () => {
+      socket = new WebSocket(url);
+      socket.onmessage = (e) => onEvent(JSON.parse(e.data) as ChatEvent);
+      socket.onclose = () => {
+        if (!closed) retryTimer = setTimeout(connect, 3000);
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      socket?.close();
+    };
+  },
+};
+
+// ===========================
+// LEADERBOARD ROUTES
+// GET /api/leaderboard?limit=10
+// GET /api/leaderboard/me
+// GET /api/leaderboard/around?radius=10
+// GET /api/leaderboard/friends
+// ===========================
+
+export const leaderboardApi = {
+  getTop: async (limit = 10): Promise<LeaderboardEntry[]> => {
+    const res = await api.get<LeaderboardEntry[]>('/api/leaderboard', { params: { limit } });
+    return res.data;
+  },
+
+  getMyRank: async (): Promise<LeaderboardRank> => {
+    const res = await api.get<LeaderboardRank>('/api/leaderboard/me');
+    return res.data;
+  },
+
+  getAroundMe: async (radius = 10): Promise<LeaderboardEntry[]> => {
+    const res = await api.get<LeaderboardEntry[]>('/api/leaderboard/around', { params: { radius } });
+    return res.data;
+  },
+
+  getFriends: async (): Promise<LeaderboardEntry[]> => {
+    const res = await api.get<LeaderboardEntry[]>('/api/leaderboard/friends');
+    return res.data;
+  },
 };
 
 // ===========================
 // PROGRESS ROUTES
-// GET /api/progress/activity
+// GET /api/progress/activity?format=packed&from=&to=
 // GET /api/progress/badges
 // GET /api/progress/goals
 // ===========================
@@ -216,6 +327,12 @@ export const progressApi = {
     return res.data;
   },
 
+  // from/to are ISO dates; the server clamps the range to end today at the latest
+  getPackedActivity: async (from?: string, to?: string): Promise<PackedActivity> => {
+    const res = await api.get<PackedActivity>('/api/progress/activity', { params: { format: 'packed', from, to } });
+    return res.data;
+  },
+
   getBadges: async (): Promise<Badge[]> => {
     const res = await api.get<Badge[]>('/api/progress/badges');
     return res.data;
@@ -227,4 +344,17 @@ export const progressApi = {
   },
 };
 
+// ===========================
+// DASHBOARD ROUTES
+// GET /api/dashboard?include=profile,activity,badges,goals
+// ===========================
+
+export const dashboardApi = {
+  getDashboard: async (include?: DashboardSection[]): Promise<DashboardData> => {
+    const params = include ? { include: include.join(',') } : {};
+    const res = await api.get<DashboardData>('/api/dashboard', { params });
+    return res.data;
+  },
+};
+
 export default api;
@@ -19,6 +19,7 @@ export interface User {
 export interface UserProfile extends User {
   total_points: number;
   streak: number;
+  longest_streak: number;
   rank: number;
   friends_count: number;
   total_tasks: number;
@@ -78,6 +79,14 @@ export interface TaskStatusUpdate {
   status: TaskStatus;
 }
 
+export interface TaskStatusBatchItem extends TaskStatusUpdate {
+  task_id: number;
+}
+
+export interface TaskStatusResult extends TaskStatusBatchItem {
+  updated: boolean; // false when the task does not exist or is another user's
+}
+
 // ===========================
 // FRIEND TYPES
 // ===========================
@@ -89,6 +98,15 @@ export interface Friend {
   avatar_url?: string;
 }
 
+export interface UserSearchResult extends Friend {
+  is_friend: boolean;
+}
+
+export interface UserSearchPage {
+  users: UserSearchResult[]; // best matches first, friends last
+  next_cursor?: string | null;
+}
+
 export interface FriendRequest {
   id: number
   user_id: number
@@ -116,6 +134,18 @@ export interface Message {
   created_at: string;
 }
 
+export interface MessagePage {
+  messages: Message[]; // oldest first
+  has_more: boolean;
+  next_cursor?: number | null;
+}
+
+export interface MessagePageParams {
+  before?: number;
+  after?: number;
+  limit?: number;
+}
+
 export interface Chat {
   id: number;
   friend: Friend;
@@ -123,6 +153,27 @@ export interface Chat {
   unread_count: number;
 }
 
+export type ChatEvent =
+  | { type: 'message'; chat_id: number; message: Message }
+  | { type: 'read'; chat_id: number; reader_id: number }
+  | { type: 'unread'; chat_id: number; unread_count: number };
+
+// ===========================
+// LEADERBOARD TYPES
+// ===========================
+
+export interface LeaderboardEntry {
+  rank: number;
+  points: number;
+  user: Friend;
+}
+
+export interface LeaderboardRank {
+  rank: number;
+  points: number;
+  total_users: number;
+}
+
 // ===========================
 // PROGRESS TYPES
 // ===========================
@@ -138,6 +189,13 @@ export interface ActivityData {
   activity: Record<string, number>;
 }
 
+// GET /api/progress/activity?format=packed
+export interface PackedActivity {
+  start: string; // ISO date of the first count
+  end: string;
+  counts: string; // base64 of one unsigned LEB128 varint per day
+}
+
 export interface WeeklyGoal {
   id: number;
   title: string;
@@ -147,6 +205,20 @@ export interface WeeklyGoal {
   color: string;
 }
 
+// ===========================
+// DASHBOARD TYPES
+// ===========================
+
+export type DashboardSection = 'profile' | 'activity' | 'badges' | 'goals';
+
+// Only the requested sections are present
+export interface DashboardData {
+  profile?: UserProfile;
+  activity?: PackedActivity;
+  badges?: Badge[];
+  goals?: WeeklyGoal[];
+}
+
 // ===========================
 // API RESPONSE TYPES
 // ===========================